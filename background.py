@@ -0,0 +1,246 @@
+"""
+Background cache warming.
+
+A daemon thread periodically refetches details of the most favorited and
+planned recipes and the most popular searches, within a small upstream
+budget, so the requests users are likely to make next hit the caches.
+
+Every server process starts the thread, but only the one holding a
+PostgreSQL advisory lock warms; the others check again every interval and
+take over if that process goes away. Recipe details land in the shared
+recipe_cache table, so all processes benefit; refreshed search results
+only reach the in-process search cache of the warming process.
+"""
+
+import threading
+import time
+from datetime import datetime, timezone
+
+import psycopg2
+
+from cache import chunk_ids, recipe_cache, store_cached_recipes, store_shared_recipes
+from config import (
+    RECIPE_CACHE_PERSIST, WARM_INTERVAL, WARM_MIN_QUOTA_LEFT, WARM_POINT_BUDGET,
+    WARM_RECIPE_LIMIT, WARM_SEARCH_LIMIT
+)
+from db import connect_db, get_db_connection
+from search import fetch_search_results, search_cache, search_traffic, search_traffic_lock
+from upstream import (
+    NOT_FOUND, estimate_points, get_detailed_recipes_bulk, quota_governor, search_points,
+    upstream_degraded
+)
+
+# Advisory lock key held by the one process that runs the warmer
+WARM_LOCK_KEY = 7302115
+
+warm_stats = {
+    'active': False, 'runs': 0, 'points': 0.0, 'recipes_refreshed': 0, 'searches_refreshed': 0,
+    'last_run': None, 'last_seconds': None
+}
+warm_stop = threading.Event()
+
+
+def warm_budget():
+    """Quota points the warmer may spend now, leaving WARM_MIN_QUOTA_LEFT for users."""
+    if upstream_degraded():
+        return 0
+    budget = WARM_POINT_BUDGET
+    if quota_governor.quota_left is not None:
+        budget = min(budget, quota_governor.quota_left - WARM_MIN_QUOTA_LEFT)
+    return max(budget, 0)
+
+
+def most_referenced_recipes(limit):
+    """Recipe IDs most often favorited or planned in the last week, most first."""
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT recipe_id, count(*) AS refs
+                FROM (
+                    SELECT recipe_id FROM favorites
+                    UNION ALL
+                    SELECT recipe_id FROM meal_plan_entries
+                    WHERE plan_date >= current_date - 7
+                ) refs
+                GROUP BY recipe_id
+                ORDER BY refs DESC, recipe_id
+                LIMIT %s
+            """, (limit,))
+            return [row['recipe_id'] for row in cur.fetchall()]
+
+
+def stale_recipe_ids(recipe_ids, fresh_for):
+    """
+    Return the IDs whose cached details expire within `fresh_for` seconds.
+
+    Uses the persistent tier's expiry times when enabled, otherwise treats
+    anything not in the in-process cache as stale.
+    """
+    if not RECIPE_CACHE_PERSIST:
+        return [recipe_id for recipe_id in recipe_ids if recipe_cache.get(recipe_id) is None]
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT recipe_id FROM recipe_cache
+                WHERE recipe_id = ANY(%s)
+                  AND expires_at > now() + make_interval(secs => %s)
+            """, (list(recipe_ids), fresh_for))
+            fresh = {row['recipe_id'] for row in cur.fetchall()}
+    return [recipe_id for recipe_id in recipe_ids if recipe_id not in fresh]
+
+
+def warm_recipe_details(recipe_ids, budget, fresh_for=0):
+    """
+    Refetch details for recipes that are missing or about to expire.
+
+    One informationBulk request per BULK_CHUNK_SIZE IDs, stopping before a
+    request whose estimated cost would go over the budget (in quota points)
+    or when the upstream starts refusing calls.
+
+    Returns:
+        tuple: (points spent, list of the RecipeRecords refreshed).
+    """
+    spent = 0
+    refreshed = []
+    for chunk in chunk_ids(stale_recipe_ids(recipe_ids, fresh_for)):
+        cost = estimate_points('/recipes/informationBulk', {'ids': ','.join(map(str, chunk))})
+        if spent + cost > budget or upstream_degraded():
+            break
+        result = get_detailed_recipes_bulk(chunk)
+        spent += cost
+        if result is None:
+            break
+        records = store_cached_recipes({
+            recipe_id: result.get(recipe_id) or NOT_FOUND for recipe_id in chunk
+        })
+        refreshed.extend(record for record in records.values() if record)
+    return spent, refreshed
+
+
+def popular_searches(limit):
+    """The most frequent recent search cache keys, then decay all counts."""
+    with search_traffic_lock:
+        keys = [key for key, _ in search_traffic.most_common(limit)]
+        # Halve every count so the ranking follows recent traffic
+        for key in list(search_traffic):
+            search_traffic[key] //= 2
+            if not search_traffic[key]:
+                del search_traffic[key]
+    return keys
+
+
+def warm_caches():
+    """
+    Refresh caches for what users are most likely to open next.
+
+    Within a budget of WARM_POINT_BUDGET quota points (see warm_budget):
+    1. details of the most favorited and planned recipes that expire before
+       the next run, also updating the shared recipes table rows of the ones
+       refetched;
+    2. the most popular recent searches, and the details of their results,
+       so peak-time searches are served from cache.
+    """
+    started = time.perf_counter()
+    budget = warm_budget()
+    spent = recipes_refreshed = searches_refreshed = 0
+
+    try:
+        recipe_ids = most_referenced_recipes(WARM_RECIPE_LIMIT)
+        used, refreshed = warm_recipe_details(recipe_ids, budget, fresh_for=WARM_INTERVAL)
+        spent += used
+        recipes_refreshed += len(refreshed)
+
+        # Keep the shared rows (used by favorites and meal plans) in step
+        # with what was just refetched; the rest have not changed
+        if refreshed:
+            with get_db_connection() as conn:
+                with conn.cursor() as cur:
+                    store_shared_recipes(cur, refreshed)
+    except Exception as exc:
+        print(f"Error warming favorite recipes: {exc}")
+
+    for key in popular_searches(WARM_SEARCH_LIMIT):
+        if spent >= budget or upstream_degraded():
+            break
+        try:
+            entry = search_cache.get(key)
+            if entry is None or entry[1] < time.monotonic() + WARM_INTERVAL:
+                if spent + search_points() > budget:
+                    break
+                results = fetch_search_results(key)
+                spent += search_points()
+                if results is None:
+                    continue
+                searches_refreshed += 1
+            else:
+                results = entry[0]
+            used, refreshed = warm_recipe_details(
+                [r['id'] for r in results], budget - spent
+            )
+            spent += used
+            recipes_refreshed += len(refreshed)
+        except Exception as exc:
+            print(f"Error warming search cache: {exc}")
+
+    warm_stats['runs'] += 1
+    warm_stats['points'] = round(warm_stats['points'] + spent, 2)
+    warm_stats['recipes_refreshed'] += recipes_refreshed
+    warm_stats['searches_refreshed'] += searches_refreshed
+    warm_stats['last_run'] = datetime.now(timezone.utc).isoformat()
+    warm_stats['last_seconds'] = round(time.perf_counter() - started, 3)
+
+
+def hold_warm_lock(conn):
+    """
+    Make sure this process holds the warmer's advisory lock.
+
+    The lock is tied to a dedicated connection (not a pooled one), so it
+    stays held between runs and is released by PostgreSQL if the process
+    dies or the connection drops.
+
+    Args:
+        conn: The connection holding the lock from the last call, or None.
+
+    Returns:
+        psycopg2 connection or None: The connection holding the lock, or
+        None if another process holds it or the database is unreachable.
+    """
+    if conn is not None:
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            return conn
+        except psycopg2.Error:
+            conn.close()
+    try:
+        conn = connect_db()
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_try_advisory_lock(%s) AS locked", (WARM_LOCK_KEY,))
+            locked = cur.fetchone()['locked']
+    except psycopg2.Error as exc:
+        print(f"Error taking the cache warmer lock: {exc}")
+        return None
+    if not locked:
+        conn.close()
+        return None
+    return conn
+
+
+def run_cache_warmer():
+    """
+    Warm the caches now and then every WARM_INTERVAL seconds, while this
+    process holds the warmer lock.
+    """
+    lock_conn = None
+    while not warm_stop.is_set():
+        lock_conn = hold_warm_lock(lock_conn)
+        warm_stats['active'] = lock_conn is not None
+        if lock_conn is not None:
+            try:
+                warm_caches()
+            except Exception as exc:
+                print(f"Error warming caches: {exc}")
+        warm_stop.wait(WARM_INTERVAL)
+    if lock_conn is not None:
+        lock_conn.close()
@@ -0,0 +1,79 @@
+"""
+Micro-benchmark for the diet check used when filtering search results.
+
+Compares a per-call substring scan over the raw API dicts (how the check
+worked before the rules were compiled) with the compiled DIET_PATTERNS.
+Both use the same keyword lists from search.DIET_RULES and start from the
+same raw dicts: the compiled timing includes building each recipe's diet
+text (cache.diet_text), the lowercasing the substring scan also does on
+every call. The batch check on already-built RecipeRecords
+(search.classify_recipes) is shown too, since a search builds the records
+anyway for rendering. The number of recipes the two disagree on is printed
+as well: the compiled rules match whole words and skip lookalike phrases,
+the substring scan does neither.
+
+Usage: python bench/diet_bench.py [recipe count]
+"""
+
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import search  # noqa: E402
+from cache import RecipeRecord, diet_text  # noqa: E402
+
+WORDS = ['tomato', 'onion', 'garlic', 'olive oil', 'basil', 'rice', 'carrot', 'potato',
+         'pepper', 'salt', 'lentils', 'chickpeas', 'spinach', 'lemon', 'parsley',
+         'chicken breast', 'cheddar cheese', 'eggs', 'whole milk', 'salmon fillet']
+
+
+def legacy_is_recipe_valid(info, diet):
+    """Substring scan of the title and ingredient names, rebuilt on every call."""
+    words = search.DIET_RULES[diet][0]
+    title = info.get('title', '').lower()
+    ingredients = [i['name'].lower() for i in info.get('extendedIngredients', [])]
+    return not any(w in title or any(w in ing for ing in ingredients) for w in words)
+
+
+def synthetic_recipes(count, seed=1):
+    """Build `count` recipe dicts with 8-15 random ingredients each."""
+    rng = random.Random(seed)
+    return [
+        {
+            'id': n,
+            'title': f"{rng.choice(WORDS).title()} with {rng.choice(WORDS)}",
+            'extendedIngredients': [{'name': rng.choice(WORDS)} for _ in range(rng.randint(8, 15))]
+        }
+        for n in range(count)
+    ]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    recipes = synthetic_recipes(count)
+    records = [RecipeRecord.from_info(r) for r in recipes]
+    print(f"{count} recipes, best of 5")
+
+    def best(fn):
+        return min(timeit.repeat(fn, number=1, repeat=5))
+
+    def compiled(diet):
+        rule = search.DIET_PATTERNS[diet]
+        return [search.diet_text_allowed(diet_text(r), rule) for r in recipes]
+
+    for diet in ('vegetarian', 'vegan', 'gluten free', 'dairy free'):
+        legacy = best(lambda: [legacy_is_recipe_valid(r, diet) for r in recipes])
+        new = best(lambda: compiled(diet))
+        batch = best(lambda: search.classify_recipes(records, diet))
+        differ = sum(a != b for a, b in zip(compiled(diet), [legacy_is_recipe_valid(r, diet)
+                                                             for r in recipes]))
+        print(f"{diet:<11} substring {legacy * 1000:7.2f} ms  compiled incl. text "
+              f"{new * 1000:7.2f} ms ({legacy / new:.1f}x)  classify_recipes "
+              f"{batch * 1000:7.2f} ms ({legacy / batch:.1f}x)  differ on {differ}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+"""
+End-to-end load test: the app against a local fake Spoonacular.
+
+Starts bench/fake_spoonacular.py in-process (with the given latency and
+error rate), starts program.py as a subprocess pointed at it, logs in a
+bench user and runs bench/load_test.py's run_load() against POST /,
+GET /favorites and GET /shopping_lists, reporting throughput and
+p50/p95/p99 for each. Upstream calls never leave the machine, so runs are
+repeatable and cost no API quota.
+
+/favorites and /shopping_lists need the database (DB_* env vars, as for
+the app) and a logged-in user: the bench user is registered on first use
+and given a few favorites and a shopping list. Without a database only
+POST / is measured.
+
+To catch regressions, save a run with --output and compare later runs with
+--baseline; the exit status is 1 when any p95 is more than --max-regression
+(default 20%) above the baseline.
+
+Usage: python bench/e2e_load.py [--server threaded] [--port 18080]
+                                [--concurrency 20] [--requests 300]
+                                [--latency 80] [--jitter 40] [--error-rate 0.0]
+                                [--output results.json] [--baseline results.json]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import requests
+
+from fake_spoonacular import FakeSpoonacular
+from load_test import format_result, run_load
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+BENCH_USER = {'username': 'bench', 'email': 'bench@example.invalid', 'password': 'bench-password'}
+
+
+def start_app(server, port, upstream_url):
+    """Start program.py on port with the given serving mode, and wait until it answers."""
+    env = dict(os.environ, SERVER=server, HOST='127.0.0.1', PORT=str(port),
+               SPOONACULAR_BASE_URL=upstream_url, API_KEY='bench',
+               RECIPE_CACHE_PERSIST='0')
+    proc = subprocess.Popen([sys.executable, 'program.py'], cwd=ROOT, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"program.py exited with status {proc.returncode}")
+        try:
+            requests.get(url + '/', timeout=1)
+            return proc, url
+        except requests.RequestException:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError('program.py did not start within 30 s')
+
+
+def login(url):
+    """
+    Register (if needed) and log in the bench user, then seed some data.
+
+    Returns:
+        dict or None: The login cookies, or None if login failed
+        (e.g. no database).
+    """
+    session = requests.Session()
+    try:
+        session.post(url + '/register', data=BENCH_USER, timeout=30)
+        resp = session.post(url + '/login', allow_redirects=False, timeout=30,
+                            data={'email': BENCH_USER['email'], 'password': BENCH_USER['password']})
+    except requests.RequestException:
+        return None
+    if resp.status_code not in (302, 303) or 'user_id' not in session.cookies:
+        return None
+
+    # A few favorites and a list, so the pages render real rows
+    for recipe_id in range(1, 9):
+        session.post(url + '/favorite', data={'recipe_id': str(recipe_id)}, timeout=30)
+    session.post(url + '/api/shopping-lists', timeout=30,
+                 json={'name': 'Bench list', 'items': ['tomato', 'onion', 'garlic', 'rice']})
+    return session.cookies.get_dict()
+
+
+def compare(results, baseline, max_regression):
+    """Print p95 changes against a baseline; return True if any exceeds max_regression."""
+    regressed = False
+    for label, result in results.items():
+        before = baseline.get(label)
+        if not before or not before['p95']:
+            continue
+        change = result['p95'] / before['p95'] - 1
+        flag = 'REGRESSION' if change > max_regression else ''
+        regressed = regressed or bool(flag)
+        print(f"{label:<24} p95 {before['p95']:7.1f} -> {result['p95']:7.1f} ms  {change:+.0%} {flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--server', default='threaded', help='SERVER mode for program.py')
+    parser.add_argument('--port', type=int, default=18080)
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--requests', type=int, default=300)
+    parser.add_argument('--ingredients', default='tomato')
+    parser.add_argument('--latency', type=float, default=80.0, help='fake upstream latency (ms)')
+    parser.add_argument('--jitter', type=float, default=40.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--output', help='write results as JSON')
+    parser.add_argument('--baseline', help='compare p95 against a saved --output file')
+    parser.add_argument('--max-regression', type=float, default=0.2)
+    args = parser.parse_args()
+
+    fake = FakeSpoonacular(latency=args.latency, jitter=args.jitter,
+                           error_rate=args.error_rate).start()
+    proc, url = start_app(args.server, args.port, fake.url)
+    try:
+        cookies = login(url)
+        scenarios = [('POST /', 'POST', '/', {'ingredients': args.ingredients})]
+        if cookies:
+            scenarios += [('GET /favorites', 'GET', '/favorites', None),
+                          ('GET /shopping_lists', 'GET', '/shopping_lists', None)]
+        else:
+            print('Login failed (is the database configured?); measuring POST / only')
+
+        results = {}
+        for label, method, path, data in scenarios:
+            results[label] = run_load(url + path, method, data, args.concurrency,
+                                      args.requests, cookies)
+            print(format_result(label, results[label]))
+        print(f"upstream calls: {dict(fake.stats)}")
+    finally:
+        proc.terminate()
+        proc.wait()
+        fake.stop()
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            if compare(results, json.load(f), args.max_regression):
+                return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
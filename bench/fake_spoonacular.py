@@ -0,0 +1,227 @@
+"""
+Local stand-in for the Spoonacular API, for benchmarks and load tests.
+
+Serves /recipes/complexSearch, /recipes/informationBulk and
+/recipes/<id>/information with deterministic synthetic recipes (or canned
+JSON files), with configurable latency, jitter and error rate, and sends
+the X-API-Quota-* headers the quota governor reads. Point the app at it
+with SPOONACULAR_BASE_URL:
+
+    python bench/fake_spoonacular.py --port 18999 --latency 80 --error-rate 0.02
+    SPOONACULAR_BASE_URL=http://127.0.0.1:18999 python program.py
+
+Canned payloads: with --payloads DIR, DIR/complexSearch.json and
+DIR/<id>.json are served instead of synthetic ones when present.
+
+Usage: python bench/fake_spoonacular.py [--host 127.0.0.1] [--port 18999]
+                                        [--latency MS] [--jitter MS]
+                                        [--error-rate 0.0] [--error-status 500]
+                                        [--recipes 5000] [--payloads DIR]
+                                        [--quota 10000000]
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import threading
+import time
+import zlib
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+WORDS = ['tomato', 'onion', 'garlic', 'olive oil', 'basil', 'rice', 'carrot', 'potato',
+         'pepper', 'salt', 'lentils', 'chickpeas', 'spinach', 'lemon', 'parsley',
+         'chicken breast', 'cheddar cheese', 'eggs', 'whole milk', 'salmon fillet',
+         'flour', 'butter', 'pasta', 'beef mince', 'tofu', 'coconut milk', 'shrimp']
+UNITS = [('g', 50, 500), ('ml', 50, 400), ('Tbsp', 1, 4), ('tsp', 1, 3), ('', 1, 4)]
+
+
+def make_recipe(recipe_id):
+    """Return a synthetic /information payload, the same for every call with this id."""
+    rng = random.Random(recipe_id)
+    ingredients = []
+    for name in rng.sample(WORDS, rng.randint(6, 14)):
+        unit, low, high = rng.choice(UNITS)
+        amount = rng.randint(low, high)
+        ingredients.append({
+            'name': name,
+            'originalName': name,
+            'amount': amount,
+            'unit': unit,
+            'measures': {'metric': {'amount': amount, 'unitShort': unit}}
+        })
+    return {
+        'id': recipe_id,
+        'title': f"{rng.choice(WORDS).title()} with {rng.choice(WORDS)} #{recipe_id}",
+        'image': f"https://img.example.invalid/{recipe_id}.jpg",
+        'readyInMinutes': rng.randint(10, 120),
+        'servings': rng.randint(1, 6),
+        'nutrition': {'nutrients': [
+            {'name': 'Calories', 'amount': rng.randint(150, 1200), 'unit': 'kcal'},
+            {'name': 'Protein', 'amount': rng.randint(2, 60), 'unit': 'g'}
+        ]},
+        'extendedIngredients': ingredients,
+        'analyzedInstructions': [{'steps': [
+            {'number': n, 'step': f"Step {n}: prepare the {rng.choice(WORDS)}."}
+            for n in range(1, rng.randint(3, 8) + 1)
+        ]}]
+    }
+
+
+class FakeSpoonacular:
+    """
+    The fake API server, runnable in a background thread.
+
+    Args:
+        host, port: Bind address; port 0 picks a free port.
+        latency (float): Mean added latency per request, in ms.
+        jitter (float): Uniform +/- jitter around the latency, in ms.
+        error_rate (float): Share of requests answered with error_status.
+        error_status (int): Status used for injected errors (e.g. 500, 429).
+        recipes (int): Size of the synthetic recipe corpus.
+        payload_dir (str or None): Directory with canned JSON payloads.
+        seed (int): Seed for latency and error injection.
+        quota (int): Points reported in X-API-Quota-Left. The app paces its
+            calls to make the remaining quota last the day, so keep this
+            large unless that pacing is what is being measured.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, jitter=0.0, error_rate=0.0,
+                 error_status=500, recipes=5000, payload_dir=None, seed=1, quota=10000000):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.recipes = recipes
+        self.payload_dir = payload_dir
+        self.quota = quota
+        self.rng = random.Random(seed)
+        self.rng_lock = threading.Lock()
+        self.stats = Counter()
+        self.server = ThreadingHTTPServer((host, port), self.handler_class())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def canned(self, name):
+        """Return a canned payload from payload_dir, or None."""
+        if not self.payload_dir:
+            return None
+        path = os.path.join(self.payload_dir, f"{name}.json")
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def recipe(self, recipe_id):
+        return self.canned(str(recipe_id)) or make_recipe(recipe_id)
+
+    def search(self, query):
+        """complexSearch body: a stable slice of the corpus per query."""
+        params = parse_qs(query)
+        canned = self.canned('complexSearch')
+        if canned is not None:
+            return canned
+        offset = int(params.get('offset', ['0'])[0])
+        number = int(params.get('number', ['10'])[0])
+        text = params.get('query', [''])[0]
+        # Same query, same results; different queries start at different ids
+        start = zlib.crc32(text.encode('utf-8')) % self.recipes
+        total = min(self.recipes, 900)
+        ids = [(start + n) % self.recipes + 1 for n in range(offset, min(offset + number, total))]
+        results = []
+        for recipe_id in ids:
+            info = self.recipe(recipe_id)
+            results.append({'id': recipe_id, 'title': info['title'], 'image': info['image']})
+        return {'results': results, 'offset': offset, 'number': number, 'totalResults': total}
+
+    def respond(self, path, query):
+        """Return (status, body) for one request."""
+        with self.rng_lock:
+            delay = max(0.0, self.latency + self.rng.uniform(-self.jitter, self.jitter))
+            failed = self.rng.random() < self.error_rate
+        if delay:
+            time.sleep(delay / 1000)
+        if failed:
+            self.stats['errors'] += 1
+            return self.error_status, {'status': 'failure', 'message': 'injected error'}
+
+        if path == '/recipes/complexSearch':
+            self.stats['complexSearch'] += 1
+            return 200, self.search(query)
+        if path == '/recipes/informationBulk':
+            self.stats['informationBulk'] += 1
+            ids = parse_qs(query).get('ids', [''])[0]
+            return 200, [self.recipe(int(i)) for i in ids.split(',') if i.isdigit()]
+        match = re.fullmatch(r'/recipes/(\d+)/information', path)
+        if match:
+            self.stats['information'] += 1
+            return 200, self.recipe(int(match.group(1)))
+        return 404, {'status': 'failure', 'message': 'not found'}
+
+    def handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                status, body = fake.respond(parsed.path, parsed.query)
+                data = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.send_header('X-API-Quota-Used', str(sum(fake.stats.values())))
+                self.send_header('X-API-Quota-Left', str(fake.quota))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=18999)
+    parser.add_argument('--latency', type=float, default=0.0, help='mean added latency (ms)')
+    parser.add_argument('--jitter', type=float, default=0.0, help='+/- jitter (ms)')
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--error-status', type=int, default=500)
+    parser.add_argument('--recipes', type=int, default=5000)
+    parser.add_argument('--payloads', default=None, help='directory with canned JSON payloads')
+    parser.add_argument('--quota', type=int, default=10000000, help='X-API-Quota-Left value')
+    args = parser.parse_args()
+
+    fake = FakeSpoonacular(args.host, args.port, args.latency, args.jitter, args.error_rate,
+                           args.error_status, args.recipes, args.payloads, quota=args.quota)
+    print(f"Fake Spoonacular on {fake.url}")
+    try:
+        fake.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(dict(fake.stats))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+Simple HTTP load test for the running app.
+
+Sends a fixed number of requests from a number of concurrent client
+threads and reports throughput and latency percentiles. Run it once per
+serving mode to compare, for example:
+
+    SERVER=dev python program.py       &  python bench/load_test.py
+    SERVER=threaded python program.py  &  python bench/load_test.py
+
+Usage: python bench/load_test.py [--url URL] [--path /] [--method POST]
+                                 [--data ingredients=tomato]
+                                 [--concurrency 50] [--requests 500]
+"""
+
+import argparse
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl
+
+import requests
+
+
+def percentile(sorted_values, pct):
+    """Return the pct-th percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_load(url, method='GET', data=None, concurrency=50, total=500, cookies=None):
+    """
+    Fire `total` requests at url from `concurrency` threads.
+
+    Returns:
+        dict: requests, errors, seconds, rps and p50/p95/p99 latency in ms.
+    """
+    local = threading.local()
+
+    def one_request(_):
+        # One keep-alive session per client thread
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        started = time.perf_counter()
+        try:
+            resp = session.request(method, url, data=data, cookies=cookies,
+                                   allow_redirects=False, timeout=60)
+            ok = resp.status_code < 400
+        except requests.RequestException:
+            ok = False
+        return ok, (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one_request, range(total)))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(ms for _, ms in results)
+    return {
+        'requests': total,
+        'errors': sum(1 for ok, _ in results if not ok),
+        'seconds': elapsed,
+        'rps': total / elapsed if elapsed else 0.0,
+        'mean': statistics.fmean(latencies) if latencies else 0.0,
+        'p50': percentile(latencies, 50),
+        'p95': percentile(latencies, 95),
+        'p99': percentile(latencies, 99)
+    }
+
+
+def format_result(label, result):
+    """Format one run_load() result as a single report line."""
+    return (
+        f"{label:<24} {result['requests']:>6} req  {result['errors']:>4} err  "
+        f"{result['rps']:>8.1f} req/s  p50 {result['p50']:>7.1f} ms  "
+        f"p95 {result['p95']:>7.1f} ms  p99 {result['p99']:>7.1f} ms"
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--url', default='http://localhost:8080')
+    parser.add_argument('--path', default='/')
+    parser.add_argument('--method', default='POST')
+    parser.add_argument('--data', default='ingredients=tomato')
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--requests', type=int, default=500)
+    args = parser.parse_args(argv)
+
+    data = dict(parse_qsl(args.data)) if args.method != 'GET' else None
+    result = run_load(args.url.rstrip('/') + args.path, args.method, data,
+                      args.concurrency, args.requests)
+    print(format_result(f"{args.method} {args.path}", result))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,71 @@
+"""
+Micro-benchmarks for the per-recipe work in a search request.
+
+Times is_recipe_valid, should_include_recipe and extract_recipe_data over
+a large synthetic result set built with the fake Spoonacular generator
+(bench/fake_spoonacular.py), so the numbers are the same from run to run
+and can be compared before and after a change. Building the RecipeRecords
+is reported on its own, as it happens once per recipe when details are
+fetched.
+
+Usage: python bench/micro_bench.py [--recipes 20000] [--repeat 5]
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import search  # noqa: E402
+from cache import RecipeRecord  # noqa: E402
+from fake_spoonacular import make_recipe  # noqa: E402
+
+# (diet, max_calories, max_time, difficulty) combinations seen in searches
+FILTERS = [
+    ('', None, None, None),
+    ('vegetarian', None, None, None),
+    ('vegan', 600, 45, None),
+    ('', 800, None, 'Easy')
+]
+
+
+def report(label, seconds, count):
+    """Print total time per pass and time per recipe."""
+    print(f"{label:<52} {seconds * 1000:9.2f} ms  {seconds / count * 1e6:7.2f} us/recipe")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--recipes', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    count, repeat = args.recipes, args.repeat
+    infos = [make_recipe(n) for n in range(1, count + 1)]
+    summaries = [{'id': i['id'], 'title': i['title'], 'image': i['image']} for i in infos]
+    print(f"{count} recipes, best of {repeat}")
+
+    def best(fn):
+        return min(timeit.repeat(fn, number=1, repeat=repeat))
+
+    records = [RecipeRecord.from_info(i) for i in infos]
+    report('RecipeRecord.from_info', best(lambda: [RecipeRecord.from_info(i) for i in infos]), count)
+
+    for diet in ('vegetarian', 'vegan'):
+        report(f"is_recipe_valid({diet})",
+               best(lambda: [search.is_recipe_valid(r, diet) for r in records]), count)
+
+    for diet, max_calories, max_time, difficulty in FILTERS:
+        label = f"should_include_recipe({diet or '-'}, {max_calories}, {max_time}, {difficulty})"
+        report(label, best(lambda: [
+            search.should_include_recipe(r, diet, max_calories, max_time, difficulty) for r in records
+        ]), count)
+
+    report('extract_recipe_data',
+           best(lambda: [search.extract_recipe_data(s, r) for s, r in zip(summaries, records)]), count)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Login throughput benchmark for password checks, inline vs the worker pool.
+
+Simulates a login burst: `concurrency` request threads each verify the
+same bcrypt hash until `total` logins are done, once with bcrypt running
+on the request threads (PASSWORD_HASH_WORKERS=0) and once through the
+process pool. A probe thread meanwhile does a small piece of Python work
+every 5 ms, standing in for the other requests the server is handling;
+its p95/max delay shows how much the login burst stalls them.
+
+For the same comparison over HTTP, start the server with
+PASSWORD_HASH_WORKERS=0 and then with the default, and run
+bench/load_test.py --path /login --data email=...&password=... each time.
+
+Usage: python bench/password_bench.py [--concurrency 16] [--logins 64]
+                                      [--rounds 12] [--workers N]
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import program  # noqa: E402
+from load_test import percentile  # noqa: E402
+
+PASSWORD = 'correct horse battery staple'
+
+
+def probe(stop, delays):
+    """Record how late a 5 ms tick of light work runs while logins are busy."""
+    while not stop.is_set():
+        started = time.perf_counter()
+        json.dumps({'id': 1, 'title': 'probe', 'ingredients': ['tomato'] * 20})
+        time.sleep(0.005)
+        delays.append(time.perf_counter() - started - 0.005)
+
+
+def run_logins(password_hash, concurrency, total):
+    """Verify the hash `total` times from `concurrency` threads."""
+    stop = threading.Event()
+    delays = []
+    prober = threading.Thread(target=probe, args=(stop, delays), daemon=True)
+    prober.start()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(
+            lambda _: program.verify_password(PASSWORD, password_hash), range(total)
+        ))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    prober.join()
+    assert all(results)
+    delays.sort()
+    return {
+        'logins_per_second': total / elapsed,
+        'seconds': elapsed,
+        'probe_p95_ms': percentile(delays, 95) * 1000,
+        'probe_max_ms': (delays[-1] if delays else 0.0) * 1000
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--logins', type=int, default=64)
+    parser.add_argument('--rounds', type=int, default=program.BCRYPT_ROUNDS)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    program.BCRYPT_ROUNDS = args.rounds
+    password_hash = program.passwords.hash_password(PASSWORD, args.rounds)
+    print(f"bcrypt cost {args.rounds}, {args.logins} logins from {args.concurrency} threads")
+
+    for label, workers in (('inline', 0), (f"pool ({args.workers} workers)", args.workers)):
+        program.PASSWORD_HASH_WORKERS = workers
+        if workers:
+            # Start the workers before timing so spawn cost isn't counted
+            program.verify_password(PASSWORD, password_hash)
+        result = run_logins(password_hash, args.concurrency, args.logins)
+        print(f"{label:>20}: {result['logins_per_second']:7.1f} logins/s "
+              f"({result['seconds']:.2f} s), other work delayed "
+              f"p95 {result['probe_p95_ms']:.1f} ms, max {result['probe_max_ms']:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+Benchmark for the /shopping_lists query.
+
+Compares the old per-list item query (N+1) with load_shopping_lists() for
+users with a growing number of lists. Both load every list (the page size
+is set to the list count), so they return the same rows. Test data is created inside one
+transaction against the database configured in .env and rolled back at
+the end, so nothing is left behind.
+
+Usage: python bench/shopping_lists_bench.py [list counts ...]
+"""
+
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from psycopg2.extras import RealDictCursor, execute_values  # noqa: E402
+
+import program  # noqa: E402
+from db import connect_db  # noqa: E402
+
+ITEMS_PER_LIST = 15
+REPEATS = 20
+
+
+class CountingCursor(RealDictCursor):
+    """Cursor that counts executed statements."""
+    queries = 0
+
+    def execute(self, query, vars=None):
+        CountingCursor.queries += 1
+        return super().execute(query, vars)
+
+
+def load_n_plus_one(cur, user_id):
+    """The original implementation: one item query per list."""
+    cur.execute("""
+        SELECT id, name, created_at
+        FROM shopping_lists
+        WHERE user_id = %s
+        ORDER BY created_at DESC
+    """, (user_id,))
+    lists = cur.fetchall()
+    for lst in lists:
+        cur.execute("""
+            SELECT id, ingredient, is_purchased
+            FROM shopping_list_items
+            WHERE shopping_list_id = %s
+        """, (lst['id'],))
+        lst['items'] = cur.fetchall()
+    return lists
+
+
+def create_lists(cur, user_id, count):
+    """Give the user `count` lists with ITEMS_PER_LIST items each."""
+    cur.execute("DELETE FROM shopping_lists WHERE user_id = %s", (user_id,))
+    list_ids = execute_values(
+        cur,
+        "INSERT INTO shopping_lists (user_id, name) VALUES %s RETURNING id",
+        [(user_id, f"bench list {n}") for n in range(count)],
+        fetch=True
+    )
+    execute_values(
+        cur,
+        "INSERT INTO shopping_list_items (shopping_list_id, ingredient) VALUES %s",
+        [(row['id'], f"ingredient {n}") for row in list_ids for n in range(ITEMS_PER_LIST)]
+    )
+
+
+def measure(cur, loader):
+    """Return (queries per call, mean ms per call) for a loader."""
+    CountingCursor.queries = 0
+    started = time.perf_counter()
+    for _ in range(REPEATS):
+        loader()
+    elapsed = time.perf_counter() - started
+    return CountingCursor.queries / REPEATS, elapsed / REPEATS * 1000
+
+
+def main():
+    counts = [int(arg) for arg in sys.argv[1:]] or [1, 10, 50, 200]
+    conn = connect_db()
+    try:
+        with conn.cursor(cursor_factory=CountingCursor) as cur:
+            # Unique per run, so it never collides with existing users
+            tag = uuid.uuid4().hex[:12]
+            cur.execute(
+                """
+                INSERT INTO users (username, email, password_hash)
+                VALUES (%s, %s, 'x')
+                RETURNING id
+                """,
+                (f"bench-{tag}", f"bench-{tag}@example.invalid")
+            )
+            user_id = cur.fetchone()['id']
+
+            print(f"{'lists':>6} {'old queries':>12} {'old ms':>8} {'new queries':>12} {'new ms':>8}")
+            for count in counts:
+                create_lists(cur, user_id, count)
+                old_q, old_ms = measure(cur, lambda: load_n_plus_one(cur, user_id))
+                new_q, new_ms = measure(cur, lambda: program.load_shopping_lists(cur, user_id, limit=count))
+                print(f"{count:>6} {old_q:>12.0f} {old_ms:>8.2f} {new_q:>12.0f} {new_ms:>8.2f}")
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,636 @@
+"""
+Recipe details: normalized records, the two-tier detail cache and the
+local ingredient index.
+
+Details are resolved from the in-process LRU, then the persistent
+recipe_cache table, and only then from Spoonacular (informationBulk,
+chunked and fetched concurrently). Every detail written to the cache is
+also indexed by ingredient so searches can be answered locally.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+
+from psycopg2.extras import Json, execute_values
+
+from config import (
+    BULK_CHUNK_SIZE, DETAIL_FETCH_WORKERS, RECIPE_CACHE_PERSIST, RECIPE_CACHE_SIZE,
+    RECIPE_CACHE_TTL, RECIPE_INDEX_MAX, RECIPE_NEGATIVE_TTL, SEARCH_DEADLINE_SECONDS
+)
+from db import get_db_connection
+from upstream import (
+    NOT_FOUND, fetch_recipe_from_api, get_detailed_recipes_bulk, upstream_degraded
+)
+
+# Shared pool so the concurrency limit holds across simultaneous searches
+detail_executor = ThreadPoolExecutor(
+    max_workers=DETAIL_FETCH_WORKERS, thread_name_prefix='recipe-detail'
+)
+
+class LRUCache:
+    """
+    Thread-safe, size-bounded LRU cache with per-entry TTL.
+
+    Entries past their TTL are treated as misses and dropped on access.
+    When full, the least recently used entry is evicted. Counters for
+    hits, misses and evictions are kept in `stats`.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expired': 0}
+
+    def get(self, key, default=None):
+        """Return the cached value for key, or default on miss/expiry."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.stats['misses'] += 1
+                return default
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.stats['expired'] += 1
+                self.stats['misses'] += 1
+                return default
+            self._data.move_to_end(key)
+            self.stats['hits'] += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        """Store value under key for ttl seconds (defaults to the cache TTL)."""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def delete(self, key):
+        """Drop key from the cache if present."""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+
+recipe_cache = LRUCache(RECIPE_CACHE_SIZE, RECIPE_CACHE_TTL)
+recipe_cache_db_stats = {'hits': 0, 'misses': 0, 'errors': 0}
+recipe_cache_db_stats_lock = threading.Lock()
+
+
+def count_recipe_cache_db(event, amount=1):
+    """Add to one of the recipe_cache_db_stats counters (from any detail-pool thread)."""
+    with recipe_cache_db_stats_lock:
+        recipe_cache_db_stats[event] += amount
+
+
+def difficulty_for(minutes):
+    """Classify a recipe's difficulty from its total time in minutes."""
+    return 'Easy' if minutes < 30 else 'Mid' if minutes < 60 else 'Hard'
+
+
+def ingredient_amount(ingredient):
+    """Return (name, amount, unit) for an extendedIngredients item, preferring metric."""
+    metric = ingredient.get('measures', {}).get('metric') or {}
+    if metric.get('amount') is not None:
+        amount, unit = metric['amount'], metric.get('unitShort', '')
+    else:
+        amount, unit = ingredient.get('amount'), ingredient.get('unit', '')
+    return (ingredient['name'].strip().lower(), amount, (unit or '').strip().lower())
+
+
+# Spoonacular's boolean diet flags, and its spellings of diet labels that
+# differ from the diet names the search form sends
+DIET_FLAGS = {
+    'vegetarian': 'vegetarian', 'vegan': 'vegan',
+    'glutenFree': 'gluten free', 'dairyFree': 'dairy free'
+}
+DIET_LABEL_ALIASES = {
+    'lacto ovo vegetarian': 'vegetarian', 'pescatarian': 'pescetarian',
+    'paleolithic': 'paleo', 'fodmap friendly': 'low fodmap', 'whole 30': 'whole30'
+}
+
+
+def diet_labels(info):
+    """
+    Collect the diets Spoonacular says a recipe fits, named as in searches.
+
+    Returns:
+        frozenset or None: Lowercase diet names from the `diets` list and the
+        boolean flags, or None if the payload carries neither.
+    """
+    if 'diets' not in info and not any(flag in info for flag in DIET_FLAGS):
+        return None
+    labels = {label.lower() for label in info.get('diets') or ()}
+    labels |= {DIET_LABEL_ALIASES[label] for label in labels if label in DIET_LABEL_ALIASES}
+    labels |= {name for flag, name in DIET_FLAGS.items() if info.get(flag)}
+    return frozenset(labels)
+
+
+def diet_text(info):
+    """Title and ingredient names, one per line and lowercased, for the diet rules."""
+    names = [i.get('name', '') for i in info.get('extendedIngredients', [])]
+    return "\n".join([info.get('title', '')] + names).lower()
+
+
+class RecipeRecord:
+    """
+    Compact, normalized recipe built once from the raw API detail info.
+
+    Holds only what filtering and rendering need, so the large raw payload
+    (full nutrition breakdown, ingredient metadata, ...) can be dropped right
+    after parsing. Nutrients are kept as name -> (amount, unit) for O(1)
+    lookup.
+    """
+
+    __slots__ = (
+        'id', 'title', 'image', 'ready_in_minutes', 'servings', 'difficulty',
+        'nutrients', 'instructions', 'ingredients', 'ingredient_names',
+        'ingredient_amounts', 'diet_text', 'diets'
+    )
+
+    @classmethod
+    def from_info(cls, info):
+        """Build a record from a /information or informationBulk item."""
+        recipe = cls()
+        recipe.id = info.get('id')
+        recipe.title = info.get('title', '')
+        recipe.image = info.get('image', '')
+        recipe.ready_in_minutes = info.get('readyInMinutes', 0)
+        recipe.servings = info.get('servings', 'Unknown')
+        recipe.difficulty = difficulty_for(recipe.ready_in_minutes)
+        recipe.nutrients = {
+            n['name']: (n['amount'], n['unit'])
+            for n in info.get('nutrition', {}).get('nutrients', [])
+        }
+
+        # Instructions
+        steps = info.get('analyzedInstructions', [])
+        if steps and steps[0].get('steps'):
+            recipe.instructions = (
+                "<ol>" +
+                "".join(f"<li>{step['step']}</li>" for step in steps[0]['steps']) +
+                "</ol>"
+            )
+        else:
+            recipe.instructions = info.get('instructions', 'No instructions provided.')
+
+        # Ingredients list
+        raw_ings = info.get('extendedIngredients', [])
+        recipe.ingredients = [
+            " ".join(filter(None, [
+                str(i.get('amount', '')).strip(),
+                i.get('unit', '').strip(),
+                i.get('originalName', '').strip()
+            ])).strip()
+            for i in raw_ings
+        ]
+        recipe.ingredient_names = tuple(i.get('name', '') for i in raw_ings)
+        # (name, amount, unit) in metric where the API gives it, for summing
+        # quantities across a week's meal plan
+        recipe.ingredient_amounts = tuple(
+            ingredient_amount(i) for i in raw_ings if i.get('name')
+        )
+
+        recipe.diet_text = diet_text(info)
+        # Spoonacular's own diet labels, trusted over the rules when present
+        recipe.diets = diet_labels(info)
+        return recipe
+
+    @property
+    def calories(self):
+        """Calorie amount, or None if the API gave no nutrition."""
+        kcal = self.nutrients.get('Calories')
+        return kcal[0] if kcal else None
+
+    @property
+    def nutrition(self):
+        """Calories formatted for display."""
+        kcal = self.nutrients.get('Calories')
+        return f"{kcal[0]} {kcal[1]}" if kcal else 'Information missing'
+
+
+def load_cached_recipes(recipe_ids, include_expired=False):
+    """
+    Look up recipe details in the persistent recipe_cache table.
+
+    Args:
+        recipe_ids (list): Recipe IDs to look up.
+        include_expired (bool): Also return expired rows, used as a fallback
+            while the upstream is unavailable.
+
+    Returns:
+        dict: Recipe ID -> RecipeRecord (or NOT_FOUND) for every matching row.
+    """
+    if not RECIPE_CACHE_PERSIST or not recipe_ids:
+        return {}
+    try:
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT recipe_id, data
+                    FROM recipe_cache
+                    WHERE recipe_id = ANY(%s) AND (%s OR expires_at > now())
+                """, (list(recipe_ids), include_expired))
+                rows = cur.fetchall()
+    except Exception as exc:
+        count_recipe_cache_db('errors')
+        print(f"Error reading recipe cache: {exc}")
+        return {}
+
+    found = {
+        row['recipe_id']: RecipeRecord.from_info(row['data']) if row['data'] else NOT_FOUND
+        for row in rows
+    }
+    count_recipe_cache_db('hits', len(found))
+    count_recipe_cache_db('misses', len(recipe_ids) - len(found))
+    return found
+
+
+def store_cached_recipes(details):
+    """
+    Write recipe details to both cache tiers.
+
+    The in-process tier holds RecipeRecords; the raw info is only written to
+    the persistent tier.
+
+    Args:
+        details (dict): Recipe ID -> raw info, or NOT_FOUND for IDs the API
+            did not return. Those get the shorter negative TTL.
+
+    Returns:
+        dict: Recipe ID -> RecipeRecord or NOT_FOUND.
+    """
+    records = {}
+    for recipe_id, info in details.items():
+        record = RecipeRecord.from_info(info) if info else NOT_FOUND
+        records[recipe_id] = record
+        recipe_cache.set(recipe_id, record, RECIPE_CACHE_TTL if info else RECIPE_NEGATIVE_TTL)
+        if record:
+            recipe_index.add(recipe_id, record.ingredient_names)
+
+    if not RECIPE_CACHE_PERSIST or not details:
+        return records
+    rows = [
+        (recipe_id, Json(info) if info else None,
+         RECIPE_CACHE_TTL if info else RECIPE_NEGATIVE_TTL)
+        for recipe_id, info in details.items()
+    ]
+    try:
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                execute_values(cur, """
+                    INSERT INTO recipe_cache (recipe_id, data, expires_at)
+                    VALUES %s
+                    ON CONFLICT (recipe_id) DO UPDATE
+                    SET data = EXCLUDED.data,
+                        fetched_at = now(),
+                        expires_at = EXCLUDED.expires_at
+                """, rows, template="(%s, %s, now() + make_interval(secs => %s))")
+            conn.commit()
+    except Exception as exc:
+        count_recipe_cache_db('errors')
+        print(f"Error writing recipe cache: {exc}")
+    return records
+
+
+def get_cached_recipes(recipe_ids):
+    """
+    Resolve recipe IDs from the in-process cache, then the persistent tier.
+
+    Persistent hits are promoted into the in-process cache.
+
+    Returns:
+        tuple: (found, missing) where found maps recipe ID -> RecipeRecord
+        or NOT_FOUND and missing lists IDs neither tier knows about.
+    """
+    found = {}
+    missing = []
+    for recipe_id in recipe_ids:
+        recipe = recipe_cache.get(recipe_id)
+        if recipe is None:
+            missing.append(recipe_id)
+        else:
+            found[recipe_id] = recipe
+
+    if missing:
+        from_db = load_cached_recipes(missing)
+        for recipe_id, recipe in from_db.items():
+            recipe_cache.set(recipe_id, recipe, RECIPE_CACHE_TTL if recipe else RECIPE_NEGATIVE_TTL)
+        found.update(from_db)
+        missing = [recipe_id for recipe_id in missing if recipe_id not in from_db]
+    return found, missing
+
+
+# --- Local recipe corpus ---
+
+def normalize_word(word):
+    """Reduce an ingredient word to a crude singular form ("tomatoes" -> "tomato")."""
+    if word.endswith('ies') and len(word) > 4:
+        return word[:-3] + 'y'
+    if word.endswith('oes'):
+        return word[:-2]
+    if word.endswith('s') and not word.endswith('ss') and len(word) > 3:
+        return word[:-1]
+    return word
+
+
+def ingredient_words(name):
+    """Split an ingredient name into a frozenset of normalized words."""
+    words = "".join(c if c.isalnum() else ' ' for c in name.lower()).split()
+    return frozenset(normalize_word(word) for word in words)
+
+
+class RecipeIndex:
+    """
+    In-memory inverted index from ingredient words to recipe IDs.
+
+    Built from recipe details the app has already fetched (the recipe_cache
+    table is the persistent store), so searches can be answered locally.
+    Only ingredient words are kept per recipe; the details themselves stay
+    in the recipe cache. Once `maxsize` recipes are indexed, the one added
+    longest ago is dropped for each new one.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._postings = {}              # word -> set of recipe IDs
+        self._recipes = OrderedDict()    # recipe ID -> list of ingredient word sets, oldest first
+        self._lock = threading.Lock()
+
+    def add(self, recipe_id, ingredient_names):
+        """Index a recipe from its ingredient names."""
+        names = [ingredient_words(name or '') for name in ingredient_names]
+        names = [words for words in names if words]
+        if not names:
+            return
+        with self._lock:
+            if recipe_id in self._recipes:
+                self._recipes.move_to_end(recipe_id)
+                return
+            while len(self._recipes) >= self.maxsize:
+                self._evict_oldest()
+            self._recipes[recipe_id] = names
+            for words in names:
+                for word in words:
+                    self._postings.setdefault(word, set()).add(recipe_id)
+
+    def _evict_oldest(self):
+        """Drop the recipe indexed longest ago. Call with the lock held."""
+        recipe_id, names = self._recipes.popitem(last=False)
+        for words in names:
+            for word in words:
+                posting = self._postings.get(word)
+                if posting is not None:
+                    posting.discard(recipe_id)
+                    if not posting:
+                        del self._postings[word]
+
+    def search(self, query, limit):
+        """
+        Rank indexed recipes by how many of the query ingredients they use.
+
+        Args:
+            query (tuple): Ingredient phrases from normalize_ingredients().
+            limit (int): Max number of recipe IDs to return.
+
+        Returns:
+            list: Recipe IDs, best coverage first. Ties go to recipes with
+            fewer other ingredients (less to buy).
+        """
+        wanted = [ingredient_words(phrase) for phrase in query]
+        wanted = [words for words in wanted if words]
+        if not wanted:
+            return []
+
+        with self._lock:
+            candidates = set()
+            for words in wanted:
+                candidates.update(self._postings.get(next(iter(words)), ()))
+
+            scored = []
+            for recipe_id in candidates:
+                names = self._recipes[recipe_id]
+                covered = sum(
+                    1 for words in wanted if any(words <= name for name in names)
+                )
+                if covered:
+                    scored.append((-covered, len(names), recipe_id))
+
+        scored.sort()
+        return [recipe_id for _, _, recipe_id in scored[:limit]]
+
+    def __len__(self):
+        return len(self._recipes)
+
+
+recipe_index = RecipeIndex(RECIPE_INDEX_MAX)
+
+
+def load_recipe_index():
+    """Fill the local ingredient index from the persistent recipe_cache table."""
+    if not RECIPE_CACHE_PERSIST:
+        return
+    try:
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                # Pull ingredient names only, not the full payloads. The newest
+                # rows are added last, so they are the last to be evicted.
+                cur.execute("""
+                    SELECT recipe_id, ingredient_names
+                    FROM (
+                        SELECT recipe_id, fetched_at,
+                               ARRAY(
+                                   SELECT i->>'name'
+                                   FROM jsonb_array_elements(data->'extendedIngredients') AS i
+                               ) AS ingredient_names
+                        FROM recipe_cache
+                        WHERE data IS NOT NULL
+                        ORDER BY fetched_at DESC
+                        LIMIT %s
+                    ) AS newest
+                    ORDER BY fetched_at
+                """, (RECIPE_INDEX_MAX,))
+                for row in cur:
+                    recipe_index.add(row['recipe_id'], row['ingredient_names'])
+    except Exception as exc:
+        print(f"Error loading recipe index: {exc}")
+
+
+def get_detailed_recipe(recipe_id):
+    """Fetch a recipe's RecipeRecord, served from cache when possible."""
+    found, missing = get_cached_recipes([recipe_id])
+    if not missing:
+        return found[recipe_id] or None
+
+    info = fetch_recipe_from_api(recipe_id)
+    if info is None:
+        # Upstream down – an expired copy is better than nothing
+        return load_cached_recipes([recipe_id], include_expired=True).get(recipe_id) or None
+    return store_cached_recipes({recipe_id: info})[recipe_id] or None
+
+
+def chunk_ids(recipe_ids, size=None):
+    """Split a list of recipe IDs into chunks of at most `size` IDs."""
+    size = size or BULK_CHUNK_SIZE
+    return [recipe_ids[i:i + size] for i in range(0, len(recipe_ids), size)]
+
+
+def iter_detailed_batches(recipe_ids, deadline=None, chunk_size=None):
+    """
+    Yield detailed info for several recipes a batch at a time, as soon as
+    each batch becomes available.
+
+    IDs already in the recipe cache are yielded first. The rest are split
+    into chunks of `chunk_size` (default BULK_CHUNK_SIZE), each chunk is one
+    informationBulk request, and chunks run concurrently on the shared detail
+    pool. Chunks not finished when the deadline passes are dropped, so the
+    caller still gets partial results. Chunks not started yet are cancelled
+    when the deadline passes or the generator is closed early.
+
+    Args:
+        recipe_ids (list): Recipe IDs to resolve.
+        deadline (float or None): Seconds to wait in total, defaults to
+            SEARCH_DEADLINE_SECONDS.
+        chunk_size (int or None): IDs per upstream request.
+
+    Yields:
+        dict: Recipe ID -> RecipeRecord or NOT_FOUND, one dict for the cached
+        IDs and one per finished chunk, in completion order. IDs that failed
+        or timed out are not yielded.
+    """
+    if deadline is None:
+        deadline = SEARCH_DEADLINE_SECONDS
+
+    found, missing = get_cached_recipes(recipe_ids)
+    if found:
+        yield found
+
+    futures = {
+        detail_executor.submit(get_detailed_recipes_bulk, chunk): chunk
+        for chunk in chunk_ids(missing, chunk_size)
+    }
+    resolved = set()
+    try:
+        for future in as_completed(futures, timeout=deadline):
+            try:
+                result = future.result()
+            except Exception as exc:
+                print(f"Error fetching recipe details: {exc}")
+                continue
+            if result is None:
+                continue
+            # IDs missing from a successful response go to the negative cache
+            chunk = futures[future]
+            records = store_cached_recipes({
+                recipe_id: result.get(recipe_id) or NOT_FOUND for recipe_id in chunk
+            })
+            resolved.update(chunk)
+            yield records
+    except FuturesTimeoutError:
+        pass
+    finally:
+        # Deadline passed or the caller stopped early (GeneratorExit) – don't
+        # let queued lookups run for nobody
+        for future in futures:
+            future.cancel()
+
+    if upstream_degraded():
+        # Upstream down or out of quota – fall back to expired copies for what is still missing
+        unresolved = [recipe_id for recipe_id in missing if recipe_id not in resolved]
+        stale = load_cached_recipes(unresolved, include_expired=True)
+        if stale:
+            yield stale
+
+
+def iter_detailed_recipes(recipe_ids, deadline=None, chunk_size=None):
+    """
+    Yield detailed info for several recipes as soon as each becomes available.
+
+    See iter_detailed_batches() for caching, chunking and the deadline.
+
+    Yields:
+        tuple: (recipe_id, RecipeRecord or NOT_FOUND), in completion order.
+    """
+    batches = iter_detailed_batches(recipe_ids, deadline, chunk_size)
+    try:
+        for batch in batches:
+            yield from batch.items()
+    finally:
+        # Closing this generator early must cancel the queued chunks too
+        batches.close()
+
+
+def fetch_detailed_recipes(recipe_ids, deadline=None):
+    """
+    Fetch detailed info for several recipes using bulk upstream calls.
+
+    See iter_detailed_recipes() for caching, chunking and the deadline.
+
+    Args:
+        recipe_ids (list): Recipe IDs in the order they should be returned.
+        deadline (float or None): Seconds to wait in total, defaults to
+            SEARCH_DEADLINE_SECONDS.
+
+    Returns:
+        list: (recipe_id, RecipeRecord) tuples in input order; the record
+        is None for lookups that failed or timed out.
+    """
+    found = dict(iter_detailed_recipes(recipe_ids, deadline))
+    return [(recipe_id, found.get(recipe_id) or None) for recipe_id in recipe_ids]
+
+
+def store_shared_recipes(cur, records):
+    """
+    Insert or refresh rows in the shared recipes table.
+
+    Every user's favorites point at these rows, so a recipe is stored once
+    however many users save it.
+
+    Args:
+        cur: Database cursor.
+        records (list): RecipeRecord instances to store.
+    """
+    rows = [
+        (
+            record.id, record.title, record.image, record.difficulty,
+            record.ready_in_minutes,
+            record.servings if isinstance(record.servings, int) else None,
+            record.nutrition, record.instructions, Json(record.ingredients),
+            Json([
+                {'name': name, 'amount': amount, 'unit': unit}
+                for name, amount, unit in record.ingredient_amounts
+            ])
+        )
+        for record in records
+    ]
+    if not rows:
+        return
+    execute_values(cur, """
+        INSERT INTO recipes (
+            recipe_id, title, image, difficulty, ready_in_minutes,
+            servings, nutrition, instructions, ingredients, ingredient_amounts
+        )
+        VALUES %s
+        ON CONFLICT (recipe_id) DO UPDATE
+        SET title = EXCLUDED.title,
+            image = EXCLUDED.image,
+            difficulty = EXCLUDED.difficulty,
+            ready_in_minutes = EXCLUDED.ready_in_minutes,
+            servings = EXCLUDED.servings,
+            nutrition = EXCLUDED.nutrition,
+            instructions = EXCLUDED.instructions,
+            ingredients = EXCLUDED.ingredients,
+            ingredient_amounts = EXCLUDED.ingredient_amounts,
+            updated_at = now()
+    """, rows)
@@ -0,0 +1,140 @@
+"""
+Settings for the "Recept från kylen" web service, read from the environment.
+
+Values from a .env file next to program.py are loaded first; variables
+already set in the environment take precedence. Each module imports the
+settings it uses from here.
+"""
+
+import os
+
+from dotenv import load_dotenv
+
+BASE_DIR = os.path.dirname(__file__)
+load_dotenv()
+
+# Retrieve API credentials from environment variables for secure access
+API_KEY = os.getenv('API_KEY')
+SECRET_KEY = os.getenv('SECRET_KEY')
+# Seconds the username cookie is trusted before it is re-read from the
+# database, so a rename made in another session shows up within this time
+USERNAME_COOKIE_MAX_AGE = int(os.getenv('USERNAME_COOKIE_MAX_AGE', '3600'))
+
+# Upstream base URL, overridable so a local stub server can stand in for Spoonacular
+SPOONACULAR_BASE_URL = os.getenv('SPOONACULAR_BASE_URL', 'https://api.spoonacular.com').rstrip('/')
+# Max recipe IDs per informationBulk request, and the smaller chunk size used by
+# the streaming search so the first cards arrive sooner
+BULK_CHUNK_SIZE = int(os.getenv('BULK_CHUNK_SIZE', '50'))
+STREAM_CHUNK_SIZE = int(os.getenv('STREAM_CHUNK_SIZE', '4'))
+
+# Upstream client: timeouts (seconds), retries on 429/5xx with jittered backoff,
+# and a circuit breaker that opens after BREAKER_THRESHOLD consecutive failures
+UPSTREAM_CONNECT_TIMEOUT = float(os.getenv('UPSTREAM_CONNECT_TIMEOUT', '3.05'))
+UPSTREAM_READ_TIMEOUT = float(os.getenv('UPSTREAM_READ_TIMEOUT', '10'))
+UPSTREAM_RETRIES = int(os.getenv('UPSTREAM_RETRIES', '2'))
+UPSTREAM_BACKOFF = float(os.getenv('UPSTREAM_BACKOFF', '0.5'))
+BREAKER_THRESHOLD = int(os.getenv('BREAKER_THRESHOLD', '5'))
+BREAKER_RESET_SECONDS = float(os.getenv('BREAKER_RESET_SECONDS', '30'))
+
+# Quota governor: a token bucket of quota points (max refill per second and
+# bucket size; the refill slows down so the daily quota lasts until the
+# reset), longest wait for tokens, and daily points kept in reserve before
+# serving from cache only
+UPSTREAM_RATE = float(os.getenv('UPSTREAM_RATE', '20'))
+UPSTREAM_BURST = int(os.getenv('UPSTREAM_BURST', '60'))
+UPSTREAM_MAX_WAIT = float(os.getenv('UPSTREAM_MAX_WAIT', '2'))
+QUOTA_RESERVE = float(os.getenv('QUOTA_RESERVE', '10'))
+
+# Detail-fetch fan-out: max concurrent upstream lookups and per-search deadline
+DETAIL_FETCH_WORKERS = int(os.getenv('DETAIL_FETCH_WORKERS', '8'))
+SEARCH_DEADLINE_SECONDS = float(os.getenv('SEARCH_DEADLINE_SECONDS', '8'))
+
+# Password hashing: bcrypt cost factor, worker processes (0 hashes on the
+# request thread), max hashes queued or running, and how long a request
+# waits for a queue slot before it's turned away (seconds). Every gunicorn
+# worker starts its own hashing processes, so SERVER=gunicorn defaults to 2
+# per worker instead of one per CPU.
+BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', '12'))
+PASSWORD_HASH_WORKERS = int(os.getenv(
+    'PASSWORD_HASH_WORKERS',
+    '2' if os.getenv('SERVER') == 'gunicorn' else str(os.cpu_count() or 1)
+))
+PASSWORD_HASH_QUEUE = int(os.getenv('PASSWORD_HASH_QUEUE', '32'))
+PASSWORD_HASH_WAIT = float(os.getenv('PASSWORD_HASH_WAIT', '2'))
+
+# Database pool sizing, checkout timeout and idle time before a health check (seconds)
+DB_POOL_MIN = int(os.getenv('DB_POOL_MIN', '1'))
+DB_POOL_MAX = int(os.getenv('DB_POOL_MAX', '10'))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '5'))
+DB_POOL_CHECK_AFTER = float(os.getenv('DB_POOL_CHECK_AFTER', '30'))
+
+# Serving mode: 'dev' (bottle's single-threaded debug server), 'threaded',
+# 'waitress' or 'gunicorn', plus bind address and worker/thread counts
+SERVER = os.getenv('SERVER', 'dev')
+HOST = os.getenv('HOST', 'localhost')
+PORT = int(os.getenv('PORT', '8080'))
+WORKERS = int(os.getenv('WORKERS', '4'))
+THREADS = int(os.getenv('THREADS', '64'))
+
+# Recipes shown per search, and max recipes held in the local ingredient index
+SEARCH_RESULT_COUNT = int(os.getenv('SEARCH_RESULT_COUNT', '20'))
+# /api/search: results per upstream complexSearch page, largest page a client
+# may ask for, and max upstream pages fetched to fill one page of results
+UPSTREAM_PAGE_SIZE = int(os.getenv('UPSTREAM_PAGE_SIZE', '20'))
+API_SEARCH_MAX_LIMIT = int(os.getenv('API_SEARCH_MAX_LIMIT', '50'))
+API_SEARCH_PAGE_BUDGET = int(os.getenv('API_SEARCH_PAGE_BUDGET', '3'))
+RECIPE_INDEX_MAX = int(os.getenv('RECIPE_INDEX_MAX', '50000'))
+
+# Compiled templates are kept for the life of the process unless TEMPLATE_RELOAD=1;
+# rendered recipe cards are cached per recipe ID (not with TEMPLATE_RELOAD=1)
+TEMPLATE_RELOAD = os.getenv('TEMPLATE_RELOAD', '0') == '1'
+CARD_CACHE_SIZE = int(os.getenv('CARD_CACHE_SIZE', '2000'))
+
+# Opt-in request profiling: with PROFILE_REQUESTS=1 and a PROFILE_TOKEN set, a
+# request whose X-Profile header matches the token runs under cProfile and its
+# stats are written to PROFILE_DIR, keeping the newest PROFILE_KEEP files
+PROFILE_REQUESTS = os.getenv('PROFILE_REQUESTS', '0') == '1'
+PROFILE_TOKEN = os.getenv('PROFILE_TOKEN', '')
+PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join(BASE_DIR, 'profiles'))
+PROFILE_KEEP = int(os.getenv('PROFILE_KEEP', '50'))
+
+# /metrics and /api/stats: open to the client addresses in METRICS_ALLOW
+# (comma-separated, local only by default) and to requests sending
+# "Authorization: Bearer <METRICS_TOKEN>" when a token is set
+METRICS_ALLOW = {addr.strip() for addr in os.getenv('METRICS_ALLOW', '127.0.0.1,::1').split(',')
+                 if addr.strip()}
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+# Per-stage timings in a Server-Timing header on every response; on by
+# default only with the dev server, since they reveal internals
+SERVER_TIMING = os.getenv('SERVER_TIMING', '1' if SERVER == 'dev' else '0') == '1'
+
+# Static assets: fingerprinted, precompressed and served from memory unless
+# ASSET_PIPELINE=0; STATIC_BUNDLE_JS=1 also joins each page's scripts into one file
+ASSET_PIPELINE = os.getenv('ASSET_PIPELINE', '1') == '1'
+STATIC_BUNDLE_JS = os.getenv('STATIC_BUNDLE_JS', '0') == '1'
+STATIC_DIR = os.path.join(BASE_DIR, 'static')
+
+# Shopping lists shown per page on /shopping_lists, and recipes per page on /favorites
+SHOPPING_LISTS_PAGE_SIZE = int(os.getenv('SHOPPING_LISTS_PAGE_SIZE', '20'))
+FAVORITES_PAGE_SIZE = int(os.getenv('FAVORITES_PAGE_SIZE', '24'))
+
+# Recipe detail cache: in-process LRU size, TTLs (seconds) and persistent tier toggle
+RECIPE_CACHE_SIZE = int(os.getenv('RECIPE_CACHE_SIZE', '2000'))
+RECIPE_CACHE_TTL = int(os.getenv('RECIPE_CACHE_TTL', str(24 * 3600)))
+RECIPE_NEGATIVE_TTL = int(os.getenv('RECIPE_NEGATIVE_TTL', '600'))
+RECIPE_CACHE_PERSIST = os.getenv('RECIPE_CACHE_PERSIST', '1') == '1'
+
+# Search-result cache: entries are fresh for SEARCH_CACHE_TTL seconds, then served
+# stale for up to SEARCH_CACHE_STALE more seconds while a background refresh runs
+SEARCH_CACHE_SIZE = int(os.getenv('SEARCH_CACHE_SIZE', '500'))
+SEARCH_CACHE_TTL = int(os.getenv('SEARCH_CACHE_TTL', '600'))
+SEARCH_CACHE_STALE = int(os.getenv('SEARCH_CACHE_STALE', '3600'))
+
+# Cache warmer: seconds between runs (0 disables it), quota points one run may
+# spend, most-referenced recipes and most popular searches it keeps fresh, and
+# the daily quota points it always leaves for user traffic
+WARM_INTERVAL = int(os.getenv('WARM_INTERVAL', '1800'))
+WARM_POINT_BUDGET = float(os.getenv('WARM_POINT_BUDGET', '100'))
+WARM_RECIPE_LIMIT = int(os.getenv('WARM_RECIPE_LIMIT', '200'))
+WARM_SEARCH_LIMIT = int(os.getenv('WARM_SEARCH_LIMIT', '10'))
+WARM_MIN_QUOTA_LEFT = float(os.getenv('WARM_MIN_QUOTA_LEFT', '50'))
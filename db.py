@@ -0,0 +1,193 @@
+"""
+PostgreSQL access: a process-wide connection pool and instrumented cursors.
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import extensions
+from psycopg2.extras import RealDictCursor
+from psycopg2.pool import PoolError
+
+from config import DB_POOL_CHECK_AFTER, DB_POOL_MAX, DB_POOL_MIN, DB_POOL_TIMEOUT
+from metrics import count_metric, observe_metric, span
+
+class InstrumentedCursor(RealDictCursor):
+    """RealDictCursor that counts and times every query it runs."""
+
+    def execute(self, query, vars=None):
+        count_metric('db_queries_total')
+        with span('db'):
+            return super().execute(query, vars)
+
+
+def connect_db():
+    """
+    Create and return a new database connection.
+
+    Uses environment variables for host, port, dbname, user, and password.
+    The cursor_factory is InstrumentedCursor, a RealDictCursor for dict-like
+    fetches that also counts and times queries.
+
+    Returns: psycopg2 connection object
+    """
+    return psycopg2.connect(
+        host=os.getenv('DB_HOST'),
+        port=os.getenv('DB_PORT'),
+        dbname=os.getenv('DB_NAME'),
+        user=os.getenv('DB_USER'),
+        password=os.getenv('DB_PASSWORD'),
+        cursor_factory=InstrumentedCursor
+    )
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of PostgreSQL connections shared by the whole process.
+
+    Keeps between `minconn` and `maxconn` connections open. Checkout blocks
+    for up to `timeout` seconds when every connection is in use and then
+    raises PoolError. Connections idle longer than `check_after` seconds are
+    pinged before being handed out and replaced if they are dead.
+    """
+
+    def __init__(self, minconn, maxconn, timeout, check_after, connect=connect_db):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.check_after = check_after
+        self._connect = connect
+        self._idle = []          # (connection, returned_at) pairs
+        self._size = 0           # open connections, idle + in use
+        self._waiting = 0
+        self._cond = threading.Condition()
+        self.stats = {
+            'checkouts': 0, 'timeouts': 0, 'reconnects': 0,
+            'checkout_seconds_total': 0.0, 'checkout_seconds_max': 0.0
+        }
+
+    def _open(self):
+        """Open a new connection outside the lock, undoing the reservation on failure."""
+        try:
+            return self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+    def _healthy(self, conn, returned_at):
+        """Return True if conn is usable, pinging it when it has been idle a while."""
+        if conn.closed:
+            return False
+        if time.monotonic() - returned_at < self.check_after:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def getconn(self):
+        """Check a connection out of the pool."""
+        started = time.monotonic()
+        deadline = started + self.timeout
+        with self._cond:
+            while not self._idle and self._size >= self.maxconn:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.stats['timeouts'] += 1
+                    raise PoolError("database connection pool exhausted")
+                self._waiting += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+            if self._idle:
+                conn, returned_at = self._idle.pop()
+            else:
+                conn, returned_at = None, None
+                self._size += 1
+
+        if conn is not None and not self._healthy(conn, returned_at):
+            self.stats['reconnects'] += 1
+            self._close(conn)
+            conn = None
+        if conn is None:
+            conn = self._open()
+
+        elapsed = time.monotonic() - started
+        with self._cond:
+            self.stats['checkouts'] += 1
+            self.stats['checkout_seconds_total'] += elapsed
+            self.stats['checkout_seconds_max'] = max(self.stats['checkout_seconds_max'], elapsed)
+        return conn
+
+    def putconn(self, conn):
+        """Return a connection to the pool, closing it if it is broken."""
+        if not conn.closed and conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                self._close(conn)
+        with self._cond:
+            if conn.closed:
+                self._size -= 1
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def _close(self, conn):
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+    def fill(self):
+        """Open connections until the pool holds at least `minconn`."""
+        while True:
+            with self._cond:
+                if self._size >= self.minconn:
+                    return
+                self._size += 1
+            self.putconn(self._open())
+
+    def metrics(self):
+        """Return current pool usage and checkout latency counters."""
+        with self._cond:
+            return dict(
+                self.stats,
+                size=self._size,
+                idle=len(self._idle),
+                in_use=self._size - len(self._idle),
+                waiting=self._waiting,
+                max=self.maxconn
+            )
+
+
+db_pool = ConnectionPool(DB_POOL_MIN, DB_POOL_MAX, DB_POOL_TIMEOUT, DB_POOL_CHECK_AFTER)
+
+
+@contextmanager
+def get_db_connection():
+    """
+    Check out a pooled database connection for the duration of a with-block.
+
+    The transaction is committed when the block exits normally and rolled
+    back on error, then the connection goes back to the pool.
+
+    Yields: psycopg2 connection object
+    """
+    started = time.perf_counter()
+    conn = db_pool.getconn()
+    observe_metric('db_pool_wait_seconds', time.perf_counter() - started)
+    try:
+        with conn:
+            yield conn
+    finally:
+        db_pool.putconn(conn)
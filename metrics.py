@@ -0,0 +1,130 @@
+"""
+In-process metrics: counters, latency histograms and timed spans.
+
+Everything recorded here is exported in Prometheus text format on /metrics
+(see program.render_metrics), and span totals also go into each request's
+Server-Timing header.
+"""
+
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class Histogram:
+    """Latency histogram with the fixed LATENCY_BUCKETS bounds."""
+
+    __slots__ = ('buckets', 'total', 'count')
+
+    def __init__(self):
+        # One slot per bound plus one for values above the last bound
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        index = 0
+        while index < len(LATENCY_BUCKETS) and value > LATENCY_BUCKETS[index]:
+            index += 1
+        self.buckets[index] += 1
+        self.total += value
+        self.count += 1
+
+
+metric_counters = Counter()  # (name, labels) -> count
+metric_histograms = {}       # (name, labels) -> Histogram
+metrics_lock = threading.Lock()
+# Per-thread span totals for the request being handled, None outside requests
+trace_state = threading.local()
+
+
+def count_metric(name, amount=1, **labels):
+    """Add to a counter exported on /metrics."""
+    key = (name, tuple(sorted(labels.items())))
+    with metrics_lock:
+        metric_counters[key] += amount
+
+
+def observe_metric(name, seconds, **labels):
+    """Record a duration in a histogram exported on /metrics."""
+    key = (name, tuple(sorted(labels.items())))
+    with metrics_lock:
+        histogram = metric_histograms.get(key)
+        if histogram is None:
+            histogram = metric_histograms[key] = Histogram()
+        histogram.observe(seconds)
+
+
+@contextmanager
+def span(stage):
+    """
+    Time one stage of the work, e.g. with span('details'): ...
+
+    The duration goes into the stage_duration_seconds histogram and, on a
+    request thread, into that request's Server-Timing header.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        observe_metric('stage_duration_seconds', elapsed, stage=stage)
+        spans = getattr(trace_state, 'spans', None)
+        if spans is not None:
+            spans[stage] = spans.get(stage, 0.0) + elapsed
+
+
+def format_labels(labels, **extra):
+    """Render Prometheus labels, e.g. {route="/",method="POST"}."""
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ''
+    escaped = []
+    for name, value in pairs:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        escaped.append(f'{name}="{value}"')
+    return "{" + ",".join(escaped) + "}"
+
+
+def gauge_lines(prefix, stats):
+    """Export the numeric values of a stats dict as gauges named prefix_key."""
+    lines = []
+    for key, value in sorted(stats.items()):
+        if isinstance(value, bool):
+            value = int(value)
+        if isinstance(value, (int, float)):
+            lines.append(f"# TYPE {prefix}_{key} gauge")
+            lines.append(f"{prefix}_{key} {value}")
+    return lines
+
+
+def metric_lines():
+    """Prometheus text lines for every counter and histogram recorded so far."""
+    with metrics_lock:
+        counters = sorted(metric_counters.items())
+        histograms = sorted(
+            (key, (list(h.buckets), h.total, h.count)) for key, h in metric_histograms.items()
+        )
+
+    lines = []
+    typed = set()
+    for (name, labels), value in counters:
+        if name not in typed:
+            typed.add(name)
+            lines.append(f"# TYPE {name} counter")
+        lines.append(f"{name}{format_labels(labels)} {value}")
+    for (name, labels), (buckets, total, count) in histograms:
+        if name not in typed:
+            typed.add(name)
+            lines.append(f"# TYPE {name} histogram")
+        cumulative = 0
+        for bound, bucket in zip(LATENCY_BUCKETS + ('+Inf',), buckets):
+            cumulative += bucket
+            lines.append(f"{name}_bucket{format_labels(labels, le=bound)} {cumulative}")
+        lines.append(f"{name}_sum{format_labels(labels)} {total}")
+        lines.append(f"{name}_count{format_labels(labels)} {count}")
+    return lines
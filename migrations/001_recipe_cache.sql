@@ -0,0 +1,10 @@
+-- Persistent tier of the recipe detail cache, shared by all worker processes.
+-- data is NULL for negative entries (IDs the API answered with non-200).
+CREATE TABLE IF NOT EXISTS recipe_cache (
+    recipe_id  INTEGER PRIMARY KEY,
+    data       JSONB,
+    fetched_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    expires_at TIMESTAMPTZ NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS recipe_cache_expires_at_idx ON recipe_cache (expires_at);
@@ -0,0 +1,7 @@
+-- Indexes for the paged /shopping_lists query: keyset scan per user,
+-- and item lookup per list.
+CREATE INDEX IF NOT EXISTS shopping_lists_user_created_idx
+    ON shopping_lists (user_id, created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS shopping_list_items_list_idx
+    ON shopping_list_items (shopping_list_id);
@@ -0,0 +1,34 @@
+-- Favorites: ingredients as JSONB (decoded by the driver instead of json.loads
+-- per row), a created_at for stable paging, and indexes for the per-user queries.
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'favorites' AND column_name = 'ingredients'
+          AND data_type <> 'jsonb'
+    ) THEN
+        -- Rows that never held a JSON array fall back to an empty list
+        UPDATE favorites SET ingredients = '[]'
+        WHERE ingredients IS NULL OR btrim(ingredients) !~ '^\[.*\]$';
+        ALTER TABLE favorites
+            ALTER COLUMN ingredients TYPE JSONB USING ingredients::jsonb;
+    END IF;
+END $$;
+
+ALTER TABLE favorites ALTER COLUMN ingredients SET DEFAULT '[]'::jsonb;
+ALTER TABLE favorites
+    ADD COLUMN IF NOT EXISTS created_at TIMESTAMPTZ NOT NULL DEFAULT now();
+
+-- Drop duplicate saves so the unique index below (the ON CONFLICT target
+-- in add_favorite) can be built
+DELETE FROM favorites a
+USING favorites b
+WHERE a.ctid > b.ctid
+  AND a.user_id = b.user_id
+  AND a.recipe_id = b.recipe_id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS favorites_user_recipe_idx
+    ON favorites (user_id, recipe_id);
+
+CREATE INDEX IF NOT EXISTS favorites_user_created_idx
+    ON favorites (user_id, created_at DESC, recipe_id DESC);
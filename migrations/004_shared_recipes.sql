@@ -0,0 +1,67 @@
+-- One shared row per Spoonacular recipe; favorites become (user_id, recipe_id)
+-- edges instead of per-user copies of the recipe payload.
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS recipes (
+    recipe_id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL,
+    image TEXT,
+    difficulty TEXT,
+    ready_in_minutes INTEGER,
+    servings INTEGER,
+    nutrition TEXT,
+    instructions TEXT,
+    ingredients JSONB NOT NULL DEFAULT '[]'::jsonb,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'favorites' AND column_name = 'title'
+    ) THEN
+        -- Favorites that can't reference a Spoonacular id can't be kept
+        DELETE FROM favorites WHERE recipe_id::text !~ '^[0-9]+$';
+
+        -- Backfill from the newest copy of each recipe
+        INSERT INTO recipes (
+            recipe_id, title, image, difficulty, ready_in_minutes,
+            servings, nutrition, instructions, ingredients
+        )
+        SELECT DISTINCT ON (recipe_id::text::integer)
+            recipe_id::text::integer,
+            COALESCE(title, ''),
+            image,
+            difficulty,
+            CASE WHEN ready_in_minutes::text ~ '^[0-9]+$'
+                 THEN ready_in_minutes::text::integer END,
+            CASE WHEN servings::text ~ '^[0-9]+$'
+                 THEN servings::text::integer END,
+            nutrition,
+            instructions,
+            COALESCE(ingredients, '[]'::jsonb)
+        FROM favorites
+        ORDER BY recipe_id::text::integer, created_at DESC
+        ON CONFLICT (recipe_id) DO NOTHING;
+
+        ALTER TABLE favorites
+            DROP COLUMN title,
+            DROP COLUMN image,
+            DROP COLUMN difficulty,
+            DROP COLUMN ready_in_minutes,
+            DROP COLUMN servings,
+            DROP COLUMN nutrition,
+            DROP COLUMN instructions,
+            DROP COLUMN ingredients;
+        ALTER TABLE favorites
+            ALTER COLUMN recipe_id TYPE INTEGER USING recipe_id::text::integer;
+    END IF;
+END $$;
+
+ALTER TABLE favorites DROP CONSTRAINT IF EXISTS favorites_recipe_id_fkey;
+ALTER TABLE favorites
+    ADD CONSTRAINT favorites_recipe_id_fkey
+    FOREIGN KEY (recipe_id) REFERENCES recipes (recipe_id);
+
+COMMIT;
@@ -0,0 +1,37 @@
+-- Deleting a shopping list removes its items in the same statement, so
+-- delete_shopping_list needs a single ownership-checked DELETE.
+BEGIN;
+
+DO $$
+DECLARE
+    fk record;
+BEGIN
+    FOR fk IN
+        SELECT conname FROM pg_constraint
+        WHERE conrelid = 'shopping_list_items'::regclass
+          AND confrelid = 'shopping_lists'::regclass
+          AND contype = 'f'
+    LOOP
+        EXECUTE format('ALTER TABLE shopping_list_items DROP CONSTRAINT %I', fk.conname);
+    END LOOP;
+END $$;
+
+-- Items whose list is already gone would block the new constraint; they
+-- are removed, and the count is reported so it shows in the psql output
+DO $$
+DECLARE
+    removed integer;
+BEGIN
+    DELETE FROM shopping_list_items i
+    WHERE NOT EXISTS (SELECT 1 FROM shopping_lists l WHERE l.id = i.shopping_list_id);
+    GET DIAGNOSTICS removed = ROW_COUNT;
+    IF removed > 0 THEN
+        RAISE NOTICE 'Removed % shopping list items whose list no longer exists', removed;
+    END IF;
+END $$;
+
+ALTER TABLE shopping_list_items
+    ADD CONSTRAINT shopping_list_items_shopping_list_id_fkey
+    FOREIGN KEY (shopping_list_id) REFERENCES shopping_lists (id) ON DELETE CASCADE;
+
+COMMIT;
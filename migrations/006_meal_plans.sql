@@ -0,0 +1,14 @@
+-- Server-side meal plans: one row per planned recipe per day, plus the
+-- structured ingredient amounts the weekly shopping list is summed from.
+ALTER TABLE recipes ADD COLUMN IF NOT EXISTS ingredient_amounts JSONB;
+
+CREATE TABLE IF NOT EXISTS meal_plan_entries (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+    plan_date DATE NOT NULL,
+    recipe_id INTEGER NOT NULL REFERENCES recipes (recipe_id),
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS meal_plan_entries_user_date_idx
+    ON meal_plan_entries (user_id, plan_date);
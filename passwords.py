@@ -0,0 +1,26 @@
+"""
+bcrypt calls run by the password hashing worker processes.
+
+Jobs sent to the spawned workers refer to these functions, so a worker
+needs nothing but bcrypt to run them. Note that when the app is started
+with `python program.py`, multiprocessing still re-imports program.py in
+every worker as `__mp_main__`. That runs its module-level setup (settings,
+the unopened connection pool, idle executors) but not serve(), so no
+server, database connections or background threads are started in the
+workers.
+"""
+
+import bcrypt
+
+
+def hash_password(password, rounds):
+    """Hash a password with a fresh salt at the given bcrypt cost."""
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def check_password(password, password_hash):
+    """Check a password against a stored hash; malformed hashes never match."""
+    try:
+        return bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
+    except ValueError:
+        return False
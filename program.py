@@ -3,52 +3,676 @@ Main application for the "Recept från kylen" web service.
 
 Provides user registration, authentication, recipe search via Spoonacular API,
 and management of user favorites using a PostgreSQL backend.
+
+Routes, templates and user data live here; settings are in config.py, the
+database pool in db.py, the Spoonacular client in upstream.py, recipe
+caches and the local index in cache.py, search in search.py, the cache
+warmer in background.py and metrics in metrics.py.
 """
 
+import base64
+import cProfile
+import gzip
+import hashlib
+import hmac
+import mimetypes
+import multiprocessing
 import os
-
-# Standard library imports
-from dotenv import load_dotenv
+import re
+import threading
+import time
+import types
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIServer
 
 # Third-party imports
 from bottle import (
-    route, run, template, request, static_file,
-    response, redirect, HTTPResponse, TEMPLATE_PATH
+    route, run, request, static_file, response, redirect, install,
+    HTTPResponse, SimpleTemplate, TEMPLATE_PATH, default_app
 )
 import psycopg2
-from psycopg2.extras import RealDictCursor
 from psycopg2 import errors
-import bcrypt
-import requests
 import json
 
-# Load environment variables and configure templates
-BASE_DIR = os.path.dirname(__file__)
+# Local modules
+import passwords
+from background import run_cache_warmer, warm_stats
+from cache import (
+    LRUCache, fetch_detailed_recipes, get_detailed_recipe, load_recipe_index, recipe_cache,
+    recipe_cache_db_stats, recipe_index, store_shared_recipes
+)
+from config import (
+    API_SEARCH_MAX_LIMIT, ASSET_PIPELINE, BASE_DIR, BCRYPT_ROUNDS, CARD_CACHE_SIZE,
+    FAVORITES_PAGE_SIZE, HOST, METRICS_ALLOW, METRICS_TOKEN, PASSWORD_HASH_QUEUE,
+    PASSWORD_HASH_WAIT, PASSWORD_HASH_WORKERS, PORT, PROFILE_DIR, PROFILE_KEEP,
+    PROFILE_REQUESTS, PROFILE_TOKEN, RECIPE_CACHE_TTL, SEARCH_RESULT_COUNT, SECRET_KEY, SERVER,
+    SERVER_TIMING, SHOPPING_LISTS_PAGE_SIZE, STATIC_BUNDLE_JS, STATIC_DIR, TEMPLATE_RELOAD,
+    THREADS, USERNAME_COOKIE_MAX_AGE, WARM_INTERVAL, WORKERS
+)
+from db import db_pool, get_db_connection
+from metrics import count_metric, gauge_lines, metric_lines, observe_metric, span, trace_state
+from search import (
+    build_no_results_message, decode_search_cursor, encode_search_cursor, extract_recipe_data,
+    SearchUnavailable, filter_recipes, iter_search_results, parse_search_filters, search_cache,
+    search_local_recipes, search_page, search_recipes
+)
+from upstream import quota_governor, upstream_breaker, upstream_stats
+
+try:
+    import brotli
+except ImportError:  # optional: without it static assets are precompressed with gzip only
+    brotli = None
+
+# Configure templates
 TEMPLATE_PATH.insert(0, os.path.join(BASE_DIR, 'views'))
-load_dotenv()
 
-# Retrieve API credentials from environment variables for secure access
-API_KEY = os.getenv('API_KEY')
-SECRET_KEY = os.getenv('SECRET_KEY')
 
+# --- Instrumentation ---
 
-def get_db_connection():
+profile_lock = threading.Lock()
+
+
+def profiling_requested():
     """
-    Create and return a new database connection.
+    True if profiling is enabled and this request asks for it with the
+    right token. Without a PROFILE_TOKEN nothing is ever profiled.
+    """
+    if not PROFILE_REQUESTS or not PROFILE_TOKEN:
+        return False
+    return hmac.compare_digest(request.headers.get('X-Profile', ''), PROFILE_TOKEN)
+
+
+def prune_profiles():
+    """Delete the oldest profile files beyond the newest PROFILE_KEEP."""
+    try:
+        paths = [os.path.join(PROFILE_DIR, name) for name in os.listdir(PROFILE_DIR)
+                 if name.endswith('.prof')]
+        paths.sort(key=os.path.getmtime, reverse=True)
+        for path in paths[PROFILE_KEEP:]:
+            os.remove(path)
+    except OSError as exc:
+        print(f"Error pruning profiles: {exc}")
 
-    Uses environment variables for host, port, dbname, user, and password.
-    The cursor_factory is set to RealDictCursor for dict-like fetches.
 
-    Returns: psycopg2 connection object
+def profile_call(callback, args, kwargs):
     """
-    return psycopg2.connect(
-        host=os.getenv('DB_HOST'),
-        port=os.getenv('DB_PORT'),
-        dbname=os.getenv('DB_NAME'),
-        user=os.getenv('DB_USER'),
-        password=os.getenv('DB_PASSWORD'),
-        cursor_factory=RealDictCursor
-    )
+    Run a route callback under cProfile and dump the stats to PROFILE_DIR.
+
+    Only one request is profiled at a time; concurrent requests asking for
+    it run normally.
+
+    Returns:
+        tuple: (callback result, profile file name or None).
+    """
+    if not profile_lock.acquire(blocking=False):
+        return callback(*args, **kwargs), None
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+        try:
+            return callback(*args, **kwargs), None
+        finally:
+            profiler.disable()
+    finally:
+        profile_lock.release()
+        route_name = re.sub(r'\W+', '_', request.route.rule).strip('_')
+        filename = f"{time.strftime('%Y%m%d-%H%M%S')}-{route_name or 'index'}-{os.getpid()}.prof"
+        try:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            profiler.dump_stats(os.path.join(PROFILE_DIR, filename))
+            response.set_header('X-Profile-File', filename)
+        except OSError as exc:
+            print(f"Error writing profile: {exc}")
+        prune_profiles()
+
+
+def record_request(rule, method, status, elapsed):
+    """Count a finished request and record its duration, per route."""
+    count_metric('http_requests_total', route=rule, method=method, status=str(status))
+    observe_metric('http_request_duration_seconds', elapsed, route=rule, method=method)
+
+
+class TimedStream:
+    """
+    Body of a streamed response, recording the request when the stream ends.
+
+    Bottle iterates a route's generator after the plugin has returned, so
+    the request is only recorded once the generator is exhausted, fails or
+    is closed (e.g. the client went away). While a chunk is produced the
+    stream's own span dict is the thread's trace_state, so spans inside the
+    generator are added to the request as for other routes.
+    """
+
+    def __init__(self, body, rule, method, status, started, spans):
+        self.body = body
+        self.rule = rule
+        self.method = method
+        self.status = status
+        self.started = started
+        self.spans = spans
+        self.finished = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        trace_state.spans = self.spans
+        try:
+            return next(self.body)
+        except StopIteration:
+            self.close()
+            raise
+        except Exception:
+            self.status = 500
+            self.close()
+            raise
+        finally:
+            trace_state.spans = None
+
+    def close(self):
+        if self.finished:
+            return
+        self.finished = True
+        self.body.close()
+        record_request(self.rule, self.method, self.status, time.perf_counter() - self.started)
+
+
+def instrument(callback):
+    """
+    Bottle plugin timing every route.
+
+    Records http_requests_total and http_request_duration_seconds per route,
+    sends the request's span totals in a Server-Timing header when
+    SERVER_TIMING is on, and runs the request under cProfile when
+    profiling_requested() says so. Generator results (e.g. /search/stream)
+    are wrapped in a TimedStream and timed until the stream ends; their
+    headers are sent before that, so they get no Server-Timing header.
+    """
+    def wrapper(*args, **kwargs):
+        spans = trace_state.spans = {}
+        started = time.perf_counter()
+        rule, method = request.route.rule, request.method
+        result = None
+        status = 500
+        try:
+            if profiling_requested():
+                result, _ = profile_call(callback, args, kwargs)
+            else:
+                result = callback(*args, **kwargs)
+            status = result.status_code if isinstance(result, HTTPResponse) else response.status_code
+            if isinstance(result, types.GeneratorType):
+                result = TimedStream(result, rule, method, status, started, spans)
+            return result
+        except HTTPResponse as exc:
+            # redirect() and abort() raise their response
+            result = exc
+            status = exc.status_code
+            raise
+        finally:
+            trace_state.spans = None
+            # A TimedStream records the request itself when the stream ends
+            if not isinstance(result, TimedStream):
+                elapsed = time.perf_counter() - started
+                record_request(rule, method, status, elapsed)
+                if SERVER_TIMING:
+                    timings = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in spans.items()]
+                    timings.append(f"total;dur={elapsed * 1000:.1f}")
+                    # A returned or raised HTTPResponse replaces the global response's headers
+                    target = result if isinstance(result, HTTPResponse) else response
+                    target.set_header('Server-Timing', ", ".join(timings))
+    return wrapper
+
+
+install(instrument)
+
+
+def metrics_forbidden():
+    """
+    Check access to /metrics and /api/stats.
+
+    Allowed from the addresses in METRICS_ALLOW, or with the METRICS_TOKEN
+    bearer token. The socket address is used, not X-Forwarded-For, which
+    clients can set to anything.
+
+    Returns:
+        HTTPResponse or None: A 403 response, or None if access is allowed.
+    """
+    if request.environ.get('REMOTE_ADDR') in METRICS_ALLOW:
+        return None
+    auth = request.headers.get('Authorization', '')
+    if METRICS_TOKEN and hmac.compare_digest(auth, f"Bearer {METRICS_TOKEN}"):
+        return None
+    return HTTPResponse(status=403, body=json.dumps({'error': 'Forbidden'}))
+
+
+def render_metrics():
+    """Build the Prometheus text exposition for /metrics."""
+    lines = metric_lines()
+    lines.append("# TYPE cache_events_total counter")
+    for cache_name, stats in (('recipe', recipe_cache.stats), ('search', search_cache.stats),
+                              ('card', card_cache.stats), ('recipe_db', recipe_cache_db_stats)):
+        for event, value in sorted(stats.items()):
+            lines.append(f'cache_events_total{{cache="{cache_name}",event="{event}"}} {value}')
+    lines.append("# TYPE upstream_events_total counter")
+    for event, value in sorted(upstream_stats.items()):
+        lines.append(f'upstream_events_total{{event="{event}"}} {value}')
+    lines += gauge_lines('upstream_breaker', {'open': upstream_breaker.is_open})
+    lines += gauge_lines('db_pool', db_pool.metrics())
+    lines += gauge_lines('quota', quota_governor.metrics())
+    lines += gauge_lines('passwords', password_metrics())
+    lines += gauge_lines('warmer', warm_stats)
+    return "\n".join(lines) + "\n"
+
+
+# --- Template rendering ---
+
+compiled_templates = {}
+template_stats = {}
+template_stats_lock = threading.Lock()
+card_cache = LRUCache(CARD_CACHE_SIZE, RECIPE_CACHE_TTL)
+
+
+def view_names():
+    """Names of all templates in the views directory."""
+    views_dir = os.path.join(BASE_DIR, 'views')
+    return sorted(name[:-5] for name in os.listdir(views_dir) if name.endswith('.html'))
+
+
+def compile_template(name):
+    """Compile one view and keep it in compiled_templates."""
+    tpl = SimpleTemplate(name=name, lookup=TEMPLATE_PATH)
+    tpl.prepare()
+    compiled_templates[name] = tpl
+    return tpl
+
+
+def preload_templates():
+    """Compile every view up front so the first request doesn't pay for it."""
+    for name in view_names():
+        compile_template(name)
+
+
+def record_render_time(name, seconds):
+    with template_stats_lock:
+        stats = template_stats.setdefault(name, {'count': 0, 'seconds_total': 0.0, 'seconds_max': 0.0})
+        stats['count'] += 1
+        stats['seconds_total'] += seconds
+        stats['seconds_max'] = max(stats['seconds_max'], seconds)
+
+
+def render_view(name, **kwargs):
+    """
+    Render a view with its precompiled template and record the render time.
+
+    Replaces bottle's template(), which recompiles every view on each call
+    while the dev server runs with debug=True. Set TEMPLATE_RELOAD=1 to pick
+    up template edits without a restart.
+    """
+    started = time.perf_counter()
+    with span('render'):
+        tpl = compiled_templates.get(name)
+        if tpl is None or TEMPLATE_RELOAD:
+            tpl = compile_template(name)
+        html = tpl.render(**kwargs)
+    record_render_time(name, time.perf_counter() - started)
+    return html
+
+
+def render_recipe_card(recipe):
+    """
+    Return the HTML for one recipe card, rendered once per recipe ID.
+
+    Search result pages and the streaming search splice the cached fragment
+    in instead of re-rendering the card each time the recipe shows up. With
+    TEMPLATE_RELOAD=1 the cache is skipped so card edits show up at once.
+    """
+    if TEMPLATE_RELOAD:
+        return render_view('recipe_card', recipe=recipe)
+    html = card_cache.get(recipe['id'])
+    if html is None:
+        html = render_view('recipe_card', recipe=recipe)
+        card_cache.set(recipe['id'], html)
+    return html
+
+
+# Available in every template, e.g. {{!render_recipe_card(recipe)}} in index.html
+SimpleTemplate.defaults['render_recipe_card'] = render_recipe_card
+
+
+def template_metrics():
+    """Return per-view render counters and card fragment cache counters."""
+    with template_stats_lock:
+        views = {name: dict(stats) for name, stats in template_stats.items()}
+    return {'views': views, 'card_cache': dict(card_cache.stats, size=len(card_cache))}
+
+
+# --- Static assets ---
+
+# Smaller files aren't worth compressing
+COMPRESS_MIN_SIZE = 256
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+asset_files = {}     # fingerprinted path, e.g. 'JS/loading.1a2b3c4d5e.js' -> StaticAsset
+asset_manifest = {}  # lowercased source path, e.g. 'js/loading.js' -> fingerprinted path
+asset_bundles = {}   # tuple of source paths -> fingerprinted bundle path
+assets_lock = threading.Lock()
+
+
+class StaticAsset:
+    """One static file held in memory with its precompressed variants."""
+
+    __slots__ = ('path', 'body', 'gzip', 'br', 'etag', 'content_type')
+
+    def __init__(self, source_path, body):
+        digest = hashlib.sha256(body).hexdigest()
+        root, ext = os.path.splitext(source_path)
+        self.path = f"{root}.{digest[:10]}{ext}"
+        self.body = body
+        self.etag = f'W/"{digest[:16]}"'
+        mimetype = mimetypes.guess_type(source_path)[0] or 'application/octet-stream'
+        textual = mimetype.startswith('text/') or mimetype in ('application/javascript', 'image/svg+xml')
+        self.content_type = f"{mimetype}; charset=UTF-8" if textual else mimetype
+        self.gzip = self.br = None
+        if textual and len(body) >= COMPRESS_MIN_SIZE:
+            # Keep a variant only when it actually saves bytes
+            compressed = gzip.compress(body, compresslevel=9, mtime=0)
+            if len(compressed) < len(body):
+                self.gzip = compressed
+            if brotli is not None:
+                compressed = brotli.compress(body, quality=11)
+                if len(compressed) < len(body):
+                    self.br = compressed
+
+
+def build_assets():
+    """
+    Fingerprint and precompress every file under ./static, once per process.
+
+    Source paths are matched case-insensitively, so templates can refer to
+    js/loading.js while the file lives in static/JS.
+    """
+    with assets_lock:
+        if asset_files:
+            return
+        for dirpath, _, filenames in os.walk(STATIC_DIR):
+            for filename in sorted(filenames):
+                full_path = os.path.join(dirpath, filename)
+                source_path = os.path.relpath(full_path, STATIC_DIR).replace(os.sep, '/')
+                with open(full_path, 'rb') as f:
+                    asset = StaticAsset(source_path, f.read())
+                asset_files[asset.path] = asset
+                asset_manifest[source_path.lower()] = asset.path
+
+
+def asset_url(path):
+    """
+    Return the URL for a static file, e.g. asset_url('css/style.css').
+
+    With the pipeline on this is the fingerprinted name, which can be cached
+    forever because any change to the file gives it a new URL.
+    """
+    if ASSET_PIPELINE:
+        if not asset_files:
+            build_assets()
+        served_path = asset_manifest.get(path.lower())
+        if served_path:
+            return f"/static/{served_path}"
+    return f"/static/{path}"
+
+
+def bundle_scripts(paths):
+    """Join several JS files into one fingerprinted asset and return its path."""
+    key = tuple(path.lower() for path in paths)
+    with assets_lock:
+        served_path = asset_bundles.get(key)
+        if served_path is None:
+            body = b'\n;\n'.join(asset_files[asset_manifest[path]].body for path in key)
+            asset = StaticAsset('JS/bundle.js', body)
+            asset_files[asset.path] = asset
+            asset_bundles[key] = served_path = asset.path
+    return served_path
+
+
+def asset_scripts(*paths):
+    """
+    Return <script> tags for the given JS files, in order.
+
+    With STATIC_BUNDLE_JS=1 they're served as a single bundle instead, cutting
+    the number of requests per page. Every script in static/JS only does work
+    on DOMContentLoaded, so joining them doesn't change when their code runs.
+    """
+    if ASSET_PIPELINE and STATIC_BUNDLE_JS and len(paths) > 1:
+        if not asset_files:
+            build_assets()
+        if all(path.lower() in asset_manifest for path in paths):
+            return f'<script src="/static/{bundle_scripts(paths)}"></script>'
+    return '\n'.join(f'<script src="{asset_url(path)}"></script>' for path in paths)
+
+
+# e.g. <link href="{{asset_url('css/style.css')}}"> and {{!asset_scripts('js/settings.js')}}
+SimpleTemplate.defaults['asset_url'] = asset_url
+SimpleTemplate.defaults['asset_scripts'] = asset_scripts
+
+
+def accepted_encodings():
+    """Content codings the client accepts, ignoring any listed with q=0."""
+    encodings = set()
+    for part in request.headers.get('Accept-Encoding', '').split(','):
+        coding, _, params = part.partition(';')
+        name, _, value = params.partition('=')
+        if name.strip().lower() == 'q':
+            try:
+                if float(value) == 0:
+                    continue
+            except ValueError:
+                continue
+        encodings.add(coding.strip().lower())
+    return encodings
+
+
+def asset_response(asset, immutable):
+    """
+    Build the response for an in-memory asset.
+
+    Answers 304 when If-None-Match carries the asset's ETag, and otherwise
+    picks the brotli or gzip variant the client accepts.
+    """
+    headers = {
+        'ETag': asset.etag,
+        'Vary': 'Accept-Encoding',
+        # Unfingerprinted URLs may change content, so clients revalidate them
+        'Cache-Control': IMMUTABLE_CACHE_CONTROL if immutable else 'no-cache'
+    }
+    if_none_match = request.headers.get('If-None-Match', '')
+    if if_none_match:
+        tags = {tag.strip().replace('W/', '', 1) for tag in if_none_match.split(',')}
+        if '*' in tags or asset.etag.replace('W/', '', 1) in tags:
+            return HTTPResponse(status=304, headers=headers)
+
+    body = asset.body
+    encodings = accepted_encodings()
+    if asset.br is not None and 'br' in encodings:
+        body = asset.br
+        headers['Content-Encoding'] = 'br'
+    elif asset.gzip is not None and 'gzip' in encodings:
+        body = asset.gzip
+        headers['Content-Encoding'] = 'gzip'
+    headers['Content-Type'] = asset.content_type
+    headers['Content-Length'] = str(len(body))
+    return HTTPResponse(body=body, headers=headers)
+
+
+def asset_metrics():
+    """Return the number of assets and their raw and compressed sizes."""
+    with assets_lock:
+        assets = list(asset_files.values())
+        bundles = len(asset_bundles)
+    return {
+        'files': len(assets),
+        'bundles': bundles,
+        'bytes': sum(len(asset.body) for asset in assets),
+        'gzip_bytes': sum(len(asset.gzip) for asset in assets if asset.gzip is not None),
+        'br_bytes': sum(len(asset.br) for asset in assets if asset.br is not None)
+    }
+
+
+# --- Password hashing ---
+
+class PasswordHashBusy(Exception):
+    """Raised when the password hashing queue is full."""
+
+
+password_pool = None
+password_pool_lock = threading.Lock()
+password_slots = threading.BoundedSemaphore(PASSWORD_HASH_QUEUE)
+# Only one background rehash at a time, so a burst of logins after a
+# BCRYPT_ROUNDS change doesn't double the hashing load
+rehash_slot = threading.BoundedSemaphore(1)
+password_stats = {'in_flight': 0, 'hashed': 0, 'checked': 0, 'rehashed': 0, 'rejected': 0,
+                  'rehash_skipped': 0}
+password_stats_lock = threading.Lock()
+
+
+def get_password_pool():
+    """
+    Return the worker process pool, starting it on first use.
+
+    Workers are spawned rather than forked so they don't inherit this
+    process's threads and database connections, and are created lazily so
+    each gunicorn worker gets its own pool after the fork.
+    """
+    global password_pool
+    with password_pool_lock:
+        if password_pool is None:
+            password_pool = ProcessPoolExecutor(
+                max_workers=PASSWORD_HASH_WORKERS,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return password_pool
+
+
+def discard_password_pool(pool):
+    """Drop a broken pool so the next call starts a fresh one."""
+    global password_pool
+    with password_pool_lock:
+        if password_pool is pool:
+            password_pool = None
+    pool.shutdown(wait=False)
+
+
+def run_password_job(fn, *args, wait=PASSWORD_HASH_WAIT):
+    """
+    Run a bcrypt call from the passwords module in the worker pool.
+
+    bcrypt is deliberately slow CPU work; off the request thread it no
+    longer stalls every other request in the process. At most
+    PASSWORD_HASH_QUEUE calls are queued or running at once; beyond that
+    callers wait up to `wait` seconds (default PASSWORD_HASH_WAIT) and then
+    get PasswordHashBusy. With PASSWORD_HASH_WORKERS=0 the call runs inline.
+
+    If a worker dies the pool breaks; it is replaced and the call retried
+    once, and if the new pool breaks too the call runs inline.
+    """
+    if PASSWORD_HASH_WORKERS <= 0:
+        return fn(*args)
+    if not password_slots.acquire(timeout=wait):
+        with password_stats_lock:
+            password_stats['rejected'] += 1
+        raise PasswordHashBusy('Too many password checks in progress')
+    with password_stats_lock:
+        password_stats['in_flight'] += 1
+    try:
+        for _ in range(2):
+            pool = get_password_pool()
+            try:
+                return pool.submit(fn, *args).result()
+            except BrokenProcessPool:
+                print("Error in password hashing pool: a worker died, restarting the pool")
+                discard_password_pool(pool)
+        # Two broken pools in a row – don't fail the login over it
+        return fn(*args)
+    finally:
+        with password_stats_lock:
+            password_stats['in_flight'] -= 1
+        password_slots.release()
+
+
+def hash_password(password, wait=PASSWORD_HASH_WAIT):
+    """Hash a new password at the configured BCRYPT_ROUNDS cost."""
+    password_hash = run_password_job(passwords.hash_password, password, BCRYPT_ROUNDS, wait=wait)
+    with password_stats_lock:
+        password_stats['hashed'] += 1
+    return password_hash
+
+
+def verify_password(password, password_hash):
+    """Check a password against its stored bcrypt hash."""
+    valid = run_password_job(passwords.check_password, password, password_hash)
+    with password_stats_lock:
+        password_stats['checked'] += 1
+    return valid
+
+
+def password_needs_rehash(password_hash):
+    """True if the hash was made with a different cost than BCRYPT_ROUNDS."""
+    try:
+        # bcrypt hashes look like $2b$12$<salt and hash>
+        return int(password_hash.split('$')[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return False
+
+
+def rehash_password(user_id, password):
+    """
+    Store a new hash at the current cost after a successful login.
+
+    Runs on its own thread (see start_rehash), so the login response doesn't
+    wait for the extra bcrypt call. It never waits for a hashing slot either:
+    when the queue is full the rehash is skipped and happens on a later
+    login. Best effort: the login already succeeded, so failures are only
+    logged.
+    """
+    try:
+        new_hash = hash_password(password, wait=0)
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("UPDATE users SET password_hash = %s WHERE id = %s",
+                            (new_hash, user_id))
+        with password_stats_lock:
+            password_stats['rehashed'] += 1
+    except PasswordHashBusy:
+        with password_stats_lock:
+            password_stats['rehash_skipped'] += 1
+    except Exception as exc:
+        print(f"Error rehashing password: {exc}")
+    finally:
+        rehash_slot.release()
+
+
+def start_rehash(user_id, password):
+    """
+    Rehash a password in the background, unless a rehash is already running.
+
+    Skipped rehashes are counted in password_stats and retried on the
+    user's next login.
+    """
+    if not rehash_slot.acquire(blocking=False):
+        with password_stats_lock:
+            password_stats['rehash_skipped'] += 1
+        return
+    threading.Thread(target=rehash_password, args=(user_id, password),
+                     name='password-rehash', daemon=True).start()
+
+
+def password_metrics():
+    """Return password hashing counters and pool settings."""
+    with password_stats_lock:
+        stats = dict(password_stats)
+    return dict(stats, workers=PASSWORD_HASH_WORKERS, queue_limit=PASSWORD_HASH_QUEUE,
+                rounds=BCRYPT_ROUNDS)
 
 
 def get_user_id_from_cookie():
@@ -80,6 +704,46 @@ def get_username_by_id(user_id):
     return None
 
 
+def remember_username(user_id, username):
+    """
+    Store the user's name in a signed cookie next to their user ID.
+
+    The value is bound to the user ID, so it is ignored if the two cookies
+    ever disagree. It expires after USERNAME_COOKIE_MAX_AGE seconds, after
+    which the name is read from the database again.
+    """
+    response.set_cookie('username', f"{user_id}:{username}", secret=SECRET_KEY, path='/',
+                        max_age=USERNAME_COOKIE_MAX_AGE)
+
+
+def get_current_username(user_id):
+    """
+    Return the username for the logged-in user without a database lookup.
+
+    Reads the signed username cookie set at login. Sessions without it,
+    including ones whose cookie has expired, fall back to
+    get_username_by_id() once and get a fresh cookie.
+
+    Args:
+        user_id (str or None): The user's ID from get_user_id_from_cookie().
+
+    Returns:
+        str or None: Username if logged in, otherwise None.
+    """
+    if not user_id:
+        return None
+    cached = request.get_cookie('username', secret=SECRET_KEY)
+    if cached:
+        cached_id, _, username = cached.partition(':')
+        if cached_id == str(user_id):
+            return username
+
+    username = get_username_by_id(user_id)
+    if username:
+        remember_username(user_id, username)
+    return username
+
+
 @route('/')
 def index():
     """
@@ -106,10 +770,10 @@ def index():
 
     # Try to get user information from cookie and database
     user_id = get_user_id_from_cookie()
-    username = get_username_by_id(user_id) if user_id else None
+    username = get_current_username(user_id)
 
     # Render and return the index page with relevant context
-    return template(
+    return render_view(
         'index',
         recipes=recipes,
         login_success=login_success,
@@ -120,177 +784,6 @@ def index():
         email=None
     )
 
-def fetch_recipes_from_api(ingredients, diet, max_calories=None, max_ready_time=None):
-    """Send request to Spoonacular API with ingredients, diet and optional filters."""
-    url = 'https://api.spoonacular.com/recipes/complexSearch'
-    params = {
-        'apiKey': API_KEY,
-        'number': 20,
-        'addRecipeInformation': True,
-        'fillIngredients': True
-    }
-    if ingredients:
-        params['query'] = ingredients
-    if diet:
-        params['diet'] = diet
-    if max_calories:
-        params['maxCalories'] = max_calories
-    if max_ready_time:
-        params['maxReadyTime'] = max_ready_time
-
-    resp = requests.get(url, params=params)
-    if resp.status_code != 200:
-        return []
-    return resp.json().get('results', [])
-
-
-def is_recipe_valid(info, diet):
-    """Determine if a recipe matches the selected diet."""
-    
-    title = info.get('title', '').lower()
-    ingredients = [i['name'].lower() for i in info.get('extendedIngredients', [])]
-
-    meat = ['chicken', 'beef', 'pork', 'bacon', 'turkey', 'ham', 'lamb']
-    dairy_egg = ['cheese', 'egg', 'milk', 'butter', 'yogurt', 'cream', 'honey']
-
-    if diet == "vegetarian":
-        return not any(w in title or any(w in ing for ing in ingredients) for w in meat)
-    if diet == "vegan":
-        return not any(w in title or any(w in ing for ing in ingredients) for w in meat + dairy_egg)
-    return True
-
-def get_detailed_recipe(recipe_id):
-    """Fetch detailed recipe info including nutrition and steps."""
-    url = f"https://api.spoonacular.com/recipes/{recipe_id}/information"
-    params = {'apiKey': API_KEY, 'includeNutrition': True}
-
-    resp = requests.get(url, params=params)
-    return resp.json() if resp.status_code == 200 else None
-
-
-def extract_recipe_data(summary, info):
-    """Build the recipe dictionary used by the frontend."""
-    # Nutrition
-    nutrition = info.get('nutrition', {}).get('nutrients', [])
-    kcal = next((n for n in nutrition if n['name'] == 'Calories'), None)
-    kcal_str = f"{kcal['amount']} {kcal['unit']}" if kcal else 'Information missing'
-
-    # Time & difficulty
-    time = info.get('readyInMinutes', 0)
-    difficulty = 'Easy' if time < 30 else 'Mid' if time < 60 else 'Hard'
-
-    # Instructions
-    steps = info.get('analyzedInstructions', [])
-    if steps and steps[0].get('steps'):
-        instructions = (
-            "<ol>" +
-            "".join(f"<li>{step['step']}</li>" for step in steps[0]['steps']) +
-            "</ol>"
-        )
-    else:
-        instructions = info.get('instructions', 'No instructions provided.')
-
-    # Ingredients list
-    raw_ings = info.get('extendedIngredients', [])
-    ingredient_list = [
-        " ".join(filter(None, [
-            str(i.get('amount', '')).strip(),
-            i.get('unit', '').strip(),
-            i.get('originalName', '').strip()
-        ])).strip()
-        for i in raw_ings
-    ]
-
-    return {
-        'id': summary['id'],
-        'title': summary['title'],
-        'image': summary['image'],
-        'readyInMinutes': time,
-        'servings': info.get('servings', 'Unknown'),
-        'nutrition': kcal_str,
-        'difficulty': difficulty,
-        'instructions': instructions,
-        'ingredients': ingredient_list
-    }
-
-
-def parse_search_filters(forms):
-    """
-    Parse search-related filters from request forms.
-
-    Returns a dict with keys:
-      - ingredients (str)
-      - diet (str)
-      - max_calories (int or None)
-      - max_time (int or None)
-      - difficulty (str or None)
-    """
-    ingredients = forms.get('ingredients', '').strip()
-    diet = forms.get('diet', '').strip().lower()
-
-    max_calories_input = forms.get('max_calories', '').strip()
-    max_time_input = forms.get('max_time', '').strip()
-    difficulty_input = forms.get('difficulty', '').strip().capitalize()
-
-    max_calories = int(max_calories_input) if max_calories_input.isdigit() else None
-    max_time = int(max_time_input)     if max_time_input.isdigit()     else None
-    difficulty = difficulty_input if difficulty_input in ('Easy', 'Mid', 'Hard') else None
-
-    return {
-        'ingredients': ingredients,
-        'diet': diet,
-        'max_calories': max_calories,
-        'max_time': max_time,
-        'difficulty': difficulty
-    }
-
-
-def should_include_recipe(info, diet, max_calories, max_time, difficulty):
-    """
-    Determine if a detailed recipe should be included based on all filters.
-    """
-    # Calorie and time extraction
-    nutrition = info.get('nutrition', {}).get('nutrients', [])
-    kcal_data = next((n for n in nutrition if n['name'] == 'Calories'), None)
-    calories = kcal_data['amount'] if kcal_data else None
-    ready_in = info.get('readyInMinutes', 0)
-
-    # Difficulty classification
-    current_difficulty = 'Easy' if ready_in < 30 else 'Mid' if ready_in < 60 else 'Hard'
-
-    # Apply filters
-    if max_calories is not None and calories is not None and calories > max_calories:
-        return False
-    if max_time is not None and ready_in > max_time:
-        return False
-    if difficulty is not None and current_difficulty != difficulty:
-        return False
-    if not is_recipe_valid(info, diet):
-        return False
-
-    return True
-
-
-def build_no_results_message(filters):
-    """
-    Build a feedback message when no recipes match the given filters.
-    """
-    criteria = []
-    if filters['ingredients']:
-        criteria.append(f"ingredient '{filters['ingredients']}'")
-    if filters['diet']:
-        criteria.append(f"diet '{filters['diet']}'")
-    if filters['max_calories'] is not None:
-        criteria.append(f"max {filters['max_calories']} kcal")
-    if filters['max_time'] is not None:
-        criteria.append(f"max {filters['max_time']} min")
-    if filters['difficulty'] is not None:
-        criteria.append(f"difficulty '{filters['difficulty']}'")
-
-    if criteria:
-        return "No recipes found matching " + ", ".join(criteria) + "."
-    return "No recipes found."
-
 
 # --- Refactored route handler ---
 @route('/', method='POST')
@@ -301,28 +794,25 @@ def get_recipes():
     # 1) Parse filters
     filters = parse_search_filters(request.forms)
 
-    # 2) Fetch raw list from API
-    raw_results = fetch_recipes_from_api(
-        filters['ingredients'],
-        filters['diet'],
-        filters['max_calories'],
-        filters['max_time']
-    )
-
-    # 3) Filter and format results
-    recipes = []
-    for summary in raw_results:
-        info = get_detailed_recipe(summary['id'])
-        if not info:
-            continue
-        if should_include_recipe(
-            info,
-            filters['diet'],
-            filters['max_calories'],
-            filters['max_time'],
-            filters['difficulty']
-        ):
-            recipes.append(extract_recipe_data(summary, info))
+    # 2) Answer from the local recipe corpus first
+    with span('local_search'):
+        recipes = [extract_recipe_data(None, recipe) for recipe in search_local_recipes(filters)]
+
+    # 3) Fill the gaps from the search cache or API: fetch details
+    #    concurrently, then filter and format in API order
+    if len(recipes) < SEARCH_RESULT_COUNT:
+        seen = {recipe['id'] for recipe in recipes}
+        with span('search'):
+            raw_results = [summary for summary in search_recipes(filters) or []
+                           if summary['id'] not in seen]
+        with span('details'):
+            details = fetch_detailed_recipes([summary['id'] for summary in raw_results])
+        with span('filter'):
+            pairs = [(summary, recipe) for summary, (_, recipe) in zip(raw_results, details)]
+            for summary, recipe in filter_recipes(pairs, filters):
+                recipes.append(extract_recipe_data(summary, recipe))
+                if len(recipes) >= SEARCH_RESULT_COUNT:
+                    break
 
     # 4) Determine outcome message
     no_results = len(recipes) == 0
@@ -330,9 +820,9 @@ def get_recipes():
 
     # 5) Render template
     user_id = get_user_id_from_cookie()
-    username = get_username_by_id(user_id) if user_id else None
+    username = get_current_username(user_id)
 
-    return template(
+    return render_view(
         'index',
         recipes=recipes,
         login_success=False,
@@ -345,6 +835,82 @@ def get_recipes():
     )
 
 
+def sse_event(event, data):
+    """Format one server-sent event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@route('/search/stream')
+def stream_recipes():
+    """
+    Stream search results as server-sent events.
+
+    Takes the same parameters as the search form (as a query string). Sends
+    one 'recipe' event per matching recipe with its rendered card HTML, as
+    soon as its details are in, then a 'done' event with the result count
+    and the no-results message if nothing matched.
+    """
+    filters = parse_search_filters(request.query)
+
+    response.content_type = 'text/event-stream'
+    response.set_header('Cache-Control', 'no-cache')
+    # Tell reverse proxies not to buffer the stream
+    response.set_header('X-Accel-Buffering', 'no')
+
+    def events():
+        count = 0
+        for recipe in iter_search_results(filters):
+            count += 1
+            yield sse_event('recipe', {'html': render_recipe_card(recipe)})
+        message = build_no_results_message(filters) if count == 0 else ''
+        yield sse_event('done', {'count': count, 'message': message})
+
+    return events()
+
+
+@route('/api/search')
+def api_search():
+    """
+    Search recipes and return JSON, paginated with a cursor.
+
+    Query parameters are the search form fields plus:
+        limit   results per page (default SEARCH_RESULT_COUNT, max API_SEARCH_MAX_LIMIT)
+        cursor  next_cursor from the previous page
+
+    Returns: JSON {'results': [...], 'next_cursor': str or None}, or 503 if
+    the upstream search fails before any recipe was found.
+    """
+    filters = parse_search_filters(request.query)
+
+    limit = request.query.limit
+    limit = min(int(limit), API_SEARCH_MAX_LIMIT) if limit.isdigit() and int(limit) > 0 else SEARCH_RESULT_COUNT
+
+    offset = 0
+    if request.query.cursor:
+        offset = decode_search_cursor(request.query.cursor)
+        if offset is None:
+            return HTTPResponse(
+                status=400,
+                body=json.dumps({'error': 'Invalid cursor'}),
+                headers={'Content-Type': 'application/json'}
+            )
+
+    try:
+        recipes, next_offset = search_page(filters, offset, limit)
+    except SearchUnavailable:
+        return HTTPResponse(
+            status=503,
+            body=json.dumps({'error': 'Recipe search is unavailable, try again later'}),
+            headers={'Content-Type': 'application/json', 'Retry-After': '30'}
+        )
+
+    response.content_type = 'application/json'
+    return json.dumps({
+        'results': recipes,
+        'next_cursor': encode_search_cursor(next_offset) if next_offset is not None else None
+    })
+
+
 @route('/register', method=['GET', 'POST'])
 def register():
     """
@@ -357,14 +923,7 @@ def register():
     Returns: rendered register template with status message
     """
     user_id = request.get_cookie('user_id', secret=SECRET_KEY)
-    username = None
-    if user_id:
-        with get_db_connection() as conn:
-            with conn.cursor() as cur:
-                cur.execute("SELECT username FROM users WHERE id = %s", (user_id,))
-                row = cur.fetchone()
-                if row:
-                    username = row['username'] if isinstance(row, dict) else row[0]
+    username = get_current_username(user_id)
 
     error = None
     success = None
@@ -380,11 +939,8 @@ def register():
         elif len(password) < 8:
             error = 'Password must be at least 8 characters.'
         else:
-            pw_hash = bcrypt.hashpw(
-                password.encode('utf-8'),
-                bcrypt.gensalt()
-            ).decode('utf-8')
             try:
+                pw_hash = hash_password(password)
                 with get_db_connection() as conn:
                     with conn.cursor() as cur:
                         cur.execute(
@@ -402,10 +958,12 @@ def register():
                     error = 'Email is already registered.'
                 else:
                     error = 'Username is already taken.'
+            except PasswordHashBusy:
+                error = 'The server is busy, please try again in a moment.'
             except Exception as exc:
                 error = f'An unexpected error occurred: {exc}'
 
-    return template(
+    return render_view(
         'register',
         username=username,
         error=error,
@@ -437,7 +995,13 @@ def user_settings():
         confirm_password = request.forms.get('confirm_password', '')
 
         # 1) Verify that the provided current password is correct
-        if not bcrypt.checkpw(current_password.encode(), current_hash.encode()):
+        try:
+            password_ok = verify_password(current_password, current_hash)
+        except PasswordHashBusy:
+            password_ok = None
+        if password_ok is None:
+            error = 'The server is busy, please try again in a moment.'
+        elif not password_ok:
             error = 'Incorrect current password.'
         # 2) If a new password was entered, validate it
         elif new_password:
@@ -454,23 +1018,30 @@ def user_settings():
                         error = 'Username is already taken.'
 
         # 4) If no errors, update the database
+        new_hash = None
+        if not error and new_password:
+            try:
+                new_hash = hash_password(new_password)
+            except PasswordHashBusy:
+                error = 'The server is busy, please try again in a moment.'
         if not error:
             with get_db_connection() as conn:
                 with conn.cursor() as cur:
                     # Update username
                     cur.execute("UPDATE users SET username = %s WHERE id = %s",
                                 (new_username, user_id))
-                    # If a new password was provided, hash and update it
-                    if new_password:
-                        new_hash = bcrypt.hashpw(new_password.encode(), bcrypt.gensalt()).decode()
+                    # If a new password was provided, store its hash
+                    if new_hash:
                         cur.execute("UPDATE users SET password_hash = %s WHERE id = %s",
                                     (new_hash, user_id))
                 conn.commit()
             success = 'Your account settings have been updated.'
             current_username = new_username
+            # Keep the cached username in the session cookie in sync
+            remember_username(user_id, new_username)
 
     # Render the settings template, passing in any messages and current username
-    return template('settings',
+    return render_view('settings',
                     username=current_username,
                     error=error,
                     success=success)
@@ -486,7 +1057,7 @@ def login():
     Returns: redirect or rendered template on failure
     """
     email = request.forms.get('email', '').strip().lower()
-    password_raw = request.forms.get('password', '').encode('utf-8')
+    password = request.forms.get('password', '')
 
     with get_db_connection() as conn:
         with conn.cursor() as cur:
@@ -496,19 +1067,26 @@ def login():
             )
             user = cur.fetchone()
 
-    valid = bool(user and bcrypt.checkpw(
-        password_raw, user['password_hash'].encode('utf-8')
-    ))
+    login_error = 'Invalid email or password.'
+    try:
+        valid = bool(user and verify_password(password, user['password_hash']))
+    except PasswordHashBusy:
+        valid = False
+        login_error = 'The server is busy, please try again in a moment.'
 
     if valid:
+        # Move the stored hash to the current cost factor after a BCRYPT_ROUNDS change
+        if password_needs_rehash(user['password_hash']):
+            start_rehash(user['id'], password)
         response.set_cookie('user_id', str(user['id']), secret=SECRET_KEY, path='/')
+        remember_username(user['id'], user['username'])
         return redirect('/?login=1')
 
     # Login failed – return template with required variables
-    return template(
+    return render_view(
         'index',
         recipes=[],
-        login_error='Invalid email or password.',
+        login_error=login_error,
         login_success=False,
         logout_success=False,
         username=None,
@@ -525,15 +1103,44 @@ def logout():
     :return: redirect to home with logout confirmation
     """
     response.delete_cookie('user_id', path='/')
+    response.delete_cookie('username', path='/')
     return redirect('/?logout=1')
 
 
+def ensure_shared_recipe(recipe_id):
+    """
+    Make sure the shared recipes table has a row for recipe_id.
+
+    Details come from get_detailed_recipe(), normally a cache hit since the
+    user just saw the recipe in their search results.
+
+    Returns:
+        bool: False if the recipe isn't stored and its details can't be resolved.
+    """
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1 FROM recipes WHERE recipe_id = %s", (recipe_id,))
+            if cur.fetchone() is not None:
+                return True
+
+    # Resolve details outside any transaction
+    record = get_detailed_recipe(recipe_id)
+    if record is None:
+        return False
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            store_shared_recipes(cur, [record])
+    return True
+
+
 @route('/favorite', method='POST')
 def add_favorite():
     """
     Add a recipe to the user's favorites.
 
-    Expects recipe_id, title, and image in form data.
+    Expects only recipe_id in form data. The recipe itself is filled into
+    the shared recipes table from the server's cached detail data, so the
+    client no longer uploads the title, instructions and ingredients.
     Returns: JSON {'ok': True/False} or HTTP error.
     """
     user_id = request.get_cookie('user_id', secret=SECRET_KEY)
@@ -542,35 +1149,29 @@ def add_favorite():
             status=401, body=json.dumps({'ok': False, 'error': 'Not logged in'})
         )
 
-    #Fetch all data from the form
-    recipe_id = request.forms.get('recipe_id')
-    title = request.forms.get('title')
-    image = request.forms.get('image')
-    difficulty = request.forms.get('difficulty')
-    ready_in_minutes = request.forms.get('ready_in_minutes')
-    servings = request.forms.get('servings')
-    nutrition = request.forms.get('nutrition')
-    instructions = request.forms.get('instructions')
-    ingredients_json = request.forms.get('ingredients') or '[]'
-
-
+    recipe_id = request.forms.get('recipe_id', '').strip()
+    if not recipe_id.isdigit():
+        return HTTPResponse(
+            status=400, body=json.dumps({'ok': False, 'error': 'Invalid recipe_id'})
+        )
+    recipe_id = int(recipe_id)
 
     try:
+        if not ensure_shared_recipe(recipe_id):
+            return HTTPResponse(
+                status=503,
+                body=json.dumps({'ok': False, 'error': 'Recipe details unavailable'})
+            )
+
         with get_db_connection() as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     """
-                    INSERT INTO favorites (
-                        user_id, recipe_id, title, image, difficulty,
-                        ready_in_minutes, servings, nutrition, instructions, ingredients
-                    )
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                    INSERT INTO favorites (user_id, recipe_id)
+                    VALUES (%s, %s)
                     ON CONFLICT DO NOTHING
                     """,
-                    (
-                        user_id, recipe_id, title, image, difficulty,
-                        ready_in_minutes, servings, nutrition, instructions, ingredients_json
-                    )
+                    (user_id, recipe_id)
                 )
 
                 if cur.rowcount == 0:
@@ -584,50 +1185,104 @@ def add_favorite():
         )
 
 
+def encode_page_cursor(created_at, row_id):
+    """Encode the (created_at, id) of the last row on a page as an opaque cursor."""
+    key = {'at': created_at.isoformat(), 'id': row_id}
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+
+def decode_page_cursor(cursor):
+    """
+    Decode a cursor from encode_page_cursor().
+
+    Returns:
+        tuple or None: (created_at, id), or None if the cursor is missing
+        or invalid, which means the first page.
+    """
+    if not cursor:
+        return None
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        created_at, row_id = datetime.fromisoformat(key['at']), key['id']
+    except (ValueError, KeyError, TypeError):
+        return None
+    return (created_at, row_id) if isinstance(row_id, int) else None
+
+
+def load_favorites(cur, user_id, before=None, limit=None):
+    """
+    Load one page of a user's favorites, newest first.
+
+    Paged by keyset on (created_at, recipe_id): `before` holds those values
+    for the last favorite on the previous page, so a page never depends on
+    that row still existing. Recipe details come from the
+    shared recipes table; ingredients are JSONB, so psycopg2 returns them
+    as lists without any decoding here.
+
+    Args:
+        cur: Database cursor.
+        user_id (str): Owner of the favorites.
+        before (tuple or None): (created_at, recipe_id) from decode_page_cursor().
+        limit (int or None): Page size, defaults to FAVORITES_PAGE_SIZE.
+
+    Returns:
+        tuple: (favorites, next_cursor) where next_cursor is None on the last page.
+    """
+    limit = limit or FAVORITES_PAGE_SIZE
+    before_at, before_id = before or (None, None)
+    cur.execute("""
+        SELECT
+            f.recipe_id,
+            f.created_at,
+            r.title,
+            r.image,
+            COALESCE(r.difficulty, 'Unknown') AS difficulty,
+            COALESCE(r.ready_in_minutes::text, 'Unknown') AS ready_in_minutes,
+            COALESCE(r.servings::text, 'Unknown') AS servings,
+            r.nutrition,
+            r.instructions,
+            r.ingredients
+        FROM favorites f
+        JOIN recipes r ON r.recipe_id = f.recipe_id
+        WHERE f.user_id = %(user_id)s
+          AND (%(before_at)s IS NULL
+               OR (f.created_at, f.recipe_id) < (%(before_at)s, %(before_id)s))
+        ORDER BY f.created_at DESC, f.recipe_id DESC
+        LIMIT %(limit)s
+    """, {'user_id': user_id, 'before_at': before_at, 'before_id': before_id,
+          'limit': limit + 1})
+    favorites = cur.fetchall()
+
+    next_cursor = None
+    if len(favorites) > limit:
+        favorites = favorites[:limit]
+        last = favorites[-1]
+        next_cursor = encode_page_cursor(last['created_at'], last['recipe_id'])
+    return favorites, next_cursor
+
+
 @route('/favorites')
 def show_favorites():
     """
-    Display all recipes favorited by the current user.
+    Display the current user's favorited recipes, one page at a time.
     Redirects to home if not logged in.
     """
     user_id = request.get_cookie('user_id', secret=SECRET_KEY)
     if not user_id:
         return redirect('/')
 
+    username = get_current_username(user_id)
+
+    before = decode_page_cursor(request.query.before)
+
     with get_db_connection() as conn:
         with conn.cursor() as cur:
-            
-            cur.execute("SELECT username FROM users WHERE id = %s", (user_id,))
-            row = cur.fetchone()
-            username = row['username'] if row else None
-
-            cur.execute("""
-                SELECT
-                    recipe_id,
-                    title,
-                    image,
-                    difficulty,
-                    ready_in_minutes,
-                    servings,
-                    nutrition,
-                    instructions,
-                    ingredients
-                FROM favorites
-                WHERE user_id = %s
-            """, (user_id,))
-            favorites = cur.fetchall()
-
-            for fav in favorites:
-                try:
-                    fav['ingredients'] = json.loads(fav['ingredients'])
-                except Exception:
-                    fav['ingredients'] = []
-
-    return template('favorites',
-                    username=username,
-                    favorites=favorites)
-
+            favorites, next_cursor = load_favorites(cur, user_id, before)
 
+    return render_view('favorites',
+                    username=username,
+                    favorites=favorites,
+                    next_cursor=next_cursor)
 
 
 @route('/remove-favorite', method='POST')
@@ -656,6 +1311,63 @@ def remove_favorite():
 
     return redirect('/favorites')
 
+def load_shopping_lists(cur, user_id, before=None, limit=None):
+    """
+    Load one page of a user's shopping lists together with their items.
+
+    Lists are ordered newest first and paged by keyset: `before` holds the
+    (created_at, id) of the last list on the previous page. Items are
+    aggregated per list with json_agg, so a page costs a single query
+    however many lists it has.
+
+    Args:
+        cur: Database cursor.
+        user_id (str): Owner of the lists.
+        before (tuple or None): (created_at, id) from decode_page_cursor().
+        limit (int or None): Page size, defaults to SHOPPING_LISTS_PAGE_SIZE.
+
+    Returns:
+        tuple: (lists, next_cursor) where next_cursor is None on the last page.
+    """
+    limit = limit or SHOPPING_LISTS_PAGE_SIZE
+    before_at, before_id = before or (None, None)
+    cur.execute("""
+        WITH page AS (
+            SELECT l.id, l.name, l.created_at
+            FROM shopping_lists l
+            WHERE l.user_id = %(user_id)s
+              AND (%(before_at)s IS NULL
+                   OR (l.created_at, l.id) < (%(before_at)s, %(before_id)s))
+            ORDER BY l.created_at DESC, l.id DESC
+            LIMIT %(limit)s
+        )
+        SELECT
+            p.id,
+            p.name,
+            p.created_at,
+            COALESCE((
+                SELECT json_agg(json_build_object(
+                    'id', i.id,
+                    'ingredient', i.ingredient,
+                    'is_purchased', i.is_purchased
+                ) ORDER BY i.id)
+                FROM shopping_list_items i
+                WHERE i.shopping_list_id = p.id
+            ), '[]'::json) AS items
+        FROM page p
+        ORDER BY p.created_at DESC, p.id DESC
+    """, {'user_id': user_id, 'before_at': before_at, 'before_id': before_id,
+          'limit': limit + 1})
+    lists = cur.fetchall()
+
+    next_cursor = None
+    if len(lists) > limit:
+        lists = lists[:limit]
+        last = lists[-1]
+        next_cursor = encode_page_cursor(last['created_at'], last['id'])
+    return lists, next_cursor
+
+
 @route('/shopping_lists')
 def show_shopping_lists():
     user_id = get_user_id_from_cookie()
@@ -663,33 +1375,56 @@ def show_shopping_lists():
         return redirect('/')   # or redirect('/?login=1')
     
     # fetch username (if you need to show it in the header)
-    username = get_username_by_id(user_id)
+    username = get_current_username(user_id)
+
+    before = decode_page_cursor(request.query.before)
 
-    # fetch the lists and their items
+    # fetch one page of lists with their items in a single query
     with get_db_connection() as conn:
         with conn.cursor() as cur:
-            cur.execute("""
-                SELECT id, name, created_at
-                FROM shopping_lists
-                WHERE user_id = %s
-                ORDER BY created_at DESC
-            """, (user_id,))
-            lists = cur.fetchall()
-
-            for lst in lists:
-                cur.execute("""
-                    SELECT id, ingredient, is_purchased
-                    FROM shopping_list_items
-                    WHERE shopping_list_id = %s
-                """, (lst['id'],))
-                lst['items'] = cur.fetchall()
+            lists, next_cursor = load_shopping_lists(cur, user_id, before)
 
-    return template(
+    return render_view(
         'shopping_lists',
         username=username,
-        lists=lists
+        lists=lists,
+        next_cursor=next_cursor
     )
 
+def create_shopping_list(cur, user_id, name, items):
+    """
+    Create a shopping list with all of its items in one statement.
+
+    The list row and every item row are inserted by a single data-modifying
+    CTE, so a week's worth of ingredients costs one round-trip instead of
+    one INSERT per item.
+
+    Args:
+        cur: Database cursor.
+        user_id (str): Owner of the list.
+        name (str): List name.
+        items (list): Ingredient strings, stored in the given order.
+
+    Returns:
+        int: ID of the new list.
+    """
+    cur.execute("""
+        WITH new_list AS (
+            INSERT INTO shopping_lists (user_id, name)
+            VALUES (%s, %s)
+            RETURNING id
+        ), new_items AS (
+            INSERT INTO shopping_list_items (shopping_list_id, ingredient)
+            SELECT new_list.id, item.ingredient
+            FROM new_list,
+                 unnest(%s::text[]) WITH ORDINALITY AS item(ingredient, position)
+            ORDER BY item.position
+        )
+        SELECT id FROM new_list
+    """, (user_id, name, items))
+    return cur.fetchone()['id']
+
+
 @route('/api/shopping-lists', method='POST')
 def api_create_shopping_list():
     user_id = get_user_id_from_cookie()
@@ -702,7 +1437,7 @@ def api_create_shopping_list():
     payload = request.json or {}
     name  = payload.get('name')
     items = payload.get('items', [])
-    if not name or not isinstance(items, list):
+    if not name or not isinstance(items, list) or not all(isinstance(i, str) for i in items):
         return HTTPResponse(
             status=400,
             body=json.dumps({'error': 'Invalid payload'})
@@ -711,18 +1446,7 @@ def api_create_shopping_list():
     try:
         with get_db_connection() as conn:
             with conn.cursor() as cur:
-                # 1) create the list
-                cur.execute(
-                    "INSERT INTO shopping_lists (user_id, name) VALUES (%s, %s) RETURNING id",
-                    (user_id, name)
-                )
-                list_id = cur.fetchone()['id']
-                # 2) insert each item
-                args = [(list_id, ing) for ing in items]
-                cur.executemany(
-                    "INSERT INTO shopping_list_items (shopping_list_id, ingredient) VALUES (%s, %s)",
-                    args
-                )
+                list_id = create_shopping_list(cur, user_id, name, items)
             conn.commit()
 
         response.content_type = 'application/json'
@@ -737,6 +1461,9 @@ def api_create_shopping_list():
 def delete_shopping_list(list_id):
     """
     Remove a shopping list and all of its items for the current user.
+
+    Only deletes the list if it belongs to the user; its items go with it
+    through ON DELETE CASCADE (migrations/005_shopping_list_cascade.sql).
     """
     user_id = get_user_id_from_cookie()
     if not user_id:
@@ -749,12 +1476,6 @@ def delete_shopping_list(list_id):
     try:
         with get_db_connection() as conn:
             with conn.cursor() as cur:
-                # first delete the items
-                cur.execute(
-                  "DELETE FROM shopping_list_items WHERE shopping_list_id = %s",
-                  (list_id,)
-                )
-                # then the list itself, but make sure it belongs to this user
                 cur.execute(
                   "DELETE FROM shopping_lists WHERE id = %s AND user_id = %s",
                   (list_id, user_id)
@@ -772,15 +1493,435 @@ def delete_shopping_list(list_id):
             body=json.dumps({'ok': False, 'error': str(exc)})
         )
 
+@route('/api/shopping-lists/<list_id:int>/items', method='PATCH')
+def update_shopping_list_items(list_id):
+    """
+    Set is_purchased on many items of one list in a single UPDATE.
+
+    Expects JSON {"items": [{"id": 12, "is_purchased": true}, ...]}. Items
+    that don't belong to this user's list are left untouched.
+
+    Returns: JSON {'ok': True, 'updated': [item ids]} or HTTP error.
+    """
+    user_id = get_user_id_from_cookie()
+    if not user_id:
+        return HTTPResponse(
+            status=401,
+            body=json.dumps({'ok': False, 'error': 'Not logged in'})
+        )
+
+    payload = request.json or {}
+    items = payload.get('items')
+    if not isinstance(items, list) or not all(
+        isinstance(item, dict)
+        # bool is a subclass of int, so JSON true/false would pass as ids
+        and isinstance(item.get('id'), int) and not isinstance(item['id'], bool)
+        and isinstance(item.get('is_purchased'), bool)
+        for item in items
+    ):
+        return HTTPResponse(
+            status=400,
+            body=json.dumps({'ok': False, 'error': 'Invalid payload'})
+        )
+
+    try:
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    UPDATE shopping_list_items i
+                    SET is_purchased = change.is_purchased
+                    FROM unnest(%s::int[], %s::boolean[]) AS change(id, is_purchased),
+                         shopping_lists l
+                    WHERE i.id = change.id
+                      AND i.shopping_list_id = l.id
+                      AND l.id = %s
+                      AND l.user_id = %s
+                    RETURNING i.id
+                """, (
+                    [item['id'] for item in items],
+                    [item['is_purchased'] for item in items],
+                    list_id, user_id
+                ))
+                updated = [row['id'] for row in cur.fetchall()]
+            conn.commit()
+
+        response.content_type = 'application/json'
+        return json.dumps({'ok': True, 'updated': updated})
+    except Exception as exc:
+        return HTTPResponse(
+            status=500,
+            body=json.dumps({'ok': False, 'error': str(exc)})
+        )
+
+# Unit -> (base unit, factor) used when summing a week's ingredients, so
+# "1 tbsp" and "30 ml" of the same ingredient add up; other units are
+# only summed with themselves
+UNIT_CONVERSIONS = {
+    'mg': ('g', 0.001), 'mgs': ('g', 0.001), 'g': ('g', 1), 'gr': ('g', 1),
+    'gram': ('g', 1), 'grams': ('g', 1), 'kg': ('g', 1000), 'kgs': ('g', 1000),
+    'kilogram': ('g', 1000), 'kilograms': ('g', 1000),
+    'oz': ('g', 28.35), 'ozs': ('g', 28.35), 'ounce': ('g', 28.35), 'ounces': ('g', 28.35),
+    'lb': ('g', 453.6), 'lbs': ('g', 453.6), 'pound': ('g', 453.6), 'pounds': ('g', 453.6),
+    'ml': ('ml', 1), 'mls': ('ml', 1), 'milliliter': ('ml', 1), 'milliliters': ('ml', 1),
+    'millilitre': ('ml', 1), 'millilitres': ('ml', 1),
+    'cl': ('ml', 10), 'dl': ('ml', 100), 'l': ('ml', 1000), 'liter': ('ml', 1000),
+    'liters': ('ml', 1000), 'litre': ('ml', 1000), 'litres': ('ml', 1000),
+    'tsp': ('ml', 5), 'tsps': ('ml', 5), 'tsp.': ('ml', 5),
+    'teaspoon': ('ml', 5), 'teaspoons': ('ml', 5),
+    'tbsp': ('ml', 15), 'tbsps': ('ml', 15), 'tbsp.': ('ml', 15), 'tbs': ('ml', 15),
+    'tbl': ('ml', 15), 'tablespoon': ('ml', 15), 'tablespoons': ('ml', 15),
+    'cup': ('ml', 240), 'cups': ('ml', 240), 'fl. oz': ('ml', 29.57), 'fl oz': ('ml', 29.57),
+    'fluid ounce': ('ml', 29.57), 'fluid ounces': ('ml', 29.57),
+    'piece': ('', 1), 'pieces': ('', 1), 'pc': ('', 1), 'pcs': ('', 1),
+    'serving': ('', 1), 'servings': ('', 1), 'small': ('', 1), 'medium': ('', 1),
+    'large': ('', 1),
+    # Counted units keep their (singular) name, so cloves add up with cloves
+    'clove': ('clove', 1), 'cloves': ('clove', 1), 'slice': ('slice', 1),
+    'slices': ('slice', 1), 'can': ('can', 1), 'cans': ('can', 1),
+    'pinch': ('pinch', 1), 'pinches': ('pinch', 1), 'bunch': ('bunch', 1),
+    'bunches': ('bunch', 1), 'sprig': ('sprig', 1), 'sprigs': ('sprig', 1),
+    'stalk': ('stalk', 1), 'stalks': ('stalk', 1), 'handful': ('handful', 1),
+    'handfuls': ('handful', 1)
+}
+
+
+def parse_week_start(value=None):
+    """
+    Return the Monday of the week containing `value` (YYYY-MM-DD), or of
+    the current week if it's missing or malformed.
+    """
+    try:
+        day = datetime.strptime(value or '', '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        day = datetime.now().date()
+    return day - timedelta(days=day.weekday())
+
+
+def load_meal_plan(cur, user_id, week_start):
+    """
+    Load a user's planned meals for one week, grouped by day.
+
+    Returns:
+        list: Seven {'date', 'meals'} dicts, Monday first; each meal has
+        id, recipe_id, title and image.
+    """
+    cur.execute("""
+        SELECT m.id, m.plan_date, m.recipe_id, r.title, r.image
+        FROM meal_plan_entries m
+        JOIN recipes r ON r.recipe_id = m.recipe_id
+        WHERE m.user_id = %s
+          AND m.plan_date >= %s
+          AND m.plan_date < %s::date + 7
+        ORDER BY m.plan_date, m.id
+    """, (user_id, week_start, week_start))
+
+    days = [
+        {'date': (week_start + timedelta(days=offset)).isoformat(), 'meals': []}
+        for offset in range(7)
+    ]
+    for row in cur.fetchall():
+        days[(row['plan_date'] - week_start).days]['meals'].append({
+            'id': row['id'],
+            'recipe_id': row['recipe_id'],
+            'title': row['title'],
+            'image': row['image']
+        })
+    return days
+
+
+def create_week_shopping_list(cur, user_id, week_start, name):
+    """
+    Write a week's merged shopping list in one statement.
+
+    Ingredient amounts from every planned recipe are converted to a base
+    unit (UNIT_CONVERSIONS), summed per ingredient and unit, and inserted
+    as a new shopping list with its items, all in one set-based query.
+    Recipes without structured amounts (stored before they existed, or
+    with an empty list) contribute their ingredient lines as they are, and
+    ingredients without an amount are listed by name only.
+
+    Args:
+        cur: Database cursor.
+        user_id (str): Owner of the plan and the new list.
+        week_start (date): Monday of the planned week.
+        name (str): Name of the new list.
+
+    Returns:
+        tuple: (list_id, items), or (None, []) if nothing is planned that week.
+    """
+    units = list(UNIT_CONVERSIONS)
+    cur.execute("""
+        WITH planned AS (
+            SELECT r.ingredients, r.ingredient_amounts
+            FROM meal_plan_entries m
+            JOIN recipes r ON r.recipe_id = m.recipe_id
+            WHERE m.user_id = %(user_id)s
+              AND m.plan_date >= %(week_start)s
+              AND m.plan_date < %(week_start)s::date + 7
+        ), parts AS (
+            SELECT i->>'name' AS name,
+                   (i->>'amount')::numeric AS amount,
+                   COALESCE(i->>'unit', '') AS unit
+            FROM planned, jsonb_array_elements(planned.ingredient_amounts) AS i
+            UNION ALL
+            SELECT lower(i), NULL, ''
+            FROM planned, jsonb_array_elements_text(planned.ingredients) AS i
+            WHERE planned.ingredient_amounts IS NULL
+               OR jsonb_array_length(planned.ingredient_amounts) = 0
+        ), totals AS (
+            SELECT p.name,
+                   COALESCE(u.base_unit, p.unit) AS unit,
+                   SUM(p.amount * COALESCE(u.factor, 1)) AS amount
+            FROM parts p
+            LEFT JOIN unnest(%(units)s::text[], %(base_units)s::text[], %(factors)s::numeric[])
+                 AS u(unit, base_unit, factor) ON u.unit = p.unit
+            GROUP BY p.name, COALESCE(u.base_unit, p.unit)
+        ), lines AS (
+            -- 1500 g reads better as 1.5 kg; no amount (or 0) is just the name
+            SELECT t.name, CASE WHEN COALESCE(round(t.amount, 2), 0) = 0 THEN t.name
+                   ELSE concat_ws(' ',
+                       rtrim(rtrim(round(
+                           CASE WHEN s.scaled THEN t.amount / 1000 ELSE t.amount END, 2
+                       )::text, '0'), '.'),
+                       NULLIF(CASE WHEN s.scaled THEN
+                           CASE t.unit WHEN 'g' THEN 'kg' ELSE 'l' END
+                       ELSE t.unit END, ''),
+                       t.name
+                   ) END AS ingredient
+            FROM totals t
+            CROSS JOIN LATERAL (
+                SELECT t.unit IN ('g', 'ml') AND t.amount >= 1000 AS scaled
+            ) s
+        ), new_list AS (
+            INSERT INTO shopping_lists (user_id, name)
+            SELECT %(user_id)s, %(name)s
+            WHERE EXISTS (SELECT 1 FROM planned)
+            RETURNING id
+        ), new_items AS (
+            INSERT INTO shopping_list_items (shopping_list_id, ingredient)
+            SELECT new_list.id, lines.ingredient
+            FROM new_list, lines
+            ORDER BY lines.name, lines.ingredient
+            RETURNING id, ingredient
+        )
+        SELECT
+            (SELECT id FROM new_list) AS id,
+            COALESCE((SELECT json_agg(ingredient ORDER BY id) FROM new_items), '[]'::json) AS items
+    """, {
+        # An int, so INSERT ... SELECT gets a typed value rather than text
+        'user_id': int(user_id),
+        'week_start': week_start,
+        'name': name,
+        'units': units,
+        'base_units': [UNIT_CONVERSIONS[unit][0] for unit in units],
+        'factors': [UNIT_CONVERSIONS[unit][1] for unit in units]
+    })
+    row = cur.fetchone()
+    return row['id'], row['items']
+
+
 @route('/meal_planner')
 def meal_planner():
     """
-    Render the weekly meal planner page (data loaded from localStorage).
+    Render the weekly meal planner page (plan loaded from /api/meal-plan).
+    """
+    user_id = get_user_id_from_cookie()
+    username = get_current_username(user_id)
+
+    return render_view('meal_planner', username=username)
+
+
+@route('/api/meal-plan')
+def api_get_meal_plan():
+    """
+    Return the user's plan for one week.
+
+    Query: week (YYYY-MM-DD, any day of the week; defaults to this week).
+    Returns: JSON {'week_start': ..., 'days': [{'date', 'meals'}, ...]}.
+    """
+    user_id = get_user_id_from_cookie()
+    if not user_id:
+        return HTTPResponse(status=401, body=json.dumps({'ok': False, 'error': 'Not logged in'}))
+
+    week_start = parse_week_start(request.query.week)
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            days = load_meal_plan(cur, user_id, week_start)
+
+    response.content_type = 'application/json'
+    return json.dumps({'week_start': week_start.isoformat(), 'days': days})
+
+
+@route('/api/meal-plan', method='POST')
+def api_add_meal():
+    """
+    Plan a recipe for a day.
+
+    Expects JSON {"date": "YYYY-MM-DD", "recipe_id": 123}. The recipe is
+    stored in the shared recipes table if it isn't there yet.
+    Returns: JSON {'ok': True, 'id': entry id} or HTTP error.
+    """
+    user_id = get_user_id_from_cookie()
+    if not user_id:
+        return HTTPResponse(status=401, body=json.dumps({'ok': False, 'error': 'Not logged in'}))
+
+    payload = request.json or {}
+    recipe_id = payload.get('recipe_id')
+    try:
+        plan_date = datetime.strptime(str(payload.get('date')), '%Y-%m-%d').date()
+    except ValueError:
+        plan_date = None
+    # bool is a subclass of int; JSON true/false is not a recipe id
+    if not isinstance(recipe_id, int) or isinstance(recipe_id, bool) or plan_date is None:
+        return HTTPResponse(status=400, body=json.dumps({'ok': False, 'error': 'Invalid payload'}))
+
+    try:
+        if not ensure_shared_recipe(recipe_id):
+            return HTTPResponse(
+                status=503,
+                body=json.dumps({'ok': False, 'error': 'Recipe details unavailable'})
+            )
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    INSERT INTO meal_plan_entries (user_id, plan_date, recipe_id)
+                    VALUES (%s, %s, %s)
+                    RETURNING id
+                """, (user_id, plan_date, recipe_id))
+                entry_id = cur.fetchone()['id']
+
+        response.content_type = 'application/json'
+        return json.dumps({'ok': True, 'id': entry_id})
+    except Exception as exc:
+        return HTTPResponse(status=500, body=json.dumps({'ok': False, 'error': str(exc)}))
+
+
+@route('/api/meal-plan/<entry_id:int>', method='DELETE')
+def api_remove_meal(entry_id):
+    """Remove one planned meal belonging to the current user."""
+    user_id = get_user_id_from_cookie()
+    if not user_id:
+        return HTTPResponse(status=401, body=json.dumps({'ok': False, 'error': 'Not logged in'}))
+
+    try:
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "DELETE FROM meal_plan_entries WHERE id = %s AND user_id = %s",
+                    (entry_id, user_id)
+                )
+                if cur.rowcount == 0:
+                    return HTTPResponse(status=404, body=json.dumps({'ok': False}))
+        return {'ok': True}
+    except Exception as exc:
+        return HTTPResponse(status=500, body=json.dumps({'ok': False, 'error': str(exc)}))
+
+
+@route('/api/meal-plan', method='DELETE')
+def api_clear_meal_plan():
+    """Remove every planned meal in one week (query: week, as for GET)."""
+    user_id = get_user_id_from_cookie()
+    if not user_id:
+        return HTTPResponse(status=401, body=json.dumps({'ok': False, 'error': 'Not logged in'}))
+
+    week_start = parse_week_start(request.query.week)
+    try:
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    DELETE FROM meal_plan_entries
+                    WHERE user_id = %s AND plan_date >= %s AND plan_date < %s::date + 7
+                """, (user_id, week_start, week_start))
+                removed = cur.rowcount
+        return {'ok': True, 'removed': removed}
+    except Exception as exc:
+        return HTTPResponse(status=500, body=json.dumps({'ok': False, 'error': str(exc)}))
+
+
+@route('/api/meal-plan/shopping-list', method='POST')
+def api_meal_plan_shopping_list():
+    """
+    Turn a week's plan into one merged shopping list.
+
+    Expects JSON {"week": "YYYY-MM-DD", "name": "..."}; both optional.
+    Returns: JSON {'ok': True, 'id': list id, 'items': [...]}, or 404 when
+    nothing is planned that week.
     """
     user_id = get_user_id_from_cookie()
-    username = get_username_by_id(user_id) if user_id else None
+    if not user_id:
+        return HTTPResponse(status=401, body=json.dumps({'ok': False, 'error': 'Not logged in'}))
+
+    payload = request.json or {}
+    week_start = parse_week_start(payload.get('week'))
+    name = (payload.get('name') or '').strip() or f"Week of {week_start.isoformat()}"
+
+    try:
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                list_id, items = create_week_shopping_list(cur, user_id, week_start, name)
+        if list_id is None:
+            return HTTPResponse(
+                status=404,
+                body=json.dumps({'ok': False, 'error': 'Nothing planned this week'})
+            )
 
-    return template('meal_planner', username=username)
+        response.content_type = 'application/json'
+        return json.dumps({'ok': True, 'id': list_id, 'items': items})
+    except Exception as exc:
+        return HTTPResponse(status=500, body=json.dumps({'ok': False, 'error': str(exc)}))
+
+
+def cache_stats():
+    """Return hit/miss/eviction counters for the recipe and search caches."""
+    return {
+        'memory': dict(recipe_cache.stats, size=len(recipe_cache)),
+        'persistent': dict(recipe_cache_db_stats),
+        'search': dict(search_cache.stats, size=len(search_cache)),
+        'local_index': {'recipes': len(recipe_index)}
+    }
+
+
+@route('/api/stats')
+def api_stats():
+    """
+    Return runtime counters for capacity planning as JSON.
+
+    Includes database pool usage (in use, idle, waiting, checkout latency),
+    recipe/search cache counters, upstream request counters, template
+    render times, static asset sizes, password hashing and cache warmer
+    counters. Access is limited, see metrics_forbidden().
+    """
+    forbidden = metrics_forbidden()
+    if forbidden:
+        return forbidden
+    response.content_type = 'application/json'
+    return json.dumps({
+        'db_pool': db_pool.metrics(),
+        'cache': cache_stats(),
+        'upstream': dict(upstream_stats, breaker_open=upstream_breaker.is_open),
+        'quota': quota_governor.metrics(),
+        'templates': template_metrics(),
+        'assets': asset_metrics(),
+        'passwords': password_metrics(),
+        'warmer': dict(warm_stats)
+    })
+
+
+@route('/metrics')
+def metrics():
+    """
+    Prometheus text exposition of request, stage, DB and upstream metrics.
+
+    Covers per-route request counts and latency histograms, per-stage span
+    histograms (search, details, filter, render, db, upstream, ...), DB
+    query and pool wait counts, cache hit/miss counters and the gauges also
+    reported by /api/stats. Access is limited, see metrics_forbidden().
+    """
+    forbidden = metrics_forbidden()
+    if forbidden:
+        return forbidden
+    response.content_type = 'text/plain; version=0.0.4; charset=utf-8'
+    return render_metrics()
 
 
 @route('/static/<filepath:path>')
@@ -788,12 +1929,87 @@ def serve_static(filepath):
     """
     Serve static assets from the ./static directory.
 
+    Fingerprinted paths from asset_url() are served from memory with a
+    one-year immutable Cache-Control; plain paths still work but must be
+    revalidated. Both answer If-None-Match with 304.
+
     :param filepath: path of the requested static file
     :return: File response
     """
-    return static_file(filepath, root='./static')
+    if ASSET_PIPELINE:
+        if not asset_files:
+            build_assets()
+        asset = asset_files.get(filepath)
+        if asset is not None:
+            return asset_response(asset, immutable=True)
+        served_path = asset_manifest.get(filepath.lower())
+        if served_path is not None:
+            return asset_response(asset_files[served_path], immutable=False)
+    return static_file(filepath, root=STATIC_DIR)
+
+
+def start_background_tasks():
+    """Start per-process background work once the server process is ready."""
+    if ASSET_PIPELINE:
+        build_assets()
+    preload_templates()
+    # Build the local ingredient index without delaying startup
+    threading.Thread(target=load_recipe_index, daemon=True).start()
+    if WARM_INTERVAL > 0:
+        threading.Thread(target=run_cache_warmer, daemon=True, name='cache-warmer').start()
+    if PROFILE_REQUESTS and not PROFILE_TOKEN:
+        print("Error: PROFILE_REQUESTS=1 needs a PROFILE_TOKEN; request profiling stays off")
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    """wsgiref server that handles each request on its own thread."""
+    daemon_threads = True
+
+
+def serve(mode=None):
+    """
+    Start the web server in the given serving mode (defaults to SERVER).
+
+    dev       bottle's single-threaded debug server (templates are only
+              reloaded on change with TEMPLATE_RELOAD=1)
+    threaded  stdlib server with one thread per request, no extra packages
+    waitress  waitress with a bounded pool of THREADS threads
+    gunicorn  WORKERS processes with THREADS threads each (gthread workers)
+
+    All modes other than dev run the blocking requests/psycopg2 calls on
+    worker threads, so a slow upstream search only holds its own thread.
+    """
+    mode = mode or SERVER
+
+    if mode == 'gunicorn':
+        # Each forked worker opens its own pooled connections on first use
+        # and builds its own local ingredient index; only one of them runs
+        # the cache warmer (see background.py)
+        run(server='gunicorn', host=HOST, port=PORT,
+            workers=WORKERS, threads=THREADS, worker_class='gthread',
+            post_fork=lambda server, worker: start_background_tasks())
+        return
+
+    start_background_tasks()
+
+    # Open the minimum number of pooled connections up front
+    try:
+        db_pool.fill()
+    except psycopg2.Error as exc:
+        print(f"Could not pre-open database connections: {exc}")
+
+    if mode == 'threaded':
+        run(server='wsgiref', host=HOST, port=PORT, server_class=ThreadingWSGIServer)
+    elif mode == 'waitress':
+        run(server='waitress', host=HOST, port=PORT, threads=THREADS)
+    else:
+        # Start development server on localhost:8080
+        run(host=HOST, port=PORT, debug=True)
+
+
+# WSGI entry point for external servers, e.g. `gunicorn program:application`
+application = default_app()
 
 
 if __name__ == '__main__':
-    # Start development server on localhost:8080
-    run(host='localhost', port=8080, debug=True)
+    serve()
@@ -0,0 +1,525 @@
+"""
+Recipe search: filters, diet rules, the search-result cache and paging.
+
+A search is answered from the local ingredient index first and then from
+cached or fresh complexSearch results, with details resolved through the
+recipe cache (see cache.py). The routes in program.py render the results.
+"""
+
+import base64
+import json
+import re
+import threading
+import time
+from collections import Counter
+
+from cache import (
+    LRUCache, detail_executor, fetch_detailed_recipes, get_cached_recipes,
+    iter_detailed_batches, recipe_index
+)
+from config import (
+    API_SEARCH_PAGE_BUDGET, SEARCH_CACHE_SIZE, SEARCH_CACHE_STALE, SEARCH_CACHE_TTL,
+    SEARCH_RESULT_COUNT, STREAM_CHUNK_SIZE, UPSTREAM_PAGE_SIZE
+)
+from upstream import fetch_recipes_from_api
+
+# Search-result cache: entries are fresh for SEARCH_CACHE_TTL seconds, then served
+# stale for up to SEARCH_CACHE_STALE more seconds while a background refresh runs
+search_cache = LRUCache(SEARCH_CACHE_SIZE, SEARCH_CACHE_TTL + SEARCH_CACHE_STALE)
+search_refreshing = set()
+search_refreshing_lock = threading.Lock()
+
+# Searches seen per cache key, decayed on every warmer run; the most frequent
+# ones are kept warm by warm_caches()
+search_traffic = Counter()
+search_traffic_lock = threading.Lock()
+
+
+# Keywords that rule a recipe out of a diet when found as a word (or its
+# plural) in its title or any ingredient name, lowercase
+MEAT = ('chicken', 'beef', 'pork', 'bacon', 'turkey', 'ham', 'lamb', 'veal', 'duck', 'venison',
+        'sausage', 'salami', 'chorizo', 'prosciutto', 'pancetta', 'gelatin')
+SEAFOOD = ('fish', 'salmon', 'tuna', 'cod', 'shrimp', 'prawn', 'anchovy', 'anchovies', 'crab',
+           'lobster', 'mussel', 'clam', 'oyster', 'scallop', 'squid', 'sardine', 'mackerel',
+           'trout')
+DAIRY = ('cheese', 'milk', 'buttermilk', 'butter', 'yogurt', 'yoghurt', 'cream', 'parmesan',
+         'mozzarella', 'ricotta', 'feta')
+ANIMAL_OTHER = ('egg', 'honey')
+GLUTEN = ('wheat', 'flour', 'bread', 'breadcrumb', 'pasta', 'spaghetti', 'macaroni', 'noodle',
+          'barley', 'rye', 'spelt', 'couscous', 'semolina', 'bulgur', 'tortilla', 'seitan')
+
+# Phrases that contain one of the keywords but keep to the diet, removed
+# from a line where a keyword was found before looking again (regex,
+# lowercase, never spanning lines)
+MEAT_LOOKALIKES = (r'oyster mushrooms?', r'chicken of the woods', r'mock duck',
+                   r'(?:vegan|vegetarian|meatless|plant[- ]based)\b[^\n]*')
+DAIRY_LOOKALIKES = (r'(?:coconut|almond|oat|soya?|rice|cashew|hemp) (?:milk|cream|yogh?urt)',
+                    r'cream of (?:coconut|tartar)',
+                    r'(?:peanut|almond|cashew|nut|cocoa|apple|shea) butter',
+                    r'(?:vegan|dairy[- ]free)\b[^\n]*')
+GLUTEN_LOOKALIKES = (r'(?:rice|almond|coconut|corn|chickpea|gram|tapioca|potato|buckwheat|'
+                     r'sorghum|teff|cassava) flour',
+                     r'(?:rice|glass|cellophane|kelp|shirataki|bean thread) noodles?',
+                     r'corn tortillas?', r'rice paper', r'gluten[- ]free\b[^\n]*')
+
+# Diet name (as sent by the search form, lowercased) -> (excluded keywords,
+# lookalike phrases). Only used for recipes whose details lack Spoonacular's
+# own diet labels. Diets without an entry (e.g. ketogenic) cannot be checked
+# from keywords.
+DIET_RULES = {
+    'vegetarian': (MEAT + SEAFOOD, MEAT_LOOKALIKES),
+    'pescetarian': (MEAT, MEAT_LOOKALIKES),
+    'vegan': (MEAT + SEAFOOD + DAIRY + ANIMAL_OTHER, MEAT_LOOKALIKES + DAIRY_LOOKALIKES),
+    'gluten free': (GLUTEN, GLUTEN_LOOKALIKES),
+    'dairy free': (DAIRY + ('whey', 'casein', 'ghee'), DAIRY_LOOKALIKES),
+}
+
+
+def compile_diet_rules(rules):
+    """
+    Compile each diet's rules into a (keywords, lookalikes) regex pair.
+
+    Keywords match whole words with an optional plural ending, so "ham"
+    does not match "graham" and "egg" does not match "eggplant".
+    """
+    compiled = {}
+    for diet, (words, lookalikes) in rules.items():
+        alternation = "|".join(re.escape(word) for word in sorted(set(words), key=len, reverse=True))
+        compiled[diet] = (
+            re.compile(rf"\b(?:{alternation})(?:e?s)?\b"),
+            re.compile(r"\b(?:" + "|".join(lookalikes) + ")") if lookalikes else None
+        )
+    return compiled
+
+
+DIET_PATTERNS = compile_diet_rules(DIET_RULES)
+
+
+def diet_text_allowed(text, rule):
+    """
+    Check diet text (title and ingredient names, one per line) against one
+    compiled rule from DIET_PATTERNS.
+
+    Most lines hold no keyword, so the keyword regex runs over the whole
+    text first; the lookalike phrases are only removed from a line where a
+    keyword was found, and that line is searched again.
+    """
+    keywords, lookalikes = rule
+    match = keywords.search(text)
+    while match:
+        if lookalikes is None:
+            return False
+        start = text.rfind("\n", 0, match.start()) + 1
+        end = text.find("\n", match.end())
+        if end < 0:
+            end = len(text)
+        if keywords.search(lookalikes.sub(' ', text[start:end])):
+            return False
+        match = keywords.search(text, end)
+    return True
+
+
+def diet_match(recipe, diet):
+    """
+    Check a recipe (RecipeRecord) against a diet.
+
+    Spoonacular's diet labels decide when the details carry them; otherwise
+    the keyword rules in DIET_PATTERNS do.
+
+    Returns:
+        bool or None: Whether the recipe fits, or None if neither the labels
+        nor the rules can tell.
+    """
+    if not diet:
+        return True
+    if recipe.diets is not None:
+        return diet in recipe.diets
+    rule = DIET_PATTERNS.get(diet)
+    if rule is None:
+        return None
+    return diet_text_allowed(recipe.diet_text, rule)
+
+
+def is_recipe_valid(recipe, diet, require_match=False):
+    """
+    Determine if a recipe (RecipeRecord) matches the selected diet.
+
+    API results have already been filtered by complexSearch's diet
+    parameter, so a diet that cannot be checked locally lets them through.
+    Recipes from the local corpus had no such filter and pass
+    `require_match=True` to be dropped instead.
+    """
+    match = diet_match(recipe, diet)
+    return match if match is not None else not require_match
+
+
+def classify_recipes(recipes, diet, require_match=False):
+    """
+    Check a whole result set against a diet in one pass.
+
+    Same answers as is_recipe_valid(), with the diet rule looked up once
+    for the set instead of once per recipe.
+
+    Args:
+        recipes (list): RecipeRecords to check.
+        diet (str): Diet name from the search filters, '' for none.
+        require_match (bool): See is_recipe_valid().
+
+    Returns:
+        list: One bool per recipe, True if it fits the diet.
+    """
+    if not diet:
+        return [True] * len(recipes)
+    rule = DIET_PATTERNS.get(diet)
+    fits = []
+    for recipe in recipes:
+        if recipe.diets is not None:
+            fits.append(diet in recipe.diets)
+        elif rule is None:
+            fits.append(not require_match)
+        else:
+            fits.append(diet_text_allowed(recipe.diet_text, rule))
+    return fits
+
+
+def filter_recipes(pairs, filters, require_match=False):
+    """
+    Keep the (summary, recipe) pairs whose recipe passes all filters.
+
+    The diet is checked for the whole set with classify_recipes(), the
+    other filters per recipe with within_limits(). Pairs without details
+    are dropped.
+
+    Args:
+        pairs (list): (summary, RecipeRecord or None) tuples, in result order.
+        filters (dict): Parsed search filters.
+        require_match (bool): See is_recipe_valid().
+
+    Returns:
+        list: The passing pairs, in their original order.
+    """
+    pairs = [
+        (summary, recipe) for summary, recipe in pairs
+        if recipe and within_limits(
+            recipe, filters['max_calories'], filters['max_time'], filters['difficulty']
+        )
+    ]
+    fits = classify_recipes([recipe for _, recipe in pairs], filters['diet'], require_match)
+    return [pair for pair, fit in zip(pairs, fits) if fit]
+
+
+def search_local_recipes(filters, limit=None):
+    """
+    Answer a search from the local corpus.
+
+    Ranks indexed recipes by ingredient coverage, loads their details from
+    the recipe cache and applies the same filters as API results, except
+    that a recipe whose diet cannot be checked is left out; the search then
+    goes to the API, which filters by the diet itself.
+
+    Returns:
+        list: RecipeRecords that pass all filters, best match first.
+    """
+    limit = limit or SEARCH_RESULT_COUNT
+    # Over-select, since diet/calorie/time filters will drop some
+    recipe_ids = recipe_index.search(normalize_ingredients(filters['ingredients']), limit * 3)
+    if not recipe_ids:
+        return []
+    found, _ = get_cached_recipes(recipe_ids)
+
+    pairs = filter_recipes([(None, found.get(recipe_id)) for recipe_id in recipe_ids], filters,
+                           require_match=True)
+    return [recipe for _, recipe in pairs[:limit]]
+
+
+def extract_recipe_data(summary, recipe):
+    """
+    Build the recipe dictionary used by the frontend.
+
+    Args:
+        summary (dict or None): complexSearch result (id, title, image);
+            None for recipes answered from the local corpus.
+        recipe (RecipeRecord): Normalized detail info.
+    """
+    summary = summary or {}
+    return {
+        'id': summary.get('id', recipe.id),
+        'title': summary.get('title', recipe.title),
+        'image': summary.get('image', recipe.image),
+        'readyInMinutes': recipe.ready_in_minutes,
+        'servings': recipe.servings,
+        'nutrition': recipe.nutrition,
+        'difficulty': recipe.difficulty,
+        'instructions': recipe.instructions,
+        'ingredients': recipe.ingredients
+    }
+
+
+def parse_search_filters(forms):
+    """
+    Parse search-related filters from request forms.
+
+    Returns a dict with keys:
+      - ingredients (str)
+      - diet (str)
+      - max_calories (int or None)
+      - max_time (int or None)
+      - difficulty (str or None)
+    """
+    ingredients = forms.get('ingredients', '').strip()
+    diet = forms.get('diet', '').strip().lower()
+
+    max_calories_input = forms.get('max_calories', '').strip()
+    max_time_input = forms.get('max_time', '').strip()
+    difficulty_input = forms.get('difficulty', '').strip().capitalize()
+
+    max_calories = int(max_calories_input) if max_calories_input.isdigit() else None
+    max_time = int(max_time_input)     if max_time_input.isdigit()     else None
+    difficulty = difficulty_input if difficulty_input in ('Easy', 'Mid', 'Hard') else None
+
+    return {
+        'ingredients': ingredients,
+        'diet': diet,
+        'max_calories': max_calories,
+        'max_time': max_time,
+        'difficulty': difficulty
+    }
+
+
+def normalize_ingredients(ingredients):
+    """
+    Canonicalize an ingredient query: lowercased, de-duplicated, sorted tokens.
+
+    "Tomato,  cheese, tomato" and "cheese, tomato" both become
+    ('cheese', 'tomato').
+    """
+    tokens = {" ".join(token.lower().split()) for token in ingredients.split(',')}
+    return tuple(sorted(token for token in tokens if token))
+
+
+def search_cache_key(filters, offset=0):
+    """
+    Build the search cache key from parsed filters and the upstream offset.
+
+    Difficulty is left out on purpose: it is applied after the API call, so
+    searches that only differ in difficulty share one cached result set.
+    """
+    return (
+        normalize_ingredients(filters['ingredients']),
+        filters['diet'],
+        filters['max_calories'],
+        filters['max_time'],
+        offset
+    )
+
+
+class SearchUnavailable(Exception):
+    """Raised when the upstream search fails before a page has any results."""
+
+
+def fetch_search_results(key):
+    """
+    Call complexSearch for a cache key and store the results.
+
+    Returns:
+        list or None: Result summaries, or None if the call failed; failures
+        are not cached.
+    """
+    ingredients, diet, max_calories, max_time, offset = key
+    results = fetch_recipes_from_api(", ".join(ingredients), diet, max_calories, max_time, offset)
+    if results is None:
+        return None
+    # Keep only what rendering needs; details come from the recipe cache
+    results = [
+        {'id': r['id'], 'title': r.get('title', ''), 'image': r.get('image', '')}
+        for r in results
+    ]
+    search_cache.set(key, (results, time.monotonic() + SEARCH_CACHE_TTL))
+    return results
+
+
+def refresh_search_results(key):
+    """Background refresh of a stale search cache entry."""
+    try:
+        fetch_search_results(key)
+    except Exception as exc:
+        print(f"Error refreshing search cache: {exc}")
+    finally:
+        with search_refreshing_lock:
+            search_refreshing.discard(key)
+
+
+def record_search(key):
+    """Count a search for the cache warmer, keeping the counter bounded."""
+    with search_traffic_lock:
+        search_traffic[key] += 1
+        if len(search_traffic) > 2 * SEARCH_CACHE_SIZE:
+            keep = search_traffic.most_common(SEARCH_CACHE_SIZE)
+            search_traffic.clear()
+            search_traffic.update(dict(keep))
+
+
+def search_recipes(filters, offset=0):
+    """
+    Return complexSearch results for the filters, using the search cache.
+
+    Fresh entries are returned directly. Stale entries are returned as well,
+    and a single background refresh per key is started. Misses call the API.
+
+    Args:
+        filters (dict): Parsed search filters.
+        offset (int): Upstream result offset, for pages after the first.
+
+    Returns:
+        list or None: Result summaries, or None if the API call failed.
+    """
+    key = search_cache_key(filters, offset)
+    record_search(key)
+    entry = search_cache.get(key)
+    if entry is None:
+        return fetch_search_results(key)
+
+    results, fresh_until = entry
+    if fresh_until < time.monotonic():
+        with search_refreshing_lock:
+            start_refresh = key not in search_refreshing
+            search_refreshing.add(key)
+        if start_refresh:
+            detail_executor.submit(refresh_search_results, key)
+    return results
+
+
+def within_limits(recipe, max_calories, max_time, difficulty):
+    """Check a RecipeRecord against the calorie, time and difficulty filters."""
+    calories = recipe.calories
+
+    if max_calories is not None and calories is not None and calories > max_calories:
+        return False
+    if max_time is not None and recipe.ready_in_minutes > max_time:
+        return False
+    if difficulty is not None and recipe.difficulty != difficulty:
+        return False
+    return True
+
+
+def should_include_recipe(recipe, diet, max_calories, max_time, difficulty, require_match=False):
+    """
+    Determine if a detailed recipe (RecipeRecord) should be included based on all filters.
+
+    `require_match` is passed on to is_recipe_valid(). For a whole result
+    set, filter_recipes() does the same with one diet pass.
+    """
+    return (within_limits(recipe, max_calories, max_time, difficulty)
+            and is_recipe_valid(recipe, diet, require_match))
+
+
+def build_no_results_message(filters):
+    """
+    Build a feedback message when no recipes match the given filters.
+    """
+    criteria = []
+    if filters['ingredients']:
+        criteria.append(f"ingredient '{filters['ingredients']}'")
+    if filters['diet']:
+        criteria.append(f"diet '{filters['diet']}'")
+    if filters['max_calories'] is not None:
+        criteria.append(f"max {filters['max_calories']} kcal")
+    if filters['max_time'] is not None:
+        criteria.append(f"max {filters['max_time']} min")
+    if filters['difficulty'] is not None:
+        criteria.append(f"difficulty '{filters['difficulty']}'")
+
+    if criteria:
+        return "No recipes found matching " + ", ".join(criteria) + "."
+    return "No recipes found."
+
+
+def iter_search_results(filters):
+    """
+    Yield formatted recipes for a search as soon as each one is ready.
+
+    Local corpus matches come first, then API results in the order their
+    details arrive. Stops after SEARCH_RESULT_COUNT recipes.
+    """
+    count = 0
+    seen = set()
+    for recipe in search_local_recipes(filters):
+        seen.add(recipe.id)
+        count += 1
+        yield extract_recipe_data(None, recipe)
+    if count >= SEARCH_RESULT_COUNT:
+        return
+
+    summaries = {
+        summary['id']: summary
+        for summary in search_recipes(filters) or [] if summary['id'] not in seen
+    }
+    for batch in iter_detailed_batches(list(summaries), chunk_size=STREAM_CHUNK_SIZE):
+        pairs = [(summaries[recipe_id], recipe) for recipe_id, recipe in batch.items()]
+        for summary, recipe in filter_recipes(pairs, filters):
+            count += 1
+            yield extract_recipe_data(summary, recipe)
+            if count >= SEARCH_RESULT_COUNT:
+                return
+
+
+def encode_search_cursor(offset):
+    """Encode an upstream offset as an opaque pagination cursor."""
+    return base64.urlsafe_b64encode(json.dumps({'offset': offset}).encode()).decode()
+
+
+def decode_search_cursor(cursor):
+    """
+    Decode a cursor from encode_search_cursor().
+
+    Returns:
+        int or None: The upstream offset, or None if the cursor is invalid.
+    """
+    try:
+        offset = json.loads(base64.urlsafe_b64decode(cursor.encode()))['offset']
+    except (ValueError, KeyError, TypeError):
+        return None
+    return offset if isinstance(offset, int) and offset >= 0 else None
+
+
+def search_page(filters, offset, limit):
+    """
+    Build one page of filtered search results starting at an upstream offset.
+
+    Upstream pages are fetched one after another until `limit` recipes pass
+    the filters, the results run out, or API_SEARCH_PAGE_BUDGET pages have
+    been fetched. The returned offset points just past the last upstream
+    result that was looked at, so the next page continues from there. If an
+    upstream call fails after some recipes were found, the offset stays at
+    the failed page so the next request tries it again.
+
+    Returns:
+        tuple: (recipes, next_offset) where next_offset is None when the
+        upstream has no more results.
+
+    Raises:
+        SearchUnavailable: The upstream call failed before any recipe was found.
+    """
+    recipes = []
+    for _ in range(API_SEARCH_PAGE_BUDGET):
+        raw_results = search_recipes(filters, offset)
+        if raw_results is None:
+            if not recipes:
+                raise SearchUnavailable('Recipe search is unavailable')
+            return recipes, offset
+        if not raw_results:
+            return recipes, None
+
+        details = fetch_detailed_recipes([summary['id'] for summary in raw_results])
+        # Positions let the next cursor point just past the last recipe used
+        positions = {summary['id']: position for position, summary in enumerate(raw_results, 1)}
+        pairs = [(summary, recipe) for summary, (_, recipe) in zip(raw_results, details)]
+        for summary, recipe in filter_recipes(pairs, filters):
+            recipes.append(extract_recipe_data(summary, recipe))
+            if len(recipes) >= limit:
+                return recipes, offset + positions[summary['id']]
+
+        offset += len(raw_results)
+        if len(raw_results) < UPSTREAM_PAGE_SIZE:
+            return recipes, None
+    return recipes, offset
@@ -1,20 +1,22 @@
 // Handle click on recipe images to open a detailed modal with full recipe information
+// (delegated, so cards added later by the streaming search work too)
 document.addEventListener('DOMContentLoaded', () => {
-  document.querySelectorAll('.recipe-img').forEach(img => {
-    img.addEventListener('click', () => {
-      document.getElementById('recipeModalLabel').textContent = img.dataset.title;
-      document.getElementById('recipeModalImage').src = img.dataset.image;
-      document.getElementById('recipeModalDifficulty').textContent = img.dataset.difficulty || 'Unknown';
-      document.getElementById('recipeModalTime').textContent = img.dataset.time || 'Unknown';
-      document.getElementById('recipeModalServings').textContent = img.dataset.servings || 'Unknown';
-      document.getElementById('recipeModalNutrition').textContent = img.dataset.nutrition || 'Information missing';
+  document.addEventListener('click', e => {
+    const img = e.target.closest('.recipe-img');
+    if (!img) return;
 
-      const card = img.closest('.card');
-      document.getElementById('recipeModalInstructions').innerHTML =
-        card.dataset.instructions || '<p>No description available.</p>';
+    document.getElementById('recipeModalLabel').textContent = img.dataset.title;
+    document.getElementById('recipeModalImage').src = img.dataset.image;
+    document.getElementById('recipeModalDifficulty').textContent = img.dataset.difficulty || 'Unknown';
+    document.getElementById('recipeModalTime').textContent = img.dataset.time || 'Unknown';
+    document.getElementById('recipeModalServings').textContent = img.dataset.servings || 'Unknown';
+    document.getElementById('recipeModalNutrition').textContent = img.dataset.nutrition || 'Information missing';
 
-      const modal = new bootstrap.Modal(document.getElementById('recipeModal'));
-      modal.show();
-    });
+    const card = img.closest('.card');
+    document.getElementById('recipeModalInstructions').innerHTML =
+      card.dataset.instructions || '<p>No description available.</p>';
+
+    const modal = new bootstrap.Modal(document.getElementById('recipeModal'));
+    modal.show();
   });
 });
@@ -71,36 +71,27 @@ document.addEventListener('DOMContentLoaded', async () => {
   }
 
   // -----------------------------------
-  // Favorite-star button handlers
+  // Favorite-star button handler (delegated, so streamed cards work too)
   // -----------------------------------
-  document.querySelectorAll('.favorite-star').forEach(button => {
-    button.addEventListener('click', async () => {
-      event.preventDefault();
-      // Collect recipe data
-      const recipeData = {
-        recipe_id:        button.dataset.recipeId,
-        title:            button.dataset.title,
-        image:            button.dataset.image,
-        difficulty:       button.dataset.difficulty || 'Unknown',
-        ready_in_minutes: button.dataset.time       || 'Unknown',
-        servings:         button.dataset.servings   || 'Unknown',
-        nutrition:        button.dataset.nutrition  || 'Information missing',
-        instructions:     button.dataset.instructions || 'No instructions available.',
-        ingredients:      button.dataset.ingredients
-      };
+  document.addEventListener('click', async event => {
+    const button = event.target.closest('.favorite-star');
+    if (!button) return;
 
-      const formData = new FormData();
-      Object.entries(recipeData).forEach(([k, v]) => formData.append(k, v));
+    event.preventDefault();
+    // The server fills in the recipe details from its own cache
+    const recipeData = { recipe_id: button.dataset.recipeId };
 
-      if (!isLoggedIn) {
-        // Defer until after login
-        sessionStorage.setItem('pendingFavorite', JSON.stringify(recipeData));
-        new bootstrap.Modal(document.getElementById('loginModal')).show();
-        return;
-      }
+    const formData = new FormData();
+    Object.entries(recipeData).forEach(([k, v]) => formData.append(k, v));
 
-      // If logged in, send immediately and then redirect
-      await sendFavorite(formData);
-    });
+    if (!isLoggedIn) {
+      // Defer until after login
+      sessionStorage.setItem('pendingFavorite', JSON.stringify(recipeData));
+      new bootstrap.Modal(document.getElementById('loginModal')).show();
+      return;
+    }
+
+    // If logged in, send immediately and then redirect
+    await sendFavorite(formData);
   });
 });
@@ -53,32 +53,33 @@ document.addEventListener('DOMContentLoaded', () => {
     }
   }
 
-  // 1) Klick på ingrediens-knapp -> fyll modal
-  document.querySelectorAll('.ingredients-btn').forEach(btn => {
-    btn.addEventListener('click', () => {
-      const title = btn.dataset.title;
-      currentIngredients = JSON.parse(btn.dataset.ingredients);
-
-      titleEl.textContent = `Ingredients for ${title}`;
-      listEl.innerHTML   = '';
-
-      currentIngredients.forEach((ing, i) => {
-        const li = document.createElement('li');
-        li.className = 'list-group-item d-flex align-items-center bg-white text-dark';
-        li.innerHTML = `
-          <input type="checkbox" id="ing-${i}" class="form-check-input me-2">
-          <label for="ing-${i}" class="flex-grow-1">${ing}</label>
-        `;
-        li.querySelector('input').addEventListener('change', e => {
-          li.querySelector('label')
-            .classList.toggle('text-decoration-line-through', e.target.checked);
-          updateCount();
-        });
-        listEl.appendChild(li);
+  // 1) Klick på ingrediens-knapp -> fyll modal (delegerat, så strömmade kort fungerar)
+  document.addEventListener('click', e => {
+    const btn = e.target.closest('.ingredients-btn');
+    if (!btn) return;
+
+    const title = btn.dataset.title;
+    currentIngredients = JSON.parse(btn.dataset.ingredients);
+
+    titleEl.textContent = `Ingredients for ${title}`;
+    listEl.innerHTML   = '';
+
+    currentIngredients.forEach((ing, i) => {
+      const li = document.createElement('li');
+      li.className = 'list-group-item d-flex align-items-center bg-white text-dark';
+      li.innerHTML = `
+        <input type="checkbox" id="ing-${i}" class="form-check-input me-2">
+        <label for="ing-${i}" class="flex-grow-1">${ing}</label>
+      `;
+      li.querySelector('input').addEventListener('change', e => {
+        li.querySelector('label')
+          .classList.toggle('text-decoration-line-through', e.target.checked);
+        updateCount();
       });
-
-      updateCount();
+      listEl.appendChild(li);
     });
+
+    updateCount();
   });
 
   // 2) Klick på "Generate shopping list"
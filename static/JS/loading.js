@@ -1,6 +1,8 @@
 // /static/js/loading.js
 
-// Display loading spinner and disable search button when the form is submitted
+// Display loading spinner and disable search button when the form is submitted.
+// Where the browser supports server-sent events, results are streamed from
+// /search/stream and each recipe card is shown as soon as it is ready.
 document.addEventListener('DOMContentLoaded', () => {
 
     // Select the recipe search form, spinner, and button elements
@@ -10,13 +12,66 @@ document.addEventListener('DOMContentLoaded', () => {
   
     // If any element is missing, do nothing
     if (!form || !spinner || !button) return;
-  
 
-    // Attach submit handler to the form
-    form.addEventListener('submit', () => {
-// Show spinner and disable button
-spinner.classList.remove('d-none');
+    let source = null;
+
+    // Find (or create) the section the recipe cards go into, emptied for a new search
+    function resetResults() {
+      document.querySelectorAll('.no-results-message').forEach(el => el.remove());
+      let container = document.querySelector('.recipe-container');
+      if (!container) {
+        container = document.createElement('section');
+        container.className = 'recipe-container row gx-3 gy-4 justify-content-center';
+        document.querySelector('.search-section').after(container);
+      }
+      container.innerHTML = '';
+      return container;
+    }
+
+    function finish() {
+      if (source) source.close();
+      source = null;
+      spinner.classList.add('d-none');
+      button.disabled = false;
+    }
+
+    // Attach submit handler to the form (registered last, so the filter and
+    // ingredient handlers have already normalized the form values)
+    form.addEventListener('submit', (e) => {
+      // Show spinner and disable button
+      spinner.classList.remove('d-none');
       button.disabled = true;
+
+      // Without EventSource, fall back to the normal form POST
+      if (!window.EventSource) return;
+      e.preventDefault();
+
+      if (source) source.close();
+      const container = resetResults();
+      const params = new URLSearchParams(new FormData(form));
+      source = new EventSource('/search/stream?' + params.toString());
+
+      source.addEventListener('recipe', ev => {
+        const { html } = JSON.parse(ev.data);
+        const wrapper = document.createElement('div');
+        wrapper.innerHTML = html;
+        const card = wrapper.querySelector('.col-12');
+        container.appendChild(card);
+        if (window.initTooltips) window.initTooltips(card);
+      });
+
+      source.addEventListener('done', ev => {
+        const { count, message } = JSON.parse(ev.data);
+        if (!count) {
+          const note = document.createElement('section');
+          note.className = 'no-results-message';
+          note.textContent = message;
+          container.before(note);
+        }
+        finish();
+      });
+
+      // Stream broke off: keep what arrived, let the user search again
+      source.onerror = finish;
     });
   });
-  
\ No newline at end of file
@@ -1,6 +1,7 @@
 /**
- * @fileoverview Implements weekly meal planning functionality, storing plans in localStorage
- * and handling UI interactions for adding, removing, and clearing meals for the current week.
+ * @fileoverview Implements weekly meal planning functionality. Plans are stored on the server
+ * (/api/meal-plan), so they follow the user across devices, and a week's plan can be turned
+ * into one merged shopping list.
  */
 
 document.addEventListener('DOMContentLoaded', () => {
@@ -9,215 +10,247 @@ document.addEventListener('DOMContentLoaded', () => {
      * @type {boolean}
      */
     const isLoggedIn = document.body.dataset.loggedIn === 'true';
-    
+
     /**
-     * Holds the title of the currently selected recipe for planning.
-     * @type {string}
+     * The recipe currently selected for planning.
+     * @type {{id: number, title: string}|null}
      */
-    let selectedRecipe = '';
-  
+    let selectedRecipe = null;
+
     /**
      * List of day names for display in the planner (Monday – Sunday).
      * @type {string[]}
      */
     const daysOfWeek = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'];
-  
+
     /**
-     * Container element for rendering each day's meal boxes.
-     * @type {HTMLElement}
+     * Container element for rendering each day's meal boxes (only on the planner page).
+     * @type {HTMLElement|null}
      */
     const weekContainer = document.getElementById('weekPlanContainer');
-  
+
     /**
-     * Computes ISO date strings for Monday through Sunday of the current week.
-     * @returns {string[]} Array of dates in YYYY-MM-DD format.
+     * Formats a date as YYYY-MM-DD in local time.
+     * @param {Date} d
+     * @returns {string}
      */
-    function getCurrentWeekDates() {
+    const formatDate = d =>
+      `${d.getFullYear()}-${String(d.getMonth() + 1).padStart(2, '0')}-${String(d.getDate()).padStart(2, '0')}`;
+
+    /**
+     * Returns Monday and Sunday of the current week.
+     * @returns {{monday: Date, sunday: Date}}
+     */
+    function getCurrentWeek() {
       const today = new Date();
       // getDay(): Sunday=0, Monday=1, ..., Saturday=6
-      const dayOfWeek = today.getDay();
       const monday = new Date(today);
       // Calculate offset to Monday: (dayOfWeek + 6) % 7 shifts Sunday->6, Monday->0, etc.
-      monday.setDate(today.getDate() - ((dayOfWeek + 6) % 7));
-      
-      // Build array of 7 dates starting from Monday
-      return Array.from({ length: 7 }, (_, i) => {
-        const date = new Date(monday);
-        date.setDate(monday.getDate() + i);
-        return date.toISOString().split('T')[0];
-      });
+      monday.setDate(today.getDate() - ((today.getDay() + 6) % 7));
+      monday.setHours(0, 0, 0, 0);
+
+      const sunday = new Date(monday);
+      sunday.setDate(monday.getDate() + 6);
+      sunday.setHours(23, 59, 59, 999);
+      return { monday, sunday };
     }
-  
+
     /**
-     * Renders the weekly view based on stored meal plans in localStorage.
+     * Renders the weekly view from the plan stored on the server.
      * Clears container and creates a column for each day, listing meals or a placeholder.
      */
-    function refreshWeekView() {
-      // Retrieve stored plans or initialize empty object
-      const plans = JSON.parse(localStorage.getItem('mealPlans') || '{}');
+    async function refreshWeekView() {
+      if (!weekContainer) return;
+      if (!isLoggedIn) {
+        weekContainer.innerHTML = '<em>Log in to plan your meals.</em>';
+        return;
+      }
+
+      const week = formatDate(getCurrentWeek().monday);
+      const resp = await fetch(`/api/meal-plan?week=${week}`, { credentials: 'include' });
+      if (!resp.ok) {
+        weekContainer.innerHTML = '<em>Could not load your plan.</em>';
+        return;
+      }
+      const plan = await resp.json();
       weekContainer.innerHTML = '';
-  
-      const weekDates = getCurrentWeekDates();
-      weekDates.forEach((dateStr, index) => {
-        const meals = plans[dateStr] || [];
-  
+
+      plan.days.forEach((day, index) => {
         // Create Bootstrap column for this day
         const col = document.createElement('div');
         col.className = 'col-md-4 mb-4';
-  
+
         // Create card-like box for the day's meals
         const box = document.createElement('div');
         box.className = 'day-box p-3 rounded shadow-sm bg-white text-dark';
-  
+
         // Header with day name and date
-        let content = `<h5>${daysOfWeek[index]} <small class=\"text-muted\">(${dateStr})</small></h5>`;
-  
-        if (meals.length > 0) {
-          content += '<ul class=\"mt-2\">';
-          meals.forEach((meal, i) => {
-            content += `
-              <li class=\"d-flex justify-content-between align-items-center\">
-                ${meal}
-                <span class=\"ms-2 text-danger fs-3\" role=\"button\" style=\"cursor: pointer;\" onclick=\"removeMeal('${dateStr}', ${i})\">×</span>
-              </li>`;
+        box.innerHTML = `<h5>${daysOfWeek[index]} <small class="text-muted">(${day.date})</small></h5>`;
+
+        if (day.meals.length > 0) {
+          const list = document.createElement('ul');
+          list.className = 'mt-2';
+          day.meals.forEach(meal => {
+            const item = document.createElement('li');
+            item.className = 'd-flex justify-content-between align-items-center';
+            item.append(meal.title);
+
+            const remove = document.createElement('span');
+            remove.className = 'ms-2 text-danger fs-3';
+            remove.setAttribute('role', 'button');
+            remove.style.cursor = 'pointer';
+            remove.textContent = '×';
+            remove.addEventListener('click', () => removeMeal(meal.id));
+            item.appendChild(remove);
+            list.appendChild(item);
           });
-          content += '</ul>';
+          box.appendChild(list);
         } else {
           // Display placeholder when no meals planned
-          content += '<em>Nothing planned</em>';
+          box.insertAdjacentHTML('beforeend', '<em>Nothing planned</em>');
         }
-  
-        box.innerHTML = content;
+
         col.appendChild(box);
         weekContainer.appendChild(col);
       });
     }
-  
+
     /**
-     * Removes a meal entry from the specified date and re-renders the view.
-     * @param {string} dateStr - The date key in YYYY-MM-DD format.
-     * @param {number} index - Index of the meal to remove in the array.
+     * Removes a planned meal and re-renders the view.
+     * @param {number} entryId - ID of the meal plan entry.
      */
-    window.removeMeal = function (dateStr, index) {
-      const plans = JSON.parse(localStorage.getItem('mealPlans') || '{}');
-      if (plans[dateStr]) {
-        plans[dateStr].splice(index, 1);
-        if (plans[dateStr].length === 0) {
-          delete plans[dateStr];
-        }
-        localStorage.setItem('mealPlans', JSON.stringify(plans));
-        refreshWeekView();
-      }
+    async function removeMeal(entryId) {
+      const resp = await fetch(`/api/meal-plan/${entryId}`, { method: 'DELETE', credentials: 'include' });
+      if (!resp.ok) alert('Could not remove the meal.');
+      refreshWeekView();
+    }
+
+    /**
+     * Clears this week's plan after user confirmation, then refreshes the view.
+     */
+    window.clearWeekPlan = async function () {
+      if (!confirm('Are you sure you want to clear the entire weekly plan?')) return;
+
+      const week = formatDate(getCurrentWeek().monday);
+      const resp = await fetch(`/api/meal-plan?week=${week}`, { method: 'DELETE', credentials: 'include' });
+      if (!resp.ok) alert('Could not clear the plan.');
+      refreshWeekView();
     };
-  
+
     /**
-     * Clears all stored meal plans after user confirmation, then refreshes the view.
+     * Creates one shopping list with the summed ingredients of this week's plan,
+     * then opens the shopping lists page.
      */
-    window.clearWeekPlan = function () {
-      if (confirm('Are you sure you want to clear the entire weekly plan?')) {
-        localStorage.removeItem('mealPlans');
-        refreshWeekView();
+    window.createWeekShoppingList = async function () {
+      const week = formatDate(getCurrentWeek().monday);
+      const resp = await fetch('/api/meal-plan/shopping-list', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        credentials: 'include',
+        body: JSON.stringify({ week })
+      });
+      if (resp.ok) {
+        window.location.href = '/shopping_lists';
+      } else if (resp.status === 404) {
+        alert('Nothing is planned this week.');
+      } else {
+        alert('Could not create the shopping list.');
       }
     };
-  
+
     /**
      * Limits the date picker input to the current week (Monday–Sunday) and defaults value to today.
      */
     function limitDatePickerToCurrentWeek() {
       const dateInput = document.getElementById('mealDate');
-      const today = new Date();
-      const dayOfWeek = today.getDay();
-  
-      const monday = new Date(today);
-      monday.setDate(today.getDate() - ((dayOfWeek + 6) % 7));
-  
-      const sunday = new Date(monday);
-      sunday.setDate(monday.getDate() + 6);
-  
-      const formatDate = d => d.toISOString().split('T')[0];
+      const { monday, sunday } = getCurrentWeek();
       dateInput.min = formatDate(monday);
       dateInput.max = formatDate(sunday);
-      dateInput.value = formatDate(today);
+      dateInput.value = formatDate(new Date());
     }
-  
+
     /**
      * Checks if a given date string falls within the current week range.
      * @param {string} dateStr - Date in YYYY-MM-DD format.
      * @returns {boolean} True if within Monday–Sunday of this week.
      */
     function isDateInCurrentWeek(dateStr) {
-      const inputDate = new Date(dateStr);
-      const today = new Date();
-      const dayOfWeek = today.getDay();
-  
-      const monday = new Date(today);
-      monday.setDate(today.getDate() - ((dayOfWeek + 6) % 7));
-      monday.setHours(0, 0, 0, 0);
-  
-      const sunday = new Date(monday);
-      sunday.setDate(monday.getDate() + 6);
-      sunday.setHours(23, 59, 59, 999);
-  
-      return inputDate >= monday && inputDate <= sunday;
+      const { monday, sunday } = getCurrentWeek();
+      return dateStr >= formatDate(monday) && dateStr <= formatDate(sunday);
     }
-  
-    // Attach click handlers to all "Plan Meal" buttons
-    document.querySelectorAll('.meal-plan-btn').forEach(button => {
-      button.addEventListener('click', event => {
-        event.preventDefault();
-        selectedRecipe = button.getAttribute('data-title');
-  
-        if (!isLoggedIn) {
-          // Store pending recipe and prompt login if user is not authenticated
-          sessionStorage.setItem('pendingMealRecipe', selectedRecipe);
-          new bootstrap.Modal(document.getElementById('loginModal')).show();
-          return;
-        }
-  
-        // Populate modal with selected recipe title and show planning UI
-        document.getElementById('planMealTitle').textContent = selectedRecipe;
-        limitDatePickerToCurrentWeek();
-        new bootstrap.Modal(document.getElementById('planMealModal')).show();
-      });
+
+    /**
+     * Shows the planning modal for the selected recipe.
+     */
+    function showPlanModal() {
+      document.getElementById('planMealTitle').textContent = selectedRecipe.title;
+      limitDatePickerToCurrentWeek();
+      new bootstrap.Modal(document.getElementById('planMealModal')).show();
+    }
+
+    // Handle clicks on "Plan Meal" buttons (delegated, so streamed cards work too)
+    document.addEventListener('click', event => {
+      const button = event.target.closest('.meal-plan-btn');
+      if (!button) return;
+
+      event.preventDefault();
+      selectedRecipe = { id: Number(button.dataset.recipeId), title: button.dataset.title };
+
+      if (!isLoggedIn) {
+        // Store pending recipe and prompt login if user is not authenticated
+        sessionStorage.setItem('pendingMealRecipe', JSON.stringify(selectedRecipe));
+        new bootstrap.Modal(document.getElementById('loginModal')).show();
+        return;
+      }
+
+      // Populate modal with selected recipe title and show planning UI
+      showPlanModal();
     });
-  
+
     /**
-     * Saves the selected recipe to localStorage if the date is valid, then updates the view.
+     * Saves the selected recipe to the server-side plan if the date is valid.
      */
     const saveBtn = document.getElementById('saveMealPlanBtn');
     if (saveBtn) {
-      saveBtn.addEventListener('click', () => {
+      saveBtn.addEventListener('click', async () => {
         const date = document.getElementById('mealDate').value;
         if (!date || !selectedRecipe) return;
-  
+
         if (!isDateInCurrentWeek(date)) {
           alert('You can only plan meals for this week.');
           return;
         }
-  
-        const plans = JSON.parse(localStorage.getItem('mealPlans') || '{}');
-        if (!plans[date]) plans[date] = [];
-        plans[date].push(selectedRecipe);
-        localStorage.setItem('mealPlans', JSON.stringify(plans));
-  
+
+        const resp = await fetch('/api/meal-plan', {
+          method: 'POST',
+          headers: { 'Content-Type': 'application/json' },
+          credentials: 'include',
+          body: JSON.stringify({ date, recipe_id: selectedRecipe.id })
+        });
+        if (!resp.ok) {
+          alert('Could not save the meal.');
+          return;
+        }
+
         // Hide modal and refresh display
         bootstrap.Modal.getInstance(document.getElementById('planMealModal')).hide();
         refreshWeekView();
       });
     }
-  
+
     // If user just logged in after clicking "Plan Meal", resume planning flow
     const pendingRecipe = sessionStorage.getItem('pendingMealRecipe');
     if (isLoggedIn && pendingRecipe) {
       sessionStorage.removeItem('pendingMealRecipe');
-      selectedRecipe = pendingRecipe;
-  
-      document.getElementById('planMealTitle').textContent = selectedRecipe;
-      limitDatePickerToCurrentWeek();
-      new bootstrap.Modal(document.getElementById('planMealModal')).show();
+      try {
+        selectedRecipe = JSON.parse(pendingRecipe);
+      } catch (err) {
+        // Left over from before plans had recipe IDs
+        selectedRecipe = null;
+      }
+      if (selectedRecipe && selectedRecipe.id) showPlanModal();
     }
-  
+
     // Initial render of the week view on page load
     refreshWeekView();
   });
-  
\ No newline at end of file
@@ -4,13 +4,13 @@
 
  //Initializes Bootstrap tooltips on elements with data-bs-toggle="tooltip" 
  //so that tooltips appear immediately on hover and hide after a short delay.
+ //window.initTooltips(root) is also called for recipe cards added by the streaming search.
 
 
-
-document.addEventListener("DOMContentLoaded", function() {
+function initTooltips(root) {
 // Find all elements that have data-bs-toggle="tooltip"
 const tooltipTriggerList = [].slice.call(
-      document.querySelectorAll('[data-bs-toggle="tooltip"]')
+      root.querySelectorAll('[data-bs-toggle="tooltip"]')
     );
     tooltipTriggerList.forEach(function (tooltipTriggerEl) {
       new bootstrap.Tooltip(tooltipTriggerEl, {
@@ -18,5 +18,9 @@ const tooltipTriggerList = [].slice.call(
         boundary: "window"
       });
     });
+  }
+window.initTooltips = initTooltips;
+
+document.addEventListener("DOMContentLoaded", function() {
+    initTooltips(document);
   });
-  
\ No newline at end of file
@@ -0,0 +1,61 @@
+"""Access to /metrics and /api/stats, and request profiling."""
+
+import os
+
+from bottle import request
+
+import program
+
+
+def bind(remote_addr, headers=None):
+    environ = {'REMOTE_ADDR': remote_addr, 'REQUEST_METHOD': 'GET', 'PATH_INFO': '/metrics'}
+    for name, value in (headers or {}).items():
+        environ['HTTP_' + name.upper().replace('-', '_')] = value
+    request.bind(environ)
+
+
+def test_metrics_allowed_from_allowlist(monkeypatch):
+    monkeypatch.setattr(program, 'METRICS_ALLOW', {'127.0.0.1'})
+    bind('127.0.0.1')
+    assert program.metrics_forbidden() is None
+
+
+def test_metrics_forbidden_from_other_addresses(monkeypatch):
+    monkeypatch.setattr(program, 'METRICS_ALLOW', {'127.0.0.1'})
+    monkeypatch.setattr(program, 'METRICS_TOKEN', '')
+    bind('203.0.113.7', {'X-Forwarded-For': '127.0.0.1'})
+    assert program.metrics_forbidden().status_code == 403
+
+
+def test_metrics_token(monkeypatch):
+    monkeypatch.setattr(program, 'METRICS_ALLOW', set())
+    monkeypatch.setattr(program, 'METRICS_TOKEN', 'secret')
+    bind('203.0.113.7', {'Authorization': 'Bearer secret'})
+    assert program.metrics_forbidden() is None
+    bind('203.0.113.7', {'Authorization': 'Bearer wrong'})
+    assert program.metrics_forbidden().status_code == 403
+
+
+def test_profiling_needs_token(monkeypatch):
+    monkeypatch.setattr(program, 'PROFILE_REQUESTS', True)
+    monkeypatch.setattr(program, 'PROFILE_TOKEN', '')
+    bind('127.0.0.1', {'X-Profile': '1'})
+    assert not program.profiling_requested()
+
+    monkeypatch.setattr(program, 'PROFILE_TOKEN', 'secret')
+    assert not program.profiling_requested()
+    bind('127.0.0.1', {'X-Profile': 'secret'})
+    assert program.profiling_requested()
+
+
+def test_prune_profiles_keeps_newest(monkeypatch, tmp_path):
+    monkeypatch.setattr(program, 'PROFILE_DIR', str(tmp_path))
+    monkeypatch.setattr(program, 'PROFILE_KEEP', 2)
+    for n in range(4):
+        path = tmp_path / f"{n}.prof"
+        path.write_bytes(b'')
+        os.utime(path, (n, n))
+    (tmp_path / 'notes.txt').write_text('kept')
+
+    program.prune_profiles()
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['2.prof', '3.prof', 'notes.txt']
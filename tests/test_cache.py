@@ -0,0 +1,29 @@
+"""Counters of the recipe caches under concurrent use."""
+
+import threading
+
+import cache
+
+
+def test_recipe_cache_db_counters_are_exact_across_threads(monkeypatch):
+    stats = {'hits': 0, 'misses': 0, 'errors': 0}
+    monkeypatch.setattr(cache, 'recipe_cache_db_stats', stats)
+
+    def count():
+        for _ in range(10000):
+            cache.count_recipe_cache_db('hits', 2)
+
+    threads = [threading.Thread(target=count) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert stats['hits'] == 8 * 10000 * 2
+
+
+def test_lru_len_after_eviction():
+    lru = cache.LRUCache(2, 60)
+    for key in range(3):
+        lru.set(key, key)
+    assert len(lru) == 2
+    assert lru.stats['evictions'] == 1
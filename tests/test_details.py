@@ -0,0 +1,30 @@
+"""Concurrent detail fetching in iter_detailed_recipes."""
+
+import threading
+
+import cache
+
+
+def test_closing_early_cancels_pending_chunks(monkeypatch):
+    release = threading.Event()
+    calls = []
+
+    def slow_bulk(chunk):
+        calls.append(chunk)
+        if chunk != [1]:
+            release.wait(5)
+        return {recipe_id: {'id': recipe_id, 'title': f"Recipe {recipe_id}"} for recipe_id in chunk}
+
+    # One worker, so every chunk after the second is still queued
+    executor = cache.ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(cache, 'detail_executor', executor)
+    monkeypatch.setattr(cache, 'get_detailed_recipes_bulk', slow_bulk)
+    monkeypatch.setattr(cache, 'get_cached_recipes', lambda ids: ({}, list(ids)))
+    monkeypatch.setattr(cache, 'store_cached_recipes', lambda infos: infos)
+
+    results = cache.iter_detailed_recipes([1, 2, 3, 4], deadline=5, chunk_size=1)
+    assert next(results)[0] == 1
+    results.close()
+    release.set()
+    executor.shutdown(wait=True)
+    assert len(calls) <= 2
@@ -0,0 +1,157 @@
+"""Diet filtering of search results and the local recipe index."""
+
+import search
+from cache import RecipeIndex, RecipeRecord
+
+
+def make_record(recipe_id, title, ingredients, **flags):
+    info = {
+        'id': recipe_id,
+        'title': title,
+        'readyInMinutes': 20,
+        'extendedIngredients': [{'name': name, 'originalName': name} for name in ingredients]
+    }
+    info.update(flags)
+    return RecipeRecord.from_info(info)
+
+
+def test_api_diet_labels_are_kept():
+    record = make_record(1, 'Salad', ['lettuce'], diets=['gluten free', 'lacto ovo vegetarian',
+                                                        'pescatarian'],
+                         vegetarian=True, vegan=False, glutenFree=True, dairyFree=False)
+    assert record.diets == {'gluten free', 'lacto ovo vegetarian', 'vegetarian',
+                            'pescatarian', 'pescetarian'}
+    assert make_record(2, 'Salad', ['lettuce']).diets is None
+
+
+def test_api_labels_decide_over_keyword_rules():
+    # "chicken of the woods" is a mushroom; the API knows the dish is vegan
+    record = make_record(1, 'Chicken of the woods stir fry', ['chicken of the woods'],
+                         diets=['vegan'], vegan=True, vegetarian=True)
+    assert search.is_recipe_valid(record, 'vegan')
+    assert not search.is_recipe_valid(record, 'ketogenic')
+
+
+def test_keyword_rules_used_without_labels():
+    assert not search.is_recipe_valid(make_record(1, 'Stew', ['beef', 'carrot']), 'vegetarian')
+    assert search.is_recipe_valid(make_record(2, 'Stew', ['lentils', 'carrot']), 'vegetarian')
+
+
+def test_unknown_diet_without_labels():
+    record = make_record(1, 'Pancakes', ['flour', 'sugar', 'milk'])
+    assert search.diet_match(record, 'ketogenic') is None
+    # complexSearch already applied the diet to API results
+    assert search.is_recipe_valid(record, 'ketogenic')
+    # ...but nothing did for the local corpus
+    assert not search.is_recipe_valid(record, 'ketogenic', require_match=True)
+
+
+def test_local_search_leaves_out_unchecked_diets(monkeypatch):
+    records = {
+        1: make_record(1, 'Pancakes', ['egg', 'flour', 'sugar']),
+        2: make_record(2, 'Omelette', ['egg', 'cheese'], diets=['ketogenic', 'gluten free']),
+        3: make_record(3, 'Egg fried rice', ['egg', 'rice'], diets=['dairy free']),
+    }
+    index = RecipeIndex(10)
+    for record in records.values():
+        index.add(record.id, record.ingredient_names)
+    monkeypatch.setattr(search, 'recipe_index', index)
+    monkeypatch.setattr(search, 'get_cached_recipes',
+                        lambda ids: ({i: records[i] for i in ids}, []))
+
+    filters = search.parse_search_filters({'ingredients': 'egg', 'diet': 'Ketogenic'})
+    assert [r.id for r in search.search_local_recipes(filters)] == [2]
+
+    filters = search.parse_search_filters({'ingredients': 'egg'})
+    assert sorted(r.id for r in search.search_local_recipes(filters)) == [1, 2, 3]
+
+
+def test_recipe_index_evicts_oldest():
+    index = RecipeIndex(2)
+    index.add(1, ['tomato', 'basil'])
+    index.add(2, ['tomato', 'onion'])
+    index.add(3, ['tomato', 'garlic'])
+    assert len(index) == 2
+    assert sorted(index.search(('tomato',), 10)) == [2, 3]
+    assert index.search(('basil',), 10) == []
+
+
+def test_recipe_index_readd_keeps_recipe():
+    index = RecipeIndex(2)
+    index.add(1, ['tomato'])
+    index.add(2, ['onion'])
+    index.add(1, ['tomato'])
+    index.add(3, ['garlic'])
+    assert index.search(('tomato',), 10) == [1]
+    assert index.search(('onion',), 10) == []
+
+
+def fits(diet, *ingredients, title='Dinner'):
+    return search.is_recipe_valid(make_record(1, title, ingredients), diet)
+
+
+def test_gluten_free_lookalikes_pass():
+    assert fits('gluten free', 'rice noodles', 'soy sauce')
+    assert fits('gluten free', 'almond flour', 'sugar')
+    assert fits('gluten free', 'corn tortillas', 'black beans')
+    assert fits('gluten free', 'gluten-free pasta', 'tomato')
+    assert fits('gluten free', 'buckwheat groats')
+
+
+def test_gluten_free_rejects_gluten():
+    assert not fits('gluten free', 'flour', 'sugar')
+    assert not fits('gluten free', 'spaghetti')
+    assert not fits('gluten free', 'flour tortillas')
+    assert not fits('gluten free', 'rice', title='Rice with breadcrumbs')
+
+
+def test_vegetarian_lookalikes_pass():
+    assert fits('vegetarian', 'oyster mushrooms', 'garlic')
+    assert fits('vegetarian', 'graham crackers')
+    assert not fits('vegetarian', 'oyster sauce')
+    assert not fits('vegetarian', 'chicken breasts')
+
+
+def test_dairy_free_lookalikes_pass():
+    assert fits('dairy free', 'coconut milk', 'curry paste')
+    assert fits('dairy free', 'coconut cream')
+    assert fits('dairy free', 'peanut butter', 'butternut squash')
+    assert not fits('dairy free', 'coconut milk', 'butter')
+    assert not fits('dairy free', 'buttermilk')
+
+
+def test_vegan_keywords_match_whole_words():
+    assert fits('vegan', 'eggplant', 'honeydew melon')
+    assert not fits('vegan', 'eggs')
+    assert not fits('vegan', 'honey')
+
+
+def test_lookalike_only_clears_its_own_line():
+    assert fits('dairy free', 'almond butters', 'sugar')
+    assert not fits('dairy free', 'almond butter', 'butter')
+    assert fits('vegetarian', 'tofu', title='Vegan chicken-style nuggets')
+
+
+def test_classify_recipes_matches_is_recipe_valid():
+    records = [
+        make_record(1, 'Stew', ['beef', 'carrot']),
+        make_record(2, 'Curry', ['coconut milk', 'lentils']),
+        make_record(3, 'Pancakes', ['flour', 'milk']),
+        make_record(4, 'Salad', ['feta'], diets=['vegetarian'], vegetarian=True),
+    ]
+    for diet in ('', 'vegetarian', 'vegan', 'dairy free', 'ketogenic'):
+        for require_match in (False, True):
+            assert search.classify_recipes(records, diet, require_match) == [
+                search.is_recipe_valid(r, diet, require_match) for r in records
+            ]
+
+
+def test_filter_recipes_keeps_order_and_drops_missing():
+    pairs = [
+        ('a', make_record(1, 'Stew', ['beef'])),
+        ('b', None),
+        ('c', make_record(3, 'Dal', ['lentils'])),
+        ('d', make_record(4, 'Soup', ['carrot'])),
+    ]
+    filters = search.parse_search_filters({'ingredients': 'x', 'diet': 'vegetarian'})
+    assert [summary for summary, _ in search.filter_recipes(pairs, filters)] == ['c', 'd']
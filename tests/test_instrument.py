@@ -0,0 +1,58 @@
+"""Request timing in the instrument() plugin."""
+
+import time
+from types import SimpleNamespace
+
+from bottle import request
+
+import program
+
+
+def bind(rule):
+    request.bind({'REQUEST_METHOD': 'GET', 'PATH_INFO': rule,
+                  'bottle.route': SimpleNamespace(rule=rule)})
+
+
+def slow_stream():
+    def events():
+        yield 'first'
+        with program.span('details'):
+            time.sleep(0.05)
+        yield 'second'
+    return events()
+
+
+def test_stream_is_timed_until_exhausted(monkeypatch):
+    recorded = []
+    monkeypatch.setattr(program, 'record_request', lambda *args: recorded.append(args))
+    bind('/search/stream')
+
+    body = program.instrument(slow_stream)()
+    assert recorded == []
+    assert list(body) == ['first', 'second']
+    assert len(recorded) == 1
+    rule, method, status, elapsed = recorded[0]
+    assert (rule, method, status) == ('/search/stream', 'GET', 200)
+    assert elapsed >= 0.05
+    assert body.spans['details'] >= 0.05
+
+
+def test_stream_closed_early_is_recorded_once(monkeypatch):
+    recorded = []
+    monkeypatch.setattr(program, 'record_request', lambda *args: recorded.append(args))
+    bind('/search/stream')
+
+    body = program.instrument(slow_stream)()
+    assert next(body) == 'first'
+    body.close()
+    body.close()
+    assert len(recorded) == 1
+
+
+def test_plain_route_is_timed_on_return(monkeypatch):
+    recorded = []
+    monkeypatch.setattr(program, 'record_request', lambda *args: recorded.append(args))
+    bind('/')
+
+    assert program.instrument(lambda: 'page')() == 'page'
+    assert [args[:3] for args in recorded] == [('/', 'GET', 200)]
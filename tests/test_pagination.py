@@ -0,0 +1,68 @@
+"""Keyset pagination of /favorites and /shopping_lists."""
+
+from datetime import datetime, timedelta, timezone
+
+import program
+
+
+class RecordingCursor:
+    """Stands in for a RealDictCursor: records the query and returns rows."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.params = None
+
+    def execute(self, query, params=None):
+        self.query = query
+        self.params = params
+
+    def fetchall(self):
+        return self.rows[:self.params['limit']]
+
+
+def make_rows(count, key='id'):
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    return [{key: n, 'created_at': start - timedelta(minutes=n)} for n in range(1, count + 1)]
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2026, 3, 4, 5, 6, 7, 890123, tzinfo=timezone.utc)
+    cursor = program.encode_page_cursor(created_at, 42)
+    assert program.decode_page_cursor(cursor) == (created_at, 42)
+
+
+def test_invalid_cursor_means_first_page():
+    assert program.decode_page_cursor('') is None
+    assert program.decode_page_cursor('12') is None
+    assert program.decode_page_cursor('not base64!') is None
+    assert program.decode_page_cursor(
+        program.encode_page_cursor(datetime(2026, 1, 1), 1)[:-4]) is None
+
+
+def test_first_page_has_no_keyset():
+    cur = RecordingCursor(make_rows(3))
+    lists, next_cursor = program.load_shopping_lists(cur, 'u1', limit=5)
+    assert cur.params['before_at'] is None and cur.params['before_id'] is None
+    assert cur.params['limit'] == 6
+    assert len(lists) == 3
+    assert next_cursor is None
+
+
+def test_next_cursor_carries_last_row_values():
+    rows = make_rows(5)
+    cur = RecordingCursor(rows)
+    lists, next_cursor = program.load_shopping_lists(cur, 'u1', limit=2)
+    assert [row['id'] for row in lists] == [1, 2]
+    assert program.decode_page_cursor(next_cursor) == (rows[1]['created_at'], 2)
+
+
+def test_cursor_is_passed_as_values_not_a_row_lookup():
+    rows = make_rows(5, key='recipe_id')
+    before = (rows[1]['created_at'], 2)
+    cur = RecordingCursor(rows[2:])
+    favorites, next_cursor = program.load_favorites(cur, 'u1', before, limit=2)
+    assert cur.params['before_at'] == rows[1]['created_at']
+    assert cur.params['before_id'] == 2
+    assert 'SELECT created_at, recipe_id FROM favorites' not in cur.query
+    assert [row['recipe_id'] for row in favorites] == [3, 4]
+    assert program.decode_page_cursor(next_cursor) == (rows[3]['created_at'], 4)
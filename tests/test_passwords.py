@@ -0,0 +1,44 @@
+"""Background password rehashing after a BCRYPT_ROUNDS change."""
+
+import threading
+
+import program
+
+
+class RecordingThread:
+    """Stands in for threading.Thread: records the args instead of running."""
+
+    started = []
+
+    def __init__(self, target, args, **kwargs):
+        self.args = args
+
+    def start(self):
+        self.started.append(self.args)
+
+
+def test_rehash_skipped_while_one_is_running(monkeypatch):
+    started = RecordingThread.started = []
+    monkeypatch.setattr(threading, 'Thread', RecordingThread)
+    monkeypatch.setattr(program, 'rehash_slot', threading.BoundedSemaphore(1))
+    before = program.password_metrics()['rehash_skipped']
+
+    program.start_rehash(1, 'first')
+    program.start_rehash(2, 'second')
+    assert started == [(1, 'first')]
+    assert program.password_metrics()['rehash_skipped'] == before + 1
+
+
+def test_rehash_does_not_wait_for_a_busy_queue(monkeypatch):
+    monkeypatch.setattr(program, 'PASSWORD_HASH_WORKERS', 1)
+    monkeypatch.setattr(program, 'password_slots', threading.BoundedSemaphore(1))
+    monkeypatch.setattr(program, 'rehash_slot', threading.BoundedSemaphore(1))
+    monkeypatch.setattr(program, 'get_db_connection', None)
+    program.password_slots.acquire()
+    program.rehash_slot.acquire()
+    before = program.password_metrics()['rehash_skipped']
+
+    program.rehash_password(1, 'secret')
+    assert program.password_metrics()['rehash_skipped'] == before + 1
+    # The rehash gave its slot back
+    assert program.rehash_slot.acquire(blocking=False)
@@ -0,0 +1,97 @@
+"""QuotaGovernor token bucket and quota tracking."""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import upstream
+from upstream import QuotaGovernor, estimate_points
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+def test_estimate_points_for_bulk_and_search():
+    ids = ','.join(str(n) for n in range(1, 51))
+    assert estimate_points('/recipes/informationBulk', {'ids': ids}) == pytest.approx(25.5)
+    assert estimate_points('/recipes/informationBulk', {'ids': '7'}) == 1
+    search = {'number': 20, 'addRecipeInformation': True, 'fillIngredients': True}
+    assert estimate_points('/recipes/complexSearch', search) == pytest.approx(2.2)
+    assert estimate_points('/recipes/7/information', {}) == 1
+
+
+def test_tokens_are_charged_by_points():
+    governor = QuotaGovernor(rate=0.001, burst=10, max_wait=0, reserve=0)
+    assert governor.acquire(4)
+    assert governor.tokens == pytest.approx(6, abs=0.01)
+    assert governor.acquire(6)
+    assert not governor.acquire(1)
+
+
+def test_call_larger_than_burst_leaves_bucket_in_debt():
+    governor = QuotaGovernor(rate=0.001, burst=10, max_wait=0, reserve=0)
+    assert governor.acquire(25.5)
+    assert governor.tokens == pytest.approx(-15.5, abs=0.01)
+    assert not governor.acquire(1)
+
+
+def test_refill_rate_spreads_remaining_quota_until_reset():
+    governor = QuotaGovernor(rate=5, burst=10, max_wait=0, reserve=100)
+    now = datetime(2026, 1, 1, 23, 0, tzinfo=timezone.utc)
+    assert governor.refill_rate(now) == 5
+    governor.quota_left = 100 + 1800
+    assert governor.refill_rate(now) == pytest.approx(0.5)
+    governor.quota_left = 100 + 36000
+    assert governor.refill_rate(now) == 5
+
+
+def test_refill_rate_never_reaches_zero():
+    governor = QuotaGovernor(rate=5, burst=10, max_wait=0, reserve=100)
+    governor.quota_left = 50
+    assert governor.refill_rate() > 0
+
+
+def test_quota_headers_and_402_exhaust_until_reset():
+    governor = QuotaGovernor(rate=5, burst=10, max_wait=0, reserve=10)
+    governor.update(FakeResponse(headers={'X-API-Quota-Left': '500', 'X-API-Quota-Used': '3'}))
+    assert governor.quota_left == 500 and not governor.exhausted
+
+    governor.update(FakeResponse(status_code=402))
+    assert governor.exhausted
+    assert not governor.acquire(1)
+
+    governor.exhausted_until = datetime.now(timezone.utc) - timedelta(seconds=1)
+    assert not governor.exhausted
+    assert governor.quota_left is None
+
+
+def test_low_quota_left_exhausts():
+    governor = QuotaGovernor(rate=5, burst=10, max_wait=0, reserve=10)
+    governor.update(FakeResponse(headers={'X-API-Quota-Left': '9.5'}))
+    assert governor.exhausted
+
+
+def test_count_upstream_increments_stats():
+    before = upstream.upstream_stats['coalesced']
+    upstream.count_upstream('coalesced')
+    assert upstream.upstream_stats['coalesced'] == before + 1
+
+
+def test_warmer_budget_is_spent_in_points(monkeypatch):
+    import background
+
+    calls = []
+    monkeypatch.setattr(background, 'stale_recipe_ids', lambda ids, fresh_for: ids)
+    monkeypatch.setattr(background, 'upstream_degraded', lambda: False)
+    monkeypatch.setattr(background, 'store_cached_recipes', lambda infos: infos)
+    monkeypatch.setattr(background, 'get_detailed_recipes_bulk',
+                        lambda chunk: calls.append(chunk) or {i: {'id': i} for i in chunk})
+
+    # 120 IDs -> chunks of 50, 50 and 20 IDs, costing 25.5, 25.5 and 10.5 points
+    spent, refreshed = background.warm_recipe_details(list(range(120)), budget=60)
+    assert [len(chunk) for chunk in calls] == [50, 50]
+    assert spent == pytest.approx(51)
+    assert len(refreshed) == 100
@@ -0,0 +1,63 @@
+"""Cursor paging of /api/search when the upstream search fails."""
+
+import pytest
+
+import search
+from cache import RecipeRecord
+
+
+def record(recipe_id):
+    return RecipeRecord.from_info({'id': recipe_id, 'title': f"Recipe {recipe_id}",
+                                   'readyInMinutes': 20, 'extendedIngredients': []})
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """Upstream pages by offset; None marks a failed call."""
+    pages = {}
+    monkeypatch.setattr(search, 'UPSTREAM_PAGE_SIZE', 2)
+    monkeypatch.setattr(search, 'search_recipes', lambda filters, offset: pages.get(offset, []))
+    monkeypatch.setattr(search, 'fetch_detailed_recipes',
+                        lambda ids: [(recipe_id, record(recipe_id)) for recipe_id in ids])
+    return pages
+
+
+FILTERS = search.parse_search_filters({'ingredients': 'tomato'})
+
+
+def summaries(*ids):
+    return [{'id': recipe_id, 'title': '', 'image': ''} for recipe_id in ids]
+
+
+def test_failure_before_any_result_raises(upstream):
+    upstream[0] = None
+    with pytest.raises(search.SearchUnavailable):
+        search.search_page(FILTERS, 0, 3)
+
+
+def test_failure_keeps_cursor_at_failed_page(upstream):
+    upstream[0] = summaries(1, 2)
+    upstream[2] = None
+    recipes, next_offset = search.search_page(FILTERS, 0, 3)
+    assert [r['id'] for r in recipes] == [1, 2]
+    assert next_offset == 2
+
+
+def test_empty_page_ends_results(upstream):
+    upstream[0] = summaries(1, 2)
+    upstream[2] = []
+    recipes, next_offset = search.search_page(FILTERS, 0, 3)
+    assert [r['id'] for r in recipes] == [1, 2]
+    assert next_offset is None
+
+
+def test_failed_search_is_not_cached(monkeypatch):
+    monkeypatch.setattr(search, 'search_cache', search.LRUCache(10, 60))
+    monkeypatch.setattr(search, 'fetch_recipes_from_api', lambda *args: None)
+    key = search.search_cache_key(FILTERS)
+    assert search.fetch_search_results(key) is None
+    assert search.search_cache.get(key) is None
+
+    monkeypatch.setattr(search, 'fetch_recipes_from_api', lambda *args: [])
+    assert search.fetch_search_results(key) == []
+    assert search.search_cache.get(key)[0] == []
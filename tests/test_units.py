@@ -0,0 +1,86 @@
+"""Unit conversion for the weekly shopping list."""
+
+import psycopg2
+import pytest
+from psycopg2.extras import Json
+
+import program
+from cache import ingredient_amount
+from db import connect_db
+
+
+@pytest.mark.parametrize('plural, singular', [
+    ('tbsps', 'tbsp'), ('tsps', 'tsp'), ('servings', 'serving'), ('grams', 'g'),
+    ('kgs', 'kg'), ('litres', 'l'), ('ounces', 'oz'), ('cloves', 'clove'), ('cans', 'can')
+])
+def test_plural_units_convert_like_singular(plural, singular):
+    assert program.UNIT_CONVERSIONS[plural] == program.UNIT_CONVERSIONS[singular]
+
+
+def test_api_units_are_known_after_lowercasing():
+    for unit in ('Tbsp', 'Tbsps', 'tsp', 'g', 'ml', 'cups', 'servings', 'large'):
+        _, _, normalized = ingredient_amount({'name': 'x', 'amount': 1, 'unit': unit})
+        assert normalized in program.UNIT_CONVERSIONS
+
+
+@pytest.fixture
+def cur():
+    """A cursor on the configured database, rolled back afterwards."""
+    try:
+        conn = connect_db()
+    except psycopg2.Error:
+        pytest.skip('no database configured')
+    try:
+        with conn.cursor() as cursor:
+            try:
+                cursor.execute("SELECT 1 FROM meal_plan_entries LIMIT 0")
+            except psycopg2.Error:
+                pytest.skip('database has no meal plan schema')
+            yield cursor
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+def plan(cur, recipes):
+    """Plan each (ingredients, ingredient_amounts) recipe for one day of a new user's week."""
+    cur.execute("""
+        INSERT INTO users (username, email, password_hash)
+        VALUES ('units-test', 'units-test@example.invalid', 'x') RETURNING id
+    """)
+    user_id = cur.fetchone()['id']
+    week_start = program.parse_week_start('2026-03-02')
+    for n, (ingredients, amounts) in enumerate(recipes):
+        recipe_id = 990000 + n
+        cur.execute("""
+            INSERT INTO recipes (recipe_id, title, ingredients, ingredient_amounts)
+            VALUES (%s, 'Test', %s, %s)
+            ON CONFLICT (recipe_id) DO UPDATE
+            SET ingredients = EXCLUDED.ingredients, ingredient_amounts = EXCLUDED.ingredient_amounts
+        """, (recipe_id, Json(ingredients), None if amounts is None else Json(amounts)))
+        cur.execute("INSERT INTO meal_plan_entries (user_id, plan_date, recipe_id) VALUES (%s, %s, %s)",
+                    (user_id, week_start, recipe_id))
+    return user_id, week_start
+
+
+def test_week_list_sums_converted_amounts(cur):
+    user_id, week_start = plan(cur, [
+        ([], [{'name': 'olive oil', 'amount': 2, 'unit': 'tbsps'},
+              {'name': 'flour', 'amount': 800, 'unit': 'g'},
+              {'name': 'salt', 'amount': 0, 'unit': 'g'},
+              {'name': 'garlic', 'amount': 2, 'unit': 'cloves'}]),
+        ([], [{'name': 'olive oil', 'amount': 1, 'unit': 'tbsp'},
+              {'name': 'flour', 'amount': 0.5, 'unit': 'kg'},
+              {'name': 'garlic', 'amount': 1, 'unit': 'clove'}]),
+    ])
+    _, items = program.create_week_shopping_list(cur, user_id, week_start, 'Week')
+    assert sorted(items) == ['1.3 kg flour', '3 clove garlic', '45 ml olive oil', 'salt']
+
+
+def test_week_list_falls_back_to_ingredient_lines(cur):
+    user_id, week_start = plan(cur, [
+        (['2 Eggs', '1 cup milk'], []),
+        (['1 Onion'], None),
+    ])
+    _, items = program.create_week_shopping_list(cur, user_id, week_start, 'Week')
+    assert sorted(items) == ['1 cup milk', '1 onion', '2 eggs']
@@ -0,0 +1,434 @@
+"""
+Spoonacular API client.
+
+All upstream calls go through one keep-alive session with retries, a
+circuit breaker, a quota governor and coalescing of identical in-flight
+requests.
+"""
+
+import random
+import re
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime, timedelta, timezone
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import (
+    API_KEY, BREAKER_RESET_SECONDS, BREAKER_THRESHOLD, DETAIL_FETCH_WORKERS, QUOTA_RESERVE,
+    SPOONACULAR_BASE_URL, UPSTREAM_BACKOFF, UPSTREAM_BURST, UPSTREAM_CONNECT_TIMEOUT,
+    UPSTREAM_MAX_WAIT, UPSTREAM_PAGE_SIZE, UPSTREAM_RATE, UPSTREAM_READ_TIMEOUT, UPSTREAM_RETRIES
+)
+from metrics import count_metric, observe_metric, span
+
+# Sentinel cached for recipe IDs the API answered with non-200
+NOT_FOUND = {}
+
+
+class CircuitBreaker:
+    """
+    Stop calling an upstream that keeps failing.
+
+    After `threshold` consecutive failures the breaker opens and calls are
+    refused for `reset_seconds`. Then one trial call is let through
+    (half-open): success closes the breaker, failure opens it again.
+    """
+
+    def __init__(self, threshold, reset_seconds):
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Return True if a call may be made right now."""
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_seconds or self._trial_running:
+                return False
+            self._trial_running = True
+            return True
+
+    def release(self):
+        """Give back a half-open trial slot without recording an outcome."""
+        with self._lock:
+            self._trial_running = False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+    @property
+    def is_open(self):
+        return self.opened_at is not None
+
+
+def estimate_points(path, params):
+    """
+    Estimate the quota points one Spoonacular call will cost.
+
+    Follows the published pricing: a call costs 1 point, informationBulk
+    0.5 more per extra recipe, and complexSearch 0.01 per result plus
+    0.025 per result for each of addRecipeInformation and fillIngredients.
+
+    Args:
+        path (str): Endpoint path.
+        params (dict): Query parameters of the call.
+
+    Returns:
+        float: Estimated points.
+    """
+    if path == '/recipes/informationBulk':
+        ids = [i for i in str(params.get('ids', '')).split(',') if i]
+        return 1 + 0.5 * max(len(ids) - 1, 0)
+    if path == '/recipes/complexSearch':
+        per_result = 0.01
+        per_result += 0.025 if params.get('addRecipeInformation') else 0
+        per_result += 0.025 if params.get('fillIngredients') else 0
+        return 1 + per_result * int(params.get('number', 10))
+    return 1.0
+
+
+def next_quota_reset(now):
+    """Return when the daily quota resets: the next midnight UTC after `now`."""
+    tomorrow = now.date() + timedelta(days=1)
+    return datetime(tomorrow.year, tomorrow.month, tomorrow.day, tzinfo=timezone.utc)
+
+
+class QuotaGovernor:
+    """
+    Keep upstream usage within the provider's rate limit and daily quota.
+
+    A token bucket holds quota points: each call takes its estimated cost
+    (see estimate_points), up to `burst` points are available at once, and
+    the bucket refills at `rate` points per second, or slower when the
+    remaining daily quota would not otherwise last until the reset. The
+    remaining quota is taken from the X-API-Quota-Left header of each
+    response; once it drops to `reserve` points, or the API answers 402,
+    requests are refused until the quota resets at midnight UTC.
+    """
+
+    def __init__(self, rate, burst, max_wait, reserve):
+        self.rate = rate
+        self.burst = burst
+        self.max_wait = max_wait
+        self.reserve = reserve
+        self.tokens = float(burst)
+        self.updated_at = time.monotonic()
+        self.quota_left = None
+        self.quota_used = None
+        self.exhausted_until = None
+        self._lock = threading.Lock()
+
+    @property
+    def exhausted(self):
+        """True while the daily quota is used up."""
+        with self._lock:
+            if self.exhausted_until is None:
+                return False
+            if datetime.now(timezone.utc) >= self.exhausted_until:
+                self.exhausted_until = None
+                self.quota_left = None
+                return False
+            return True
+
+    def refill_rate(self, now=None):
+        """
+        Points per second the bucket refills at.
+
+        `rate` until the remaining quota is known; then no faster than
+        spreads the points above `reserve` evenly over the time left until
+        the reset. Call with the lock held.
+        """
+        if self.quota_left is None:
+            return self.rate
+        now = now or datetime.now(timezone.utc)
+        seconds_left = max((next_quota_reset(now) - now).total_seconds(), 1.0)
+        spread = (self.quota_left - self.reserve) / seconds_left
+        # Never zero, so the wait below stays finite (and simply too long)
+        return max(min(self.rate, spread), 1e-6)
+
+    def acquire(self, points=1.0):
+        """
+        Take `points` tokens, waiting up to `max_wait` seconds for them.
+
+        A call costing more than `burst` waits for a full bucket and leaves
+        it in debt, so the calls after it wait for the difference.
+
+        Returns:
+            bool: False if the quota is exhausted or no tokens came in time.
+        """
+        if self.exhausted:
+            return False
+        with self._lock:
+            now = time.monotonic()
+            rate = self.refill_rate()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * rate)
+            self.updated_at = now
+            needed = min(points, self.burst)
+            wait_seconds = (needed - self.tokens) / rate if self.tokens < needed else 0.0
+            if wait_seconds > self.max_wait:
+                return False
+            # Reserve the tokens now so concurrent callers queue up behind them
+            self.tokens -= points
+        if wait_seconds:
+            time.sleep(wait_seconds)
+        return True
+
+    def update(self, resp):
+        """Track the daily quota from a response's headers and status."""
+        left = resp.headers.get('X-API-Quota-Left')
+        used = resp.headers.get('X-API-Quota-Used')
+        with self._lock:
+            try:
+                if left is not None:
+                    self.quota_left = float(left)
+                if used is not None:
+                    self.quota_used = float(used)
+            except ValueError:
+                pass
+            if resp.status_code == 402 or (
+                    self.quota_left is not None and self.quota_left <= self.reserve):
+                self.exhausted_until = next_quota_reset(datetime.now(timezone.utc))
+
+    def metrics(self):
+        exhausted = self.exhausted
+        with self._lock:
+            return {
+                'tokens': round(self.tokens, 2),
+                'refill_rate': round(self.refill_rate(), 4),
+                'quota_left': self.quota_left,
+                'quota_used': self.quota_used,
+                'exhausted': exhausted
+            }
+
+
+def create_upstream_session():
+    """Create a keep-alive session with a connection pool sized for the detail pool."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=DETAIL_FETCH_WORKERS * 2)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+upstream_session = create_upstream_session()
+upstream_breaker = CircuitBreaker(BREAKER_THRESHOLD, BREAKER_RESET_SECONDS)
+quota_governor = QuotaGovernor(UPSTREAM_RATE, UPSTREAM_BURST, UPSTREAM_MAX_WAIT, QUOTA_RESERVE)
+upstream_stats = {
+    'requests': 0, 'retries': 0, 'failures': 0, 'short_circuited': 0,
+    'throttled': 0, 'coalesced': 0
+}
+upstream_stats_lock = threading.Lock()
+
+# In-flight upstream calls by (path, params), shared by concurrent callers
+upstream_inflight = {}
+upstream_inflight_lock = threading.Lock()
+
+
+def count_upstream(event):
+    """Increment one of the upstream_stats counters."""
+    with upstream_stats_lock:
+        upstream_stats[event] += 1
+
+
+def upstream_degraded():
+    """True while upstream calls are refused (breaker open or quota used up)."""
+    return upstream_breaker.is_open or quota_governor.exhausted
+
+
+def retry_delay(attempt, resp=None):
+    """Seconds to sleep before retry number `attempt` (full jitter, honours Retry-After)."""
+    if resp is not None and resp.headers.get('Retry-After', '').isdigit():
+        return min(float(resp.headers['Retry-After']), UPSTREAM_READ_TIMEOUT)
+    return random.uniform(0, UPSTREAM_BACKOFF * (2 ** attempt))
+
+
+def spoonacular_get(path, params):
+    """
+    GET a Spoonacular endpoint, sharing identical in-flight calls.
+
+    Concurrent callers asking for the same path and params wait for one
+    upstream request and all get its response.
+
+    Args:
+        path (str): Endpoint path, e.g. '/recipes/complexSearch'.
+        params (dict): Query parameters, without apiKey.
+
+    Returns:
+        requests.Response or None: None if the upstream is unavailable or
+        the request was refused by the circuit breaker or quota governor.
+    """
+    key = (path, tuple(sorted((k, str(v)) for k, v in params.items())))
+    with upstream_inflight_lock:
+        future = upstream_inflight.get(key)
+        leader = future is None
+        if leader:
+            future = upstream_inflight[key] = Future()
+    if not leader:
+        count_upstream('coalesced')
+        return future.result()
+
+    try:
+        resp = request_upstream(path, params)
+        future.set_result(resp)
+        return resp
+    except BaseException as exc:
+        future.set_exception(exc)
+        raise
+    finally:
+        with upstream_inflight_lock:
+            upstream_inflight.pop(key, None)
+
+
+def request_upstream(path, params):
+    """
+    GET a Spoonacular endpoint through the shared session.
+
+    Timeouts, 429 and 5xx responses are retried up to UPSTREAM_RETRIES times
+    with jittered exponential backoff. Other responses (including 4xx) are
+    returned as-is. No request is made while the circuit breaker is open or
+    the quota governor refuses one.
+
+    Returns:
+        requests.Response or None: None if the upstream is unavailable.
+    """
+    if not upstream_breaker.allow():
+        count_upstream('short_circuited')
+        return None
+
+    url = f"{SPOONACULAR_BASE_URL}{path}"
+    params = dict(params, apiKey=API_KEY)
+    # /recipes/123/information -> /recipes/{id}/information, to bound label values
+    metric_path = re.sub(r'/\d+', '/{id}', path)
+    resp = None
+    for attempt in range(UPSTREAM_RETRIES + 1):
+        if attempt:
+            count_upstream('retries')
+            time.sleep(retry_delay(attempt - 1, resp))
+        if not quota_governor.acquire(estimate_points(path, params)):
+            count_upstream('throttled')
+            # Refused by our own governor, not an upstream fault – leave the breaker alone
+            upstream_breaker.release()
+            return None
+        count_upstream('requests')
+        started = time.perf_counter()
+        try:
+            with span('upstream'):
+                resp = upstream_session.get(
+                    url, params=params,
+                    timeout=(UPSTREAM_CONNECT_TIMEOUT, UPSTREAM_READ_TIMEOUT)
+                )
+        except requests.RequestException as exc:
+            print(f"Upstream request failed: {exc}")
+            count_metric('upstream_responses_total', endpoint=metric_path, status='error')
+            resp = None
+            continue
+        observe_metric('upstream_request_duration_seconds', time.perf_counter() - started,
+                       endpoint=metric_path)
+        count_metric('upstream_responses_total', endpoint=metric_path, status=str(resp.status_code))
+        quota_governor.update(resp)
+        if resp.status_code == 402:
+            # Daily quota used up – the governor now refuses further calls
+            upstream_breaker.record_success()
+            return None
+        if resp.status_code != 429 and resp.status_code < 500:
+            upstream_breaker.record_success()
+            return resp
+
+    count_upstream('failures')
+    upstream_breaker.record_failure()
+    return None
+
+
+def search_points(number=None):
+    """Estimated quota points of one fetch_recipes_from_api() call."""
+    return estimate_points('/recipes/complexSearch', {
+        'number': number or UPSTREAM_PAGE_SIZE,
+        'addRecipeInformation': True,
+        'fillIngredients': True
+    })
+
+
+def fetch_recipes_from_api(ingredients, diet, max_calories=None, max_ready_time=None,
+                           offset=0, number=None):
+    """
+    Send request to Spoonacular API with ingredients, diet and optional filters.
+
+    `offset` and `number` select the page of results (number defaults to
+    UPSTREAM_PAGE_SIZE).
+
+    Returns:
+        list or None: The results, or None if the call was throttled, the
+        breaker is open or the API answered non-200.
+    """
+    params = {
+        'number': number or UPSTREAM_PAGE_SIZE,
+        'offset': offset,
+        'addRecipeInformation': True,
+        'fillIngredients': True
+    }
+    if ingredients:
+        params['query'] = ingredients
+    if diet:
+        params['diet'] = diet
+    if max_calories:
+        params['maxCalories'] = max_calories
+    if max_ready_time:
+        params['maxReadyTime'] = max_ready_time
+
+    resp = spoonacular_get('/recipes/complexSearch', params)
+    if resp is None or resp.status_code != 200:
+        return None
+    return resp.json().get('results', [])
+
+
+def fetch_recipe_from_api(recipe_id):
+    """
+    Fetch detailed recipe info including nutrition and steps.
+
+    Returns the info dict, NOT_FOUND if the API answered non-200, or None
+    if the upstream could not be reached.
+    """
+    resp = spoonacular_get(f"/recipes/{recipe_id}/information", {'includeNutrition': True})
+    if resp is None:
+        return None
+    return resp.json() if resp.status_code == 200 else NOT_FOUND
+
+
+def get_detailed_recipes_bulk(recipe_ids):
+    """
+    Fetch detailed info for several recipes in one informationBulk call.
+
+    Args:
+        recipe_ids (list): Recipe IDs to resolve (one chunk).
+
+    Returns:
+        dict or None: Recipe ID -> info for every recipe the API returned,
+        or None if the request itself failed.
+    """
+    if not recipe_ids:
+        return {}
+    params = {
+        'ids': ",".join(str(recipe_id) for recipe_id in recipe_ids),
+        'includeNutrition': True
+    }
+
+    resp = spoonacular_get('/recipes/informationBulk', params)
+    if resp is None or resp.status_code != 200:
+        return None
+    return {info['id']: info for info in resp.json() if 'id' in info}